@@ -1,20 +1,30 @@
 import streamlit as st
 
 import utils.auth as a
-from sections.header import show_header
-from sections.landing import show_landing
-from sections.trades import show_trades
-from sections.analyze import show_analyze
+import utils.prewarm as prewarm
+import utils.telemetry as telemetry
+
+# load the heavy data stack in the background while the first page renders;
+# the landing page below never imports it
+prewarm.start()
+telemetry.start_exporter()
 
 # gate the app behind Google sign-in. Native auth keeps the user logged in
 # across refreshes via a signed identity cookie (st.user.is_logged_in).
 if not st.user.is_logged_in:
+    from sections.landing import show_landing
+
     # centered layout suits the landing; set inside the branch so Streamlit
     # transitions centered -> wide more seamlessly once logged in
     st.set_page_config(page_title="Pickwise", page_icon="🤑", layout="centered")
     show_landing()
     st.stop()
 
+# imported past the login gate so anonymous visitors don't pay for pandas/yfinance/AWS
+from sections.header import show_header
+from sections.trades import show_trades
+from sections.analyze import show_analyze
+
 st.set_page_config(page_title="Pickwise", page_icon="🤑", layout="wide")
 
 # session state is cleared on every refresh, but the identity cookie persists;
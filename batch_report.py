@@ -0,0 +1,114 @@
+"""
+Nightly analysis reports for every user, without a browser session.
+
+Each user's trades.json is analysed by the headless engine (utils.engine)
+against the shared price store, and a JSON report is written next to it as
+users/<email>/report.json. Users are spread over a process pool; every worker
+builds its own AWS clients and shares the node's disk cache. Run after
+refresh_prices.py, so the store is current:
+
+    python batch_report.py
+    python batch_report.py --workers 8 --users a@example.com,b@example.com
+    python batch_report.py --output-dir reports/   # write locally instead of to S3
+"""
+
+import os
+import sys
+import json
+import argparse
+import multiprocessing
+import config as c
+import utils.user as u
+import utils.prices as p
+import utils.engine as engine
+import utils.events as events
+import utils.telemetry as telemetry
+import utils.disk_cache as disk_cache
+
+from pathlib import Path
+from utils.logger import logger
+from datetime import datetime as dt
+from concurrent.futures import ProcessPoolExecutor
+
+
+def build_report(email, trades, today):
+    """one user's report: headline values as numbers, plus the app's metrics as displayed"""
+    report = {"user": email, "generated_at": dt.now().isoformat(timespec="seconds"), "num_trades": len(trades)}
+    if not trades:
+        return report
+
+    partitions = p.read_partitions(p.start_dates_for(trades))
+    res, metrics, _ = engine.analyze(trades, partitions, today, events_table=events.read())
+    if res.empty:
+        return report
+
+    last = res.iloc[-1]
+    spec = engine.benchmark_spec()
+    report.update({
+        "as_of": last["Date"].strftime(c.DATES_FORMAT),
+        "total_invested": float(last["total_invested"]),
+        "portfolio_value": float(last[c.STOCK_PORTFOLIO_COL_NAME]),
+        "benchmark_values": {name: float(last[col]) for name, col in spec.cols.items()},
+        # the per-trade breakdowns behind the win/loss metrics are for the app's popovers only
+        "metrics": [{key: metric[key] for key in ("label", "value", "delta") if key in metric} for metric in metrics],
+    })
+    return report
+
+
+def run_user(job):
+    """worker entry point: analyse one user and store the report; returns (email, error or None)"""
+    email, key, today, output_dir = job
+    try:
+        trades = json.loads(disk_cache.get_bytes(key).decode("utf-8"))
+        body = json.dumps(build_report(email, trades, today), indent=4, default=str)
+        if output_dir:
+            Path(output_dir, f"{email}.json").write_text(body)
+        else:
+            disk_cache.put(f"{c.USERS_FOLDER}/{email}/{c.REPORT_JSON_FILENAME}", body, "application/json")
+        return email, None
+    except Exception as e:
+        return email, f"{type(e).__name__}: {e}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write an analysis report for every user.")
+    parser.add_argument("--users", help="comma-separated emails; all users by default")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="worker processes")
+    parser.add_argument("--output-dir", help="write reports here as <email>.json instead of to S3")
+    parser.add_argument("--metrics-file", help="write Prometheus-format metrics here when done")
+    args = parser.parse_args()
+
+    failed = {}
+    try:
+        with telemetry.span("batch_report") as fields:
+            keys = u.trades_keys()
+            if args.users:
+                wanted = {email.strip() for email in args.users.split(",") if email.strip()}
+                keys = {email: key for email, key in keys.items() if email in wanted}
+            if args.output_dir:
+                os.makedirs(args.output_dir, exist_ok=True)
+
+            today = dt.now().date()
+            jobs = [(email, key, today, args.output_dir) for email, key in sorted(keys.items())]
+            fields["users"] = len(jobs)
+            logger.info(f"reporting on {len(jobs)} users with {args.workers} workers")
+
+            # spawned, not forked: boto3 clients and the logger's handlers don't survive a fork safely
+            context = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(max_workers=args.workers, mp_context=context) as pool:
+                for email, error in pool.map(run_user, jobs, chunksize=max(1, len(jobs) // (args.workers * 4))):
+                    if error:
+                        failed[email] = error
+                        logger.error(f"report for {email} failed: {error}")
+
+            fields["failed"] = len(failed)
+            logger.info(f"wrote {len(jobs) - len(failed)} of {len(jobs)} reports")
+    finally:
+        if args.metrics_file:
+            telemetry.export(args.metrics_file)
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,292 @@
+"""
+Benchmark suite for the load/analyze/render pipeline.
+
+Each scenario seeds a synthetic portfolio into local stand-ins for S3 and
+DynamoDB (moto) and swaps Yahoo for a deterministic fake price provider, then
+times every stage and records its peak Python memory (tracemalloc). Results are
+written as JSON and checked against benchmarks/budgets.json; a stage over its
+budget makes the run exit non-zero.
+
+Run from the repo root:
+    python -m benchmarks.run
+    python -m benchmarks.run --scenarios tiny,small --output bench.json
+    python -m benchmarks.run --budget-scale 2   # slower machine, looser budgets
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import argparse
+import platform
+import tempfile
+import statistics
+import subprocess
+import tracemalloc
+
+from pathlib import Path
+
+# stand-in credentials and a throwaway disk tier; set before config is imported
+# so nothing can reach real AWS or reuse the app's local cache
+os.environ.update({
+    "AWS_ACCESS_KEY_ID": "benchmark",
+    "AWS_SECRET_ACCESS_KEY": "benchmark",
+    "AWS_SESSION_TOKEN": "benchmark",
+    "AWS_REGION": os.environ.get("AWS_REGION", "us-east-1"),
+    "PICKWISE_CACHE_DIR": tempfile.mkdtemp(prefix="pickwise-bench-"),
+})
+
+import io
+import numpy as np
+import pandas as pd
+import config as c
+import streamlit as st
+import streamlit.config as st_config
+import streamlit.logger as st_logger
+import utils.user as u
+import utils.prices as p
+import utils.charts as charts
+import utils.helpers as h
+import utils.telemetry as telemetry
+import utils.downloader as downloader
+import benchmarks.synthetic as synthetic
+
+from moto import mock_aws
+from utils.logger import logger
+from datetime import datetime as dt
+
+BUDGETS_PATH = Path(__file__).with_name("budgets.json")
+
+SCENARIOS = {
+    "tiny": {"trades": 10, "tickers": 1, "years": 1},
+    "small": {"trades": 500, "tickers": 25, "years": 3},
+    "medium": {"trades": 5000, "tickers": 200, "years": 10},
+    "large": {"trades": 50000, "tickers": 1000, "years": 25},
+}
+
+
+class NullNotifier:
+    """Pushover stand-in; benchmarks should never page anyone"""
+
+    def send_notification(self, *args, **kwargs):
+        pass
+
+    def flush(self, timeout=None):
+        return True
+
+
+def measure(run, setup=None, repeats=3):
+    """
+    Time `repeats` runs (each after a fresh setup), after one untimed warm-up
+    run so imports and first-call caches don't land in the timings, then one
+    more run under tracemalloc for peak memory, kept separate so tracing
+    doesn't skew timings.
+    """
+    if setup:
+        setup()
+    run()
+
+    times = []
+    for _ in range(repeats):
+        if setup:
+            setup()
+        started = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - started)
+
+    if setup:
+        setup()
+    tracemalloc.start()
+    run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "repeats": repeats,
+        "min_seconds": min(times),
+        "median_seconds": statistics.median(times),
+        "peak_mb": peak / 2**20,
+    }
+
+
+def create_stand_ins():
+    """bucket and users table the app expects, inside the active moto mock"""
+    if c.AWS_REGION == "us-east-1":
+        c.s3.create_bucket(Bucket=c.S3_BUCKET)
+    else:
+        c.s3.create_bucket(Bucket=c.S3_BUCKET, CreateBucketConfiguration={"LocationConstraint": c.AWS_REGION})
+
+    c.ddb.create_table(
+        TableName=c.USERS_TABLE,
+        KeySchema=[{"AttributeName": "user_id", "KeyType": "HASH"}],
+        AttributeDefinitions=[{"AttributeName": "user_id", "AttributeType": "S"}],
+        BillingMode="PAY_PER_REQUEST",
+    )
+
+
+def drop_price_store():
+    """delete every stored partition, so the next load backfills from scratch"""
+    paginator = c.s3.get_paginator("list_objects_v2")
+    for page in paginator.paginate(Bucket=c.S3_BUCKET, Prefix=f"{c.PRICES_FOLDER}/"):
+        objects = [{"Key": obj["Key"]} for obj in page.get("Contents", [])]
+        if objects:
+            c.s3.delete_objects(Bucket=c.S3_BUCKET, Delete={"Objects": objects})
+
+
+def drop_local_caches():
+    shutil.rmtree(c.DISK_CACHE_DIR, ignore_errors=True)
+    p.decoded_partitions.clear()
+
+
+def reset_session(user):
+    for key in list(st.session_state.keys()):
+        del st.session_state[key]
+    st.session_state.user = user
+
+
+def run_scenario(name, spec, repeats):
+    today = dt.now().date()
+    trades = synthetic.generate_trades(spec["trades"], spec["tickers"], spec["years"], today)
+    payload = {"sub": f"bench-{name}", "email": f"{name}@benchmark.local", "name": name, "iat": 0}
+
+    results = {}
+
+    # returning-user login against a cold process cache: one GetItem plus the login UpdateItem
+    u.User(payload)
+    def login():
+        payload["iat"] += 1
+        return u.User(payload)
+    results["bootstrap_user"] = measure(login, setup=u.user_records.clear, repeats=repeats)
+
+    user = login()
+    h.disk_cache.put(user.TRADES_JSON_PATH, json.dumps(trades), "application/json")
+
+    def cold():
+        reset_session(user)
+        drop_local_caches()
+        drop_price_store()
+    results["load_app_state_backfill"] = measure(h.load_app_state, setup=cold, repeats=repeats)
+
+    def stored():
+        reset_session(user)
+        drop_local_caches()
+    results["load_app_state"] = measure(h.load_app_state, setup=stored, repeats=repeats)
+
+    results["load_app_state_cached"] = measure(h.load_app_state, setup=lambda: reset_session(user), repeats=repeats)
+
+    tagged_trades = st.session_state["trades"]
+    results["generate_results"] = measure(lambda: h.generate_results(tagged_trades), repeats=repeats)
+
+    # every tag's curves at once; should cost about one generate_results, not one per tag
+    results["generate_grouped"] = measure(lambda: h.generate_grouped(tagged_trades, "tags"), repeats=repeats)
+
+    res = h.generate_results(tagged_trades)
+    results["get_metrics"] = measure(lambda: h.get_metrics(res), repeats=repeats)
+
+    def plot():
+        fig = charts.plot_results(res)
+        fig.savefig(io.BytesIO(), format="png", dpi=c.CHART_DPI, bbox_inches="tight")
+    results["plot_results"] = measure(plot, repeats=repeats)
+
+    return results
+
+
+def check_budgets(report, budgets, scale):
+    """stages whose median time or peak memory exceed their budget"""
+    violations = []
+    for scenario, stages in report["results"].items():
+        for stage, result in stages.items():
+            budget = budgets.get(scenario, {}).get(stage, {})
+            for metric, measured in (("seconds", result["median_seconds"]), ("peak_mb", result["peak_mb"])):
+                if metric in budget and measured > budget[metric] * scale:
+                    violations.append({
+                        "scenario": scenario,
+                        "stage": stage,
+                        "metric": metric,
+                        "measured": measured,
+                        "budget": budget[metric] * scale,
+                    })
+    return violations
+
+
+def environment():
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    return {
+        "commit": commit,
+        "timestamp": dt.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the load/analyze/render pipeline.")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help=f"comma-separated subset of: {', '.join(SCENARIOS)}")
+    parser.add_argument("--repeats", type=int, default=3, help="timed runs per stage; the median is reported")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    parser.add_argument("--budgets", default=str(BUDGETS_PATH), help="budgets file to enforce")
+    parser.add_argument("--budget-scale", type=float, default=1.0, help="multiply every budget, e.g. for slower machines")
+    parser.add_argument("--no-budgets", action="store_true", help="report only; never fail on budgets")
+    args = parser.parse_args()
+
+    scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = [name for name in scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(unknown)}")
+
+    # streamlit warns on every session_state access outside `streamlit run`; its
+    # config is parsed first, since parsing resets the level. The app and its
+    # telemetry log to stdout, where the JSON report goes.
+    st_config.get_option("logger.level")
+    st_logger.set_log_level("error")
+    logger.setLevel(logging.WARNING)
+    telemetry.log.setLevel(logging.WARNING)
+    c.po = NullNotifier()
+    downloader._fetch_history = synthetic.fake_history
+
+    report = {"environment": environment(), "scenarios": {name: SCENARIOS[name] for name in scenarios}, "results": {}}
+    try:
+        with mock_aws():
+            create_stand_ins()
+            for name in scenarios:
+                print(f"running {name} {SCENARIOS[name]}...", file=sys.stderr)
+                report["results"][name] = run_scenario(name, SCENARIOS[name], args.repeats)
+                for stage, result in report["results"][name].items():
+                    print(f"  {stage:<26} {result['median_seconds'] * 1000:>10.1f} ms  {result['peak_mb']:>8.1f} MB", file=sys.stderr)
+    finally:
+        u.flush_counters()
+        shutil.rmtree(c.DISK_CACHE_DIR, ignore_errors=True)
+
+    violations = []
+    if not args.no_budgets:
+        budgets = json.loads(Path(args.budgets).read_text())
+        violations = check_budgets(report, budgets, args.budget_scale)
+    report["violations"] = violations
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(output)
+    else:
+        print(output)
+
+    for violation in violations:
+        print(
+            f"over budget: {violation['scenario']}/{violation['stage']} {violation['metric']} "
+            f"{violation['measured']:.3f} > {violation['budget']:.3f}",
+            file=sys.stderr,
+        )
+    sys.exit(1 if violations else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Synthetic portfolios and prices for the benchmark suite.
+
+Everything is derived from fixed seeds, so a scenario produces the same trades
+and the same price paths on every run, on every machine.
+"""
+
+import zlib
+import numpy as np
+import pandas as pd
+import config as c
+
+from datetime import date
+from datetime import timedelta as td
+
+# every price path starts here, so any requested window is a slice of the same walk
+EPOCH = date(1990, 1, 1)
+
+TAGS = ["executed", "hypothetical", "long-term", "momentum", "dividend", "tech", "value", "speculative"]
+SOURCES = ["Warren Buffett", "/r/wallstreetbets", "newsletter", "podcast", "friend", "own research"]
+
+
+def synthetic_tickers(num_tickers):
+    return [f"SYN{i:04d}" for i in range(num_tickers)]
+
+
+def generate_trades(num_trades, num_tickers, years, today, seed=0):
+    """
+    Trades spread uniformly over the last `years` years, each ticker traded at
+    least once (when there are enough trades), with a mix of tags and sources
+    so the filters have something to chew on.
+    """
+    rng = np.random.default_rng(seed)
+    tickers = synthetic_tickers(num_tickers)
+
+    # every ticker appears at least once, the rest are drawn at random
+    picks = rng.permutation(num_tickers)[:num_trades]
+    picks = np.concatenate([picks, rng.integers(0, num_tickers, size=num_trades - len(picks))])
+
+    span_days = int(years * 365.25)
+    offsets = rng.integers(1, span_days + 1, size=num_trades)
+    amounts = np.round(rng.lognormal(mean=7, sigma=1, size=num_trades), 2)
+    num_tags = rng.integers(0, 3, size=num_trades)
+
+    trades = []
+    for ticker, offset, amount, n_tags in zip(picks, offsets, amounts, num_tags):
+        trades.append({
+            "ticker": tickers[ticker],
+            "date": (today - td(days=int(offset))).strftime(c.DATES_FORMAT),
+            "amount": float(amount),
+            "notes": None,
+            "source": [SOURCES[rng.integers(len(SOURCES))]],
+            "tags": list(rng.choice(TAGS, size=n_tags, replace=False)),
+        })
+
+    return trades
+
+
+def fake_history(ticker, start_date, end_date):
+    """
+    Stand-in for a Yahoo daily-close download: a geometric random walk over
+    business days, seeded by the ticker so every window of the same ticker
+    agrees on its prices. It never splits or pays dividends.
+    """
+    days = np.arange(np.datetime64(EPOCH), np.datetime64(end_date) + 1, dtype="datetime64[D]")
+    days = pd.DatetimeIndex(days[np.is_busday(days)].astype("datetime64[ns]"))
+    rng = np.random.default_rng(zlib.crc32(ticker.encode("utf-8")))
+    returns = rng.normal(loc=0.0003, scale=0.02, size=len(days))
+    close = pd.Series(50 * np.exp(np.cumsum(returns)), index=days, name="Close")
+    events = pd.DataFrame({"dividend": pd.Series(dtype=float), "split": pd.Series(dtype=float)})
+    return close[close.index >= pd.Timestamp(start_date)], events
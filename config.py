@@ -1,10 +1,10 @@
 import os
-import boto3
+import tempfile
+import threading
 import streamlit as st
 
 from datetime import date, timedelta
 from dotenv import load_dotenv, find_dotenv
-from utils.pushover import Pushover
 
 # load environment variables from .env file
 load_dotenv(find_dotenv())
@@ -19,15 +19,52 @@ PRIMARY_COLOR = "#4CAF50"
 
 # user preferences
 MARKET = "VTI"
+# benchmarks every portfolio is compared against, as name -> {ticker: weight}. A blend splits each
+# trade's amount across its tickers by weight and holds (no rebalancing). MARKET names the primary
+# benchmark, the one that decides winning and losing trades.
+BENCHMARKS = {
+    "VTI": {"VTI": 1.0},
+    "SPY": {"SPY": 1.0},
+    "QQQ": {"QQQ": 1.0},
+    "60/40": {"VTI": 0.6, "BND": 0.4},
+}
+BENCHMARK_TICKERS = sorted({ticker for weights in BENCHMARKS.values() for ticker in weights})
 DESIRED_TICKER_ATTRIBUTE = "Close"
 NUM_DAYS_PRECEDING_ANALYSIS = 30
 
+# market calendar; daily closes are treated as final this long after the bell
+MARKET_TIMEZONE = "America/New_York"
+MARKET_CLOSE_HOUR = 16
+PRICE_REFRESH_DELAY_MINUTES = 30
+
+# yfinance downloads: tickers per chunk, concurrent chunks, and retry backoff
+DOWNLOAD_CHUNK_SIZE = 25
+DOWNLOAD_MAX_WORKERS = 4
+DOWNLOAD_MAX_ATTEMPTS = 4
+DOWNLOAD_BACKOFF_BASE_SECONDS = 1.0
+DOWNLOAD_BACKOFF_MAX_SECONDS = 30.0
+
 # app logic constants
 DATES_FORMAT = "%Y-%m-%d"
 STOCK_PORTFOLIO_COL_NAME = "portfolio_value"
 MARKET_PORTFOLIO_COL_NAME = "market_value"
 RES_CSV_PATH = "res.csv"
 
+# results exports are serialized only when downloaded, this many rows at a time; format -> (mime type, extension)
+EXPORT_FORMATS = {
+    "CSV": ("text/csv", "csv"),
+    "Parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+EXPORT_CHUNK_ROWS = 20000
+
+# analysis results are memoized per session and process-wide; bounds for each tier
+SESSION_RESULTS_CACHE_ENTRIES = 16
+PROCESS_RESULTS_CACHE_ENTRIES = 256
+PROCESS_RESULTS_CACHE_MAX_BYTES = 512 * 1024 * 1024
+
+# empty slots the trade index tolerates (beyond one per live trade) before a save rebuilds it
+TRADE_INDEX_SLACK = 64
+
 # date ~6 months prior to today, used to seed example trades for new users
 _default_trade_date = (date.today() - timedelta(days=180)).strftime(DATES_FORMAT)
 
@@ -52,12 +89,40 @@ DEFAULT_TRADES = [
 # with the correct schema when a user has no trades yet
 TRADES_COLUMNS = ["ticker", "date", "amount", "notes", "source", "tags"]
 
+# bulk import from broker exports: rows parsed per batch, and the header names each trade field
+# is recognized by (compared case-insensitively). Rows with an action column only import buys.
+IMPORT_CHUNK_ROWS = 10000
+IMPORT_COLUMN_ALIASES = {
+    "ticker": ["ticker", "symbol", "security", "instrument"],
+    "date": ["date", "trade date", "transaction date", "run date", "activity date"],
+    "amount": ["amount", "total", "net amount", "value", "cost", "amount ($)"],
+    "quantity": ["quantity", "shares", "units", "qty"],
+    "price": ["price", "unit price", "price ($)", "share price"],
+    # not "type": brokers use it for the security type (stock, ETF), which would skip every row
+    "action": ["action", "transaction type", "side", "activity"],
+    "notes": ["notes", "description", "memo"],
+}
+IMPORT_BUY_ACTIONS = ("buy", "bought", "purchase")
+
+# annualized (XIRR and time-weighted) returns are left blank for shorter histories, which annualizing mostly blows up
+ANNUALIZE_MIN_DAYS = 30
+
+# grouped comparisons: trades are split by tag, source or ticker and every group is valued in one pass
+GROUP_BY_FIELDS = {"Tag": "tags", "Source": "source", "Ticker": "ticker"}
+UNGROUPED_LABEL = "(none)"  # the group of trades with no tags (or no source)
+COMPARE_MAX_GROUPS = 12  # groups charted side by side; the ones with the most trades are kept
+GROUP_CHUNK_COLUMNS = 256  # (group, ticker) holdings valued per block, bounding memory at dates x block
+
 # UI vars
 ASSETS_PATH = "assets"
 PREFERRED_UI_DATE_FORMAT_MOMENTJS = "dddd, MMMM DD, YYYY"
 PREFERRED_UI_DATE_FORMAT_DATETIME = "%A, %B %d, %Y"
+CHART_MAX_POINTS = 1000  # long histories are LTTB-downsampled to this many points
+CHART_MAX_ANNOTATIONS = 30  # nearby trades are clustered into at most ~this many labels
+CHART_MAX_TICKERS_PER_LABEL = 3
+CHART_CACHE_ENTRIES = 128
+CHART_DPI = 200
 STOCK_PORTFOLIO_LABEL = 'Stock Picking Portfolio'
-MARKET_PORTFOLIO_LABEL = f'100% {MARKET} Portfolio'
 COLUMN_CONFIGS = {
     "_index": None,
     "ticker": st.column_config.TextColumn("Ticker", width="small"),
@@ -69,6 +134,11 @@ COLUMN_CONFIGS = {
     "source": st.column_config.ListColumn("Source", width="small"),
     "return": st.column_config.NumberColumn("Trade Return", format="percent"),
     "market_return": st.column_config.NumberColumn("Market Return", format="percent"),
+    "annualized_return": st.column_config.NumberColumn("Annualized", format="percent"),
+    **{
+        f"excess_return:{name}": st.column_config.NumberColumn(f"vs {name}", format="percent")
+        for name in BENCHMARKS if name != MARKET
+    },
     "tags": st.column_config.ListColumn("Tags", width="medium")
 }
 
@@ -80,32 +150,127 @@ TRADE_BREAKDOWN_COLUMN_CONFIGS = {
     "excess_return": st.column_config.NumberColumn(f"vs {MARKET}", format="percent"),
 }
 
+# columns for the per-group comparison table
+GROUP_SUMMARY_COLUMN_CONFIGS = {
+    "_index": None,
+    "group": st.column_config.TextColumn("Group"),
+    "total_invested": st.column_config.NumberColumn("Invested", format="dollar"),
+    STOCK_PORTFOLIO_COL_NAME: st.column_config.NumberColumn("Value", format="dollar"),
+    "return": st.column_config.NumberColumn("Return", format="percent"),
+    "market_return": st.column_config.NumberColumn("Market Return", format="percent"),
+    "excess_return": st.column_config.NumberColumn(f"vs {MARKET}", format="percent"),
+    "annualized_return": st.column_config.NumberColumn("Annualized (XIRR)", format="percent"),
+    "market_annualized_return": st.column_config.NumberColumn(f"{MARKET} Annualized (XIRR)", format="percent"),
+    "time_weighted_return": st.column_config.NumberColumn("Time-Weighted", format="percent"),
+    **{
+        f"excess_return:{name}": st.column_config.NumberColumn(f"vs {name}", format="percent")
+        for name in BENCHMARKS if name != MARKET
+    },
+}
+
+# local disk tier in front of S3 reads, shared by every process on the node
+DISK_CACHE_DIR = os.getenv("PICKWISE_CACHE_DIR", os.path.join(tempfile.gettempdir(), "pickwise-cache"))
+DISK_CACHE_MAX_BYTES = 1024 * 1024 * 1024
+DECODED_PARTITIONS_CACHE_ENTRIES = 2048
+DECODED_PARTITIONS_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+# the latest bars (today's, and any not yet persisted) are fetched at most once per ticker per
+# QUOTE_TTL_SECONDS for the whole process and, with QUOTES_NODE_SHARED, every process on the node
+QUOTE_TTL_SECONDS = 300
+QUOTE_LOOKBACK_DAYS = 7
+QUOTE_CACHE_ENTRIES = 4096
+QUOTES_NODE_SHARED = os.getenv("PICKWISE_QUOTES_NODE_SHARED", "1") == "1"
+
+# telemetry: spans at least this slow are logged at INFO, the rest at DEBUG; metrics
+# are rewritten to METRICS_FILE periodically and served over HTTP if METRICS_PORT is set
+TELEMETRY_LOG_LEVEL = os.getenv("PICKWISE_TELEMETRY_LOG_LEVEL", "INFO").upper()
+SLOW_SPAN_SECONDS = 1.0
+METRICS_FILE = os.getenv("PICKWISE_METRICS_FILE", os.path.join(tempfile.gettempdir(), "pickwise-metrics.prom"))
+METRICS_EXPORT_SECONDS = 15
+METRICS_PORT = int(os.getenv("PICKWISE_METRICS_PORT", "0")) or None
+
 # aws vars
 S3_BUCKET = "pickwise-676206945006"
+USERS_FOLDER = "users"
 TRADES_JSON_FILENAME = "trades.json"
-TICKER_DATA_FILENAME = "ticker_data.parquet"
+REPORT_JSON_FILENAME = "report.json"
+
+# daily closes are shared across users, one parquet partition per ticker
+PRICES_FOLDER = "prices"
+# splits and dividends of every ticker, one shared table; total-return closes are derived from them at read time
+EVENTS_KEY = f"{PRICES_FOLDER}/_events.parquet"
+# it is rewritten with a conditional put, re-read and merged again when another writer got there first
+EVENTS_WRITE_ATTEMPTS = 5
+
+# symbols Yahoo doesn't know (or has delisted) are remembered for everyone so they aren't
+# re-requested on every load; entries expire in case a symbol gets (re)listed
+INVALID_SYMBOLS_KEY = f"{PRICES_FOLDER}/_invalid_symbols.json"
+INVALID_SYMBOL_TTL_SECONDS = 7 * 24 * 3600
+INVALID_SYMBOLS_REFRESH_SECONDS = 60
+# a missing timezone may be a network blip; it marks a symbol invalid only after this many strikes,
+# counted at most once per interval so one bad run can't add them all
+INVALID_SYMBOL_STRIKES = 3
+INVALID_SYMBOL_STRIKE_INTERVAL_SECONDS = 6 * 3600
+VALID_SYMBOLS_CACHE_ENTRIES = 10000
+# a listed symbol trades at least once in this many days; no prices over a longer window means delisted
+DELISTED_WINDOW_DAYS = 10
+# history requested when checking whether a new symbol exists
+SYMBOL_PROBE_DAYS = 14
+
 AWS_ACCESS_KEY_ID = env("AWS_ACCESS_KEY_ID")
 AWS_SECRET_ACCESS_KEY = env("AWS_SECRET_ACCESS_KEY")
 AWS_REGION = env("AWS_REGION")
-s3 = boto3.client(
-    "s3",
-    aws_access_key_id=AWS_ACCESS_KEY_ID,
-    aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
-    region_name=AWS_REGION
-)
-
-ddb = boto3.resource(
-    "dynamodb",
-    aws_access_key_id=AWS_ACCESS_KEY_ID,
-    aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
-    region_name=AWS_REGION
-)
 
 # ddb table names
 USERS_TABLE = "users-pickwise"
 
+# user records are cached per process; counter increments are batched
+USER_RECORD_TTL_SECONDS = 300
+USER_RECORD_CACHE_ENTRIES = 10000
+COUNTER_FLUSH_SECONDS = 10
+
 # misc auth/UI vars
 LOGOUT_BUTTON_KEY_NAME = "logout_button"
 
-# Pushover client
-po = Pushover(user_token=env("PUSHOVER_USER_TOKEN"), app_token=env("PUSHOVER_APP_TOKEN"), log_token=env("PUSHOVER_LOG_TOKEN"))
\ No newline at end of file
+# s3 and ddb (AWS) and po (Pushover) clients are built on first use rather than at
+# import, so pages that never touch them (e.g. the logged-out landing) stay fast.
+def _s3():
+    import boto3
+    import utils.telemetry as telemetry
+    return telemetry.instrument_boto(boto3.client(
+        "s3",
+        aws_access_key_id=AWS_ACCESS_KEY_ID,
+        aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
+        region_name=AWS_REGION
+    ))
+
+def _ddb():
+    import boto3
+    import utils.telemetry as telemetry
+    resource = boto3.resource(
+        "dynamodb",
+        aws_access_key_id=AWS_ACCESS_KEY_ID,
+        aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
+        region_name=AWS_REGION
+    )
+    telemetry.instrument_boto(resource.meta.client)
+    return resource
+
+def _po():
+    from utils.pushover import Pushover
+    return Pushover(user_token=env("PUSHOVER_USER_TOKEN"), app_token=env("PUSHOVER_APP_TOKEN"), log_token=env("PUSHOVER_LOG_TOKEN"))
+
+_LAZY_CLIENTS = {"s3": _s3, "ddb": _ddb, "po": _po}
+_lazy_clients_lock = threading.Lock()
+
+def __getattr__(name):
+    """module-level __getattr__ (PEP 562): only called for names not yet defined"""
+    factory = _LAZY_CLIENTS.get(name)
+    if factory is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    # boto3's default session isn't thread-safe, and the prewarm thread may race the script thread
+    with _lazy_clients_lock:
+        if name not in globals():
+            globals()[name] = factory()
+    return globals()[name]
@@ -0,0 +1,124 @@
+"""
+Refreshes the shared price store out-of-band so page loads never wait on yfinance.
+
+Each pass scans every user's trades.json, works out which tickers are referenced
+and how far back each one is needed, then fetches only the missing bars in bulk
+and updates the per-ticker partitions under c.PRICES_FOLDER. Run after the
+market close, either from cron:
+
+    python refresh_prices.py
+
+or as a long-lived worker that runs one pass per trading day after the close:
+
+    python refresh_prices.py --loop
+"""
+
+import json
+import time
+import argparse
+import numpy as np
+import config as c
+import utils.user as u
+import utils.prices as p
+import utils.telemetry as telemetry
+
+from zoneinfo import ZoneInfo
+from utils.logger import logger
+from datetime import datetime as dt
+from datetime import timedelta as td
+from concurrent.futures import ThreadPoolExecutor
+
+
+def _business_day(day, roll):
+    """day, or the nearest weekday in the direction of roll ("forward" or "backward"), as quotes.stale counts them"""
+    return np.busday_offset(np.datetime64(day, "D"), 0, roll=roll).astype(object)
+
+
+def last_final_date(now):
+    """the latest trading date whose close is final at `now` (market-local)"""
+    close = now.replace(hour=c.MARKET_CLOSE_HOUR, minute=0, second=0, microsecond=0) + td(minutes=c.PRICE_REFRESH_DELAY_MINUTES)
+    return _business_day(now.date() if now >= close else now.date() - td(days=1), "backward")
+
+
+def next_run(now):
+    """when the next pass should start: the coming post-close refresh time on a trading day"""
+    run_at = now.replace(hour=c.MARKET_CLOSE_HOUR, minute=0, second=0, microsecond=0) + td(minutes=c.PRICE_REFRESH_DELAY_MINUTES)
+    run_date = _business_day(now.date() if run_at > now else now.date() + td(days=1), "forward")
+    return run_at + td(days=(run_date - now.date()).days)
+
+
+def read_trades(key):
+    response = c.s3.get_object(Bucket=c.S3_BUCKET, Key=key)
+    return json.loads(response["Body"].read().decode("utf-8"))
+
+
+def required_start_dates():
+    """
+    Earliest date each ticker is needed from, across all users.
+
+    Mirrors load_app_state: a user needs each of their tickers from shortly
+    before their earliest trade of it, and the market from shortly before
+    their earliest trade overall.
+    """
+    keys = list(u.trades_keys().values())
+
+    with ThreadPoolExecutor(max_workers=p.S3_WORKERS) as pool:
+        all_trades = list(pool.map(read_trades, keys))
+
+    start_dates = {}
+    for trades in all_trades:
+        for ticker, user_start in p.start_dates_for(trades).items():
+            start_dates[ticker] = min(start_dates.get(ticker, user_start), user_start)
+
+    logger.info(f"{len(keys)} users reference {len(start_dates)} tickers")
+    return start_dates
+
+
+def refresh():
+    now = dt.now(ZoneInfo(c.MARKET_TIMEZONE))
+    today = now.date()
+    final_date = last_final_date(now)
+
+    start_dates = required_start_dates()
+    partitions = p.read_partitions(start_dates)
+    # the one place adjusted partitions from before splits and dividends were kept apart get replaced
+    plan = p.plan_refresh(partitions, start_dates, today, migrate=True)
+    # a ticker already through the last trading day has nothing new, e.g. on a weekend or a second run
+    plan = {ticker: fetch_start for ticker, fetch_start in plan.items() if fetch_start <= final_date}
+    logger.info(f"refreshing {len(plan)} of {len(partitions)} tickers; closes final through {final_date}")
+
+    if plan:
+        p.refresh_partitions(partitions, plan, today, final_date=final_date)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Refresh the shared price store.")
+    parser.add_argument("--loop", action="store_true", help="keep running, one pass per trading day after the market close")
+    parser.add_argument("--metrics-file", help="write Prometheus-format metrics here after each pass")
+    args = parser.parse_args()
+
+    while True:
+        started = time.monotonic()
+        try:
+            with telemetry.span("refresh_prices"):
+                refresh()
+            logger.info(f"price refresh finished in {time.monotonic() - started:.1f}s")
+        except Exception as e:
+            if not args.loop:
+                raise
+            logger.error(f"price refresh failed: {e}")
+        finally:
+            if args.metrics_file:
+                telemetry.export(args.metrics_file)
+
+        if not args.loop:
+            break
+
+        now = dt.now(ZoneInfo(c.MARKET_TIMEZONE))
+        wake_at = next_run(now)
+        logger.info(f"next price refresh at {wake_at.isoformat()}")
+        time.sleep((wake_at - now).total_seconds())
+
+
+if __name__ == "__main__":
+    main()
@@ -2,17 +2,18 @@ import gc
 import time
 import pandas as pd
 import streamlit as st
-import matplotlib.pyplot as plt
 
 import config as c
 import utils.css as css
 import utils.helpers as h
+import utils.charts as charts
+import utils.export as export
 
 
 def show_analyze():
     """
     Renders the Analyze Trades section: tag/source/ticker filters, summary
-    metrics, results table, chart, and CSV download. Reads the live edits
+    metrics, results table, chart, CSV/Parquet export and the grouped comparison. Reads the live edits
     stashed by the trades section to derive available filter options.
     """
 
@@ -23,65 +24,51 @@ def show_analyze():
         # show_trades() should run first; if it didn't, there's nothing to analyze.
         return
 
+    trade_index = st.session_state.get("trade_index")
+    if trade_index is None:
+        return
+
     tags = h.get_tags(edited_trades)
     pills_label_action = "Create" if len(tags) == 0 else "Choose"
-    selected_tag = st.pills(
+    selected_tags = st.pills(
         label=f"{pills_label_action} tags to selectively analyze trading portfolios.",
         options=sorted(tags, key=str.lower),
-        selection_mode="single",
+        selection_mode="multi",
         default=None,
     )
+    # with several tags picked, let the user choose between any (OR) and all (AND)
+    match_all_tags = len(selected_tags) > 1 and st.toggle("Match all selected tags", value=False)
 
     sources = h.get_sources(edited_trades)
     sources_label_action = "Create" if len(sources) == 0 else "Choose"
-    selected_source = st.pills(
+    selected_sources = st.pills(
         label=f"{sources_label_action} sources to selectively analyze trading portfolios.",
         options=sorted(sources, key=str.lower),
-        selection_mode="single",
+        selection_mode="multi",
         default=None,
     )
-
-    # Ticker options narrow based on whichever filters are active.
-    # Both filters set -> intersection; only one set -> that filter's tickers;
-    # neither set -> all known tickers.
-    tickers_by_tags = st.session_state.get("tickers_by_tags", {})
-    tickers_by_source = st.session_state.get("tickers_by_source", {})
-    if selected_tag and selected_source:
-        ticker_options = tickers_by_tags.get(selected_tag, set()) & tickers_by_source.get(selected_source, set())
-    elif selected_tag:
-        ticker_options = tickers_by_tags.get(selected_tag, set())
-    elif selected_source:
-        ticker_options = tickers_by_source.get(selected_source, set())
-    else:
-        ticker_options = st.session_state.get("tickers", set())
-
-    selected_ticker = st.selectbox(
-        label="Optionally, filter for a specific ticker traded within selected tag/source.",
-        options=sorted(ticker_options),
-        index=None,
+    match_all_sources = len(selected_sources) > 1 and st.toggle("Match all selected sources", value=False)
+
+    # Ticker options narrow to those traded within the active tag/source filters;
+    # with neither set, every known ticker is offered.
+    filtered = trade_index.filter(
+        tags=selected_tags,
+        sources=selected_sources,
+        match_all_tags=match_all_tags,
+        match_all_sources=match_all_sources,
+    )
+    selected_tickers = st.multiselect(
+        label="Optionally, filter for specific tickers traded within selected tags/sources.",
+        options=sorted(trade_index.tickers(filtered)),
     )
 
-    if selected_ticker:
-        # if a ticker is selected, filter just for that ticker's trades
-        tagged_trades = [
-            trade for trade in st.session_state.get("trades", [])
-            if trade.get("ticker", None) == selected_ticker
-        ]
-    else:
-        # otherwise, intersect the selected tag and source filters; if neither is set, use all trades
-        tagged_trades = st.session_state.get("trades", [])
-        if selected_tag:
-            tagged_trades = [
-                trade for trade in tagged_trades
-                if selected_tag in trade.get("tags", [])
-            ]
-        if selected_source:
-            tagged_trades = [
-                trade for trade in tagged_trades
-                if selected_source in trade.get("source", [])
-            ]
-
-    res = h.generate_results(tagged_trades)
+    if selected_tickers:
+        filtered &= trade_index.match("ticker", selected_tickers)
+    tagged_trades = trade_index.select(filtered)
+
+    # one key per rerun, shared by the results, the chart and the comparison
+    results_key = h.results_key(tagged_trades)
+    res, metrics, trades_summary = h.analyze_trades(tagged_trades, results_key)
 
     css.empty_space()
 
@@ -91,8 +78,6 @@ def show_analyze():
             icon="⚠️",
         )
     else:
-        metrics, trades_summary = h.get_metrics(res)
-
         def render_metric(metric):
             st.metric(
                 label=metric["label"],
@@ -126,23 +111,71 @@ def show_analyze():
                 with st.container(border=False):
                     render_metric(metric)
 
+        return_cols = [col for col in trades_summary.columns if col.endswith("return") or col.startswith("excess_return:")]
         st.dataframe(
-            pd.DataFrame(trades_summary).sort_values(by="date", ascending=False, ignore_index=True).style.applymap(h.color_vals, subset=["return", "market_return"]),
+            pd.DataFrame(trades_summary).sort_values(by="date", ascending=False, ignore_index=True).style.applymap(h.color_vals, subset=return_cols),
             column_config=c.COLUMN_CONFIGS,
         )
 
         st.markdown("")  # empty space
         show_as_pct = st.toggle("Show as % return", value=False)
-        fig = h.plot_results(res, show_as_pct=show_as_pct)
-        st.pyplot(fig, clear_figure=True)
-        plt.close(fig)
-        st.download_button(
-            label="Download CSV",
-            data=res.to_csv(index=False).encode("utf-8"),
-            file_name=f"data_{int(time.time())}.csv",
-            mime="text/csv",
-            icon=":material/download:",
-        )
+        chart = charts.render_results_chart(res, results_key, show_as_pct=show_as_pct)
+        st.image(chart, width="stretch")
+
+        # the export is only serialized when the button is clicked, not on every rerun
+        with st.popover("Export data", icon=":material/download:"):
+            export_cols = st.multiselect("Columns", options=export.columns(res), default=export.columns(res))
+            export_format = st.segmented_control("Format", options=list(c.EXPORT_FORMATS), default="CSV", required=True)
+            mime, extension = c.EXPORT_FORMATS[export_format]
+            st.download_button(
+                label=f"Download {export_format}",
+                data=export.exporter(res, export_cols, export_format),
+                file_name=f"data_{int(time.time())}.{extension}",
+                mime=mime,
+                icon=":material/download:",
+                disabled=not export_cols,
+            )
+
+        css.empty_space()
+        selections = {"tags": selected_tags, "source": selected_sources, "ticker": selected_tickers}
+        show_compare(trade_index, filtered, tagged_trades, results_key, selections, show_as_pct)
 
     # run garbage collection to free RAM
     gc.collect()
+
+
+def show_compare(trade_index, filtered, tagged_trades, results_key, selections, show_as_pct):
+    """
+    Renders the filtered trades split by tag, source or ticker side by side: a
+    summary row and a curve per group, all computed in one pass over the
+    shared prices instead of one filter at a time. The groups are the values
+    picked in that field's filter, or else every value among the filtered
+    trades (plus the trades with none), keeping the ones with the most trades.
+    """
+    compare_by = st.segmented_control("Compare side by side by", options=list(c.GROUP_BY_FIELDS), default=None)
+    if compare_by is None:
+        return
+    field = c.GROUP_BY_FIELDS[compare_by]
+
+    values = selections[field] or sorted(trade_index.values(field))
+    counts = {value: (trade_index.match(field, [value]) & filtered).bit_count() for value in values}
+    if not selections[field] and field != "ticker":
+        grouped_bits = trade_index.match(field, values) if values else 0
+        counts[c.UNGROUPED_LABEL] = (filtered & ~grouped_bits).bit_count()
+
+    groups = [group for group, n in sorted(counts.items(), key=lambda item: -item[1]) if n]
+    if len(groups) > c.COMPARE_MAX_GROUPS:
+        st.caption(f"Showing the {c.COMPARE_MAX_GROUPS} of {len(groups)} groups with the most trades; pick some in the filters above to choose.")
+        groups = groups[:c.COMPARE_MAX_GROUPS]
+    groups.sort(key=str.lower)
+
+    grouped, summary = h.compare_groups(tagged_trades, results_key, field, groups)
+    return_cols = [col for col in summary.columns if col.endswith("return") or col.startswith("excess_return")]
+    st.dataframe(
+        summary.style.applymap(h.color_vals, subset=return_cols),
+        column_config=c.GROUP_SUMMARY_COLUMN_CONFIGS,
+        hide_index=True,
+    )
+
+    chart = charts.render_groups_chart(grouped, h.grouped_key(results_key, field, groups), show_as_pct=show_as_pct)
+    st.image(chart, width="stretch")
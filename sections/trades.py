@@ -4,13 +4,14 @@ import streamlit as st
 import config as c
 import utils.css as css
 import utils.helpers as h
+import utils.importer as importer
 
 
 def show_trades():
     """
     Renders the Add Trades section: explanatory copy, the editable trades
-    table, and the cloud-sync button. Stashes the live edits in session
-    state so downstream sections (e.g. analyze) can read them.
+    table, the cloud-sync button and the bulk importer. Stashes the live edits
+    in session state so downstream sections (e.g. analyze) can read them.
     """
 
     css.header(css.underline("Add Trades"), lvl=5)
@@ -51,7 +52,58 @@ def show_trades():
             st.toast("Saved changes!", icon="💾")
             h.save_trades(edited_trades)
 
+    show_import()
+
     # expose live edits for downstream sections in the same script run
     st.session_state["edited_trades"] = edited_trades
 
     css.divider()
+
+
+def show_import():
+    """
+    Bulk import from a broker's CSV or OFX/QFX export. CSV columns are matched
+    to trade fields from the header and can be remapped before importing. The
+    report of the last import survives the rerun that follows its save.
+    """
+    with st.expander("Import trades from a broker export", icon=":material/upload_file:"):
+        uploaded = st.file_uploader("CSV, OFX or QFX export", type=["csv", "ofx", "qfx"])
+
+        mapping = None
+        if uploaded is not None and not uploaded.name.lower().endswith((".ofx", ".qfx")):
+            header = importer.read_header(uploaded)
+            guessed = importer.guess_mapping(header)
+            options = [None, *header]
+            fields = list(c.IMPORT_COLUMN_ALIASES)
+            mapping = {}
+            for column, field in zip(st.columns(len(fields)), fields):
+                with column:
+                    mapping[field] = st.selectbox(
+                        field.capitalize(),
+                        options=options,
+                        index=options.index(guessed.get(field)),
+                        format_func=lambda col: "—" if col is None else col,
+                    )
+
+        problem = importer.mapping_problems(mapping) if mapping is not None else None
+        if problem:
+            st.caption(problem)
+
+        if st.button("Import", icon=":material/upload:", disabled=uploaded is None or problem is not None):
+            known = {ticker for ticker, partition in st.session_state.get("partitions", {}).items() if not partition.empty}
+            with st.spinner("Importing trades..."):
+                report = importer.import_trades(uploaded, uploaded.name, st.session_state.get("trades", []), known, mapping)
+            st.session_state["import_report"] = report
+            if report.trades:
+                h.add_trades(report.trades)
+
+        report = st.session_state.pop("import_report", None)
+        if report is not None:
+            st.success(
+                f"Imported {len(report.trades)} trades. "
+                f"Skipped {report.duplicates} duplicates, {report.skipped} non-buy rows "
+                f"and {len(report.errors)} rows with errors.",
+                icon="📥",
+            )
+            if not report.errors.empty:
+                st.dataframe(report.errors, hide_index=True)
@@ -0,0 +1,43 @@
+import os
+import sys
+import tempfile
+
+# stand-in credentials and a throwaway disk tier; set before config is imported
+# so nothing can reach real AWS or reuse the app's local cache
+os.environ.update({
+    "AWS_ACCESS_KEY_ID": "testing",
+    "AWS_SECRET_ACCESS_KEY": "testing",
+    "AWS_SESSION_TOKEN": "testing",
+    "AWS_REGION": os.environ.get("AWS_REGION", "us-east-1"),
+    "PICKWISE_CACHE_DIR": tempfile.mkdtemp(prefix="pickwise-tests-"),
+})
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+import config as c
+import utils.downloader as downloader
+
+from moto import mock_aws
+
+
+@pytest.fixture
+def aws():
+    """the bucket and users table the app expects, in a fresh moto mock"""
+    with mock_aws():
+        if c.AWS_REGION == "us-east-1":
+            c.s3.create_bucket(Bucket=c.S3_BUCKET)
+        else:
+            c.s3.create_bucket(Bucket=c.S3_BUCKET, CreateBucketConfiguration={"LocationConstraint": c.AWS_REGION})
+
+        c.ddb.create_table(
+            TableName=c.USERS_TABLE,
+            KeySchema=[{"AttributeName": "user_id", "KeyType": "HASH"}],
+            AttributeDefinitions=[{"AttributeName": "user_id", "AttributeType": "S"}],
+            BillingMode="PAY_PER_REQUEST",
+        )
+        yield
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(downloader, "_backoff", lambda attempt: 0)
@@ -0,0 +1,71 @@
+import time
+import utils.cache as cache
+
+
+def test_evicts_least_recently_used():
+    lru = cache.LRUCache(max_entries=2)
+    lru.put("a", 1)
+    lru.put("b", 2)
+    assert lru.get("a") == 1  # "b" is now the oldest
+    lru.put("c", 3)
+
+    assert "b" not in lru
+    assert lru.get("a") == 1
+    assert lru.get("c") == 3
+
+
+def test_put_refreshes_an_existing_key():
+    lru = cache.LRUCache(max_entries=2)
+    lru.put("a", 1)
+    lru.put("b", 2)
+    lru.put("a", 10)
+    lru.put("c", 3)
+
+    assert "b" not in lru
+    assert lru.get("a") == 10
+    assert len(lru) == 2
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    now = time.monotonic()
+    monkeypatch.setattr(time, "monotonic", lambda: now)
+    lru = cache.LRUCache(max_entries=4, ttl=10)
+    lru.put("a", 1)
+
+    monkeypatch.setattr(time, "monotonic", lambda: now + 9)
+    assert lru.get("a") == 1
+    monkeypatch.setattr(time, "monotonic", lambda: now + 10)
+    assert lru.get("a") is None
+    assert len(lru) == 0
+
+
+def test_byte_budget_evicts_oldest_first():
+    lru = cache.LRUCache(max_entries=10, max_bytes=10, sizeof=len)
+    lru.put("a", "xxxx")
+    lru.put("b", "xxxx")
+    lru.put("c", "xxxx")
+
+    assert "a" not in lru
+    assert lru.get("b") == "xxxx"
+    assert lru.get("c") == "xxxx"
+
+
+def test_byte_budget_keeps_an_oversized_newest_entry():
+    lru = cache.LRUCache(max_entries=10, max_bytes=10, sizeof=len)
+    lru.put("a", "xxxx")
+    lru.put("big", "x" * 20)
+
+    assert "a" not in lru
+    assert lru.get("big") == "x" * 20
+
+
+def test_pop_and_replace_release_their_bytes():
+    lru = cache.LRUCache(max_entries=10, max_bytes=10, sizeof=len)
+    lru.put("a", "xxxxxx")
+    lru.put("a", "xx")
+    lru.put("b", "xxxxxx")
+    assert lru.pop("b") == "xxxxxx"
+    lru.put("c", "xxxxxxxx")
+
+    assert lru.get("a") == "xx"
+    assert lru.get("c") == "xxxxxxxx"
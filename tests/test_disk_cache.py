@@ -0,0 +1,48 @@
+import pytest
+import config as c
+import utils.disk_cache as disk_cache
+
+from pathlib import Path
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(aws, monkeypatch, tmp_path):
+    monkeypatch.setattr(c, "DISK_CACHE_DIR", str(tmp_path))
+    return tmp_path
+
+
+def test_body_and_etag_are_one_file(cache_dir):
+    disk_cache.put("k", b"first", "application/octet-stream")
+    disk_cache.put("k", b"second", "application/octet-stream")
+
+    files = list(cache_dir.iterdir())
+    assert len(files) == 1
+    path, etag = disk_cache.get("k")
+    assert path == files[0]
+    assert path.read_bytes() == b"second"
+    assert etag == c.s3.head_object(Bucket=c.S3_BUCKET, Key="k")["ETag"]
+
+
+def test_changed_object_replaces_local_copy(cache_dir):
+    disk_cache.put("k", b"first", "application/octet-stream")
+    # another process writes a new version straight to S3
+    c.s3.put_object(Bucket=c.S3_BUCKET, Key="k", Body=b"second")
+
+    assert disk_cache.get_bytes("k") == b"second"
+    assert len(list(cache_dir.iterdir())) == 1
+
+
+def test_unchanged_object_is_served_from_disk(cache_dir, monkeypatch):
+    disk_cache.put("k", b"first", "application/octet-stream")
+    monkeypatch.setattr(disk_cache, "_store", lambda *args: pytest.fail("re-downloaded an unchanged object"))
+
+    path, _ = disk_cache.get("k")
+    assert Path(path).read_bytes() == b"first"
+
+
+def test_deleted_object_is_discarded(cache_dir):
+    disk_cache.put("k", b"first", "application/octet-stream")
+    c.s3.delete_object(Bucket=c.S3_BUCKET, Key="k")
+
+    assert disk_cache.get("k") == (None, None)
+    assert not list(cache_dir.iterdir())
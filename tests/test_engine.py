@@ -0,0 +1,118 @@
+import numpy as np
+import pandas as pd
+import config as c
+import utils.prices as p
+import utils.engine as engine
+
+from datetime import date
+
+TODAY = date(2026, 3, 31)
+BENCHMARKS = {"MKT": {"MKT": 1.0}, "NEW": {"NEW": 1.0}}
+
+
+def trade(ticker, day, amount):
+    return {"ticker": ticker, "date": day, "amount": amount, "tags": [], "source": [], "notes": ""}
+
+
+def test_benchmark_value_delta_uses_what_it_invested():
+    days = pd.bdate_range("2026-01-01", TODAY)
+    partitions = {
+        "STK": p.compact(days, 10.0),
+        "MKT": p.compact(days, 10.0),
+        # listed after the first trade, so only the second one buys into it
+        "NEW": p.compact(days[days >= "2026-03-02"], [10.0] * 21 + [20.0] * (int((days >= "2026-03-02").sum()) - 21)),
+    }
+    trades = [trade("STK", "2026-02-02", 100.0), trade("STK", "2026-03-02", 100.0)]
+
+    _, metrics, _ = engine.analyze(trades, partitions, TODAY, BENCHMARKS, "MKT")
+    by_label = {metric["label"]: metric for metric in metrics}
+    labels = engine.benchmark_spec(BENCHMARKS).labels
+
+    new = by_label[f"{labels['NEW']} Value"]
+    assert new["value"] == "$200"
+    assert new["delta"] == "$100 | 100.00%"
+    assert "$100" in new["help"]
+
+    market = by_label[f"{labels['MKT']} Value"]
+    assert market["delta"] == "$0 | 0.00%"
+    assert "help" not in market
+
+
+def test_uncounted_trades_are_left_out_of_every_value_delta():
+    days = pd.bdate_range("2026-01-01", TODAY)
+    partitions = {"STK": p.compact(days, [10.0] * (len(days) - 1) + [15.0]), "MKT": p.compact(days, 10.0), "NEW": p.compact(days, 10.0)}
+    # no prices for GONE, so the engine never counts its trade
+    trades = [trade("STK", "2026-02-02", 100.0), trade("GONE", "2026-02-02", 50.0)]
+
+    _, metrics, _ = engine.analyze(trades, partitions, TODAY, BENCHMARKS, "MKT")
+    by_label = {metric["label"]: metric for metric in metrics}
+    labels = engine.benchmark_spec(BENCHMARKS).labels
+
+    picks = by_label[f"{c.STOCK_PORTFOLIO_LABEL} Value"]
+    assert picks["delta"] == "$50 | 50.00%"
+    for name in BENCHMARKS:
+        assert by_label[f"{labels[name]} Value"]["delta"] == "$0 | 0.00%"
+        assert "help" not in by_label[f"{labels[name]} Value"]
+
+
+def per_trade_loop(df, market):
+    """the portfolio, market and invested curves as the app computed them before the engine, one trade at a time"""
+    portfolio, market_shares, invested = {}, 0.0, 0.0
+    curves = []
+    for i, trades in enumerate(df["trades"]):
+        market_price = df[market].iloc[i]
+        for t in trades:
+            price = df[t["ticker"]].iloc[i] if t["ticker"] in df.columns else None
+            if pd.notna(price) and price > 0 and pd.notna(market_price) and market_price > 0:
+                portfolio[t["ticker"]] = portfolio.get(t["ticker"], 0.0) + t["amount"] / price
+                market_shares += t["amount"] / market_price
+                invested += t["amount"]
+        value = sum(qty * df[ticker].iloc[i] for ticker, qty in portfolio.items() if pd.notna(df[ticker].iloc[i]))
+        curves.append((value, market_shares * market_price, invested))
+    return [list(curve) for curve in zip(*curves)]
+
+
+def test_curves_match_hand_computed_values():
+    nan = float("nan")
+    prices = pd.DataFrame({
+        "Date": pd.to_datetime(["2026-01-05", "2026-01-06", "2026-01-07", "2026-01-08", "2026-01-09", "2026-01-12"]),
+        "STK": [10.0, 11.0, 12.0, 12.0, 13.0, 14.0],
+        "LATE": [nan, nan, nan, 20.0, 22.0, 25.0],  # lists on the 8th
+        "MKT": [100.0, 100.0, 110.0, 110.0, 120.0, 125.0],
+    })
+    trades = [
+        trade("STK", "2026-01-05", 100.0),   # 10 STK, 1 MKT
+        trade("LATE", "2026-01-06", 50.0),   # before LATE lists: not counted
+        trade("STK", "2026-01-10", 70.0),    # a Saturday, no closes: not counted
+        trade("LATE", "2026-01-08", 40.0),   # 2 LATE, 4/11 MKT
+    ]
+    res = engine.generate_results(trades, prices, {"MKT": {"MKT": 1.0}}, "MKT")
+
+    portfolio = [100.0, 110.0, 120.0, 160.0, 174.0, 190.0]
+    market = [100.0, 100.0, 110.0, 150.0, 15 / 11 * 120, 15 / 11 * 125]
+    invested = [100.0, 100.0, 100.0, 140.0, 140.0, 140.0]
+    np.testing.assert_allclose(res[c.STOCK_PORTFOLIO_COL_NAME], portfolio)
+    np.testing.assert_allclose(res[c.MARKET_PORTFOLIO_COL_NAME], market)
+    np.testing.assert_allclose(res["total_invested"], invested)
+
+    # and the same as the per-trade loop the engine replaced
+    np.testing.assert_allclose(per_trade_loop(res, "MKT"), [portfolio, market, invested])
+
+
+def test_curves_match_the_per_trade_loop_on_random_trades():
+    rng = np.random.default_rng(7)
+    dates = pd.bdate_range("2025-01-01", periods=120)
+    prices = pd.DataFrame({"Date": dates})
+    for ticker in ["AAA", "BBB", "CCC", "MKT"]:
+        prices[ticker] = 50 * np.exp(np.cumsum(rng.normal(0, 0.02, len(dates))))
+    prices.loc[:40, "CCC"] = np.nan  # lists later
+
+    calendar = pd.date_range(dates[0], dates[-1])  # weekends included
+    trades = [
+        trade(rng.choice(["AAA", "BBB", "CCC", "ZZZ"]), calendar[rng.integers(len(calendar))].strftime(c.DATES_FORMAT), float(rng.integers(10, 500)))
+        for _ in range(60)
+    ]
+    res = engine.generate_results(trades, prices, {"MKT": {"MKT": 1.0}}, "MKT")
+
+    expected = per_trade_loop(res, "MKT")
+    np.testing.assert_allclose(res[[c.STOCK_PORTFOLIO_COL_NAME, c.MARKET_PORTFOLIO_COL_NAME, "total_invested"]].to_numpy().T, expected)
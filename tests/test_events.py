@@ -0,0 +1,46 @@
+import pytest
+import pandas as pd
+import config as c
+import utils.events as events
+
+
+@pytest.fixture(autouse=True)
+def store(aws, monkeypatch, tmp_path):
+    monkeypatch.setattr(c, "DISK_CACHE_DIR", str(tmp_path))
+    events.decoded_tables.clear()
+
+
+def split(day, ratio):
+    return pd.DataFrame({"day": [day], "dividend": [0.0], "split": [ratio], "factor": [1 / ratio]})
+
+
+def test_concurrent_records_keep_both_writers_rows(monkeypatch):
+    read_version = events._read_version
+    interrupted = []
+
+    def racing_read():
+        version = read_version()
+        if not interrupted:
+            # another session records its events between this read and the write
+            interrupted.append(True)
+            events.record({"BBB": split(20000, 3.0)})
+        return version
+
+    events.record({"AAA": split(19000, 2.0)})
+    monkeypatch.setattr(events, "_read_version", racing_read)
+    events.record({"AAA": split(19500, 4.0)})
+
+    table = events.read()
+    assert table["AAA"]["day"].tolist() == [19000, 19500]
+    assert table["BBB"]["day"].tolist() == [20000]
+
+
+def test_first_record_creates_the_table():
+    events.record({"AAA": split(19000, 2.0)})
+    assert events.read()["AAA"]["split"].tolist() == [2.0]
+
+
+def test_gives_up_when_the_table_keeps_changing(monkeypatch):
+    monkeypatch.setattr(events.disk_cache, "put", lambda *args, **kwargs: False)
+    with pytest.raises(RuntimeError):
+        events.record({"AAA": split(19000, 2.0)})
@@ -0,0 +1,35 @@
+import io
+import json
+import pytest
+import pandas as pd
+import utils.export as export
+
+from streamlit.runtime.download_data_util import convert_data_to_bytes_and_infer_mime
+
+
+@pytest.fixture
+def res(monkeypatch):
+    # a few rows per chunk, so exports span several of them
+    monkeypatch.setattr(export.c, "EXPORT_CHUNK_ROWS", 2)
+    return pd.DataFrame({
+        "Date": pd.date_range("2026-01-01", periods=5),
+        "portfolio_value": [100.0, 101.0, 102.5, 99.0, 110.0],
+        "trades": [[{"ticker": "ABC", "amount": 100.0}], [], [], [], []],
+    })
+
+
+def download(res, selected, fmt):
+    """the bytes a download button would serve for this export"""
+    data, _ = convert_data_to_bytes_and_infer_mime(export.exporter(res, selected, fmt)(), RuntimeError("unsupported"))
+    return data
+
+
+def test_csv_download(res):
+    exported = pd.read_csv(io.BytesIO(download(res, ["Date", "portfolio_value", "trades"], "CSV")))
+    assert exported["portfolio_value"].tolist() == res["portfolio_value"].tolist()
+    assert json.loads(exported["trades"][0]) == res["trades"][0]
+
+
+def test_parquet_download(res):
+    exported = pd.read_parquet(io.BytesIO(download(res, ["Date", "portfolio_value"], "Parquet")))
+    pd.testing.assert_frame_equal(exported, res[["Date", "portfolio_value"]])
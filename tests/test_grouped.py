@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+import config as c
+import utils.engine as engine
+
+BENCHMARKS = {"MKT": {"MKT": 1.0}, "MIX": {"MKT": 0.5, "BND": 0.5}}
+VALUE_COLS = [c.STOCK_PORTFOLIO_COL_NAME, "market_value", "MIX_value", "total_invested"]
+
+
+def price_table():
+    rng = np.random.default_rng(3)
+    dates = pd.bdate_range("2025-01-01", periods=90)
+    prices = pd.DataFrame({"Date": dates})
+    for ticker in ["AAA", "BBB", "CCC", "MKT", "BND"]:
+        prices[ticker] = 40 * np.exp(np.cumsum(rng.normal(0, 0.02, len(dates))))
+    prices.loc[:20, "BND"] = np.nan  # the blend only counts trades after BND lists
+    return prices
+
+
+def trade(ticker, day, amount, tags=()):
+    return {"ticker": ticker, "date": day, "amount": amount, "tags": list(tags), "source": [], "notes": ""}
+
+
+TRADES = [
+    trade("AAA", "2025-01-02", 100.0, ["growth"]),
+    trade("BBB", "2025-02-03", 250.0, ["growth", "dividend"]),
+    trade("CCC", "2025-03-03", 75.0),
+    trade("AAA", "2025-04-01", 40.0, ["dividend"]),
+]
+
+
+def test_group_sums_equal_the_ungrouped_totals():
+    # by ticker, every trade falls in exactly one group
+    grouped = engine.generate_grouped(TRADES, price_table(), "ticker", benchmarks=BENCHMARKS, market="MKT")
+    res = engine.generate_results(TRADES, price_table(), BENCHMARKS, "MKT")
+
+    sums = grouped.groupby("Date", observed=True)[VALUE_COLS].sum()
+    np.testing.assert_allclose(sums.to_numpy(), res[VALUE_COLS].to_numpy())
+
+
+def test_each_group_matches_its_own_filtered_run():
+    grouped = engine.generate_grouped(TRADES, price_table(), "tags", benchmarks=BENCHMARKS, market="MKT")
+    assert list(grouped["group"].cat.categories) == ["(none)", "dividend", "growth"]
+
+    for group, trades in {
+        "growth": TRADES[:2],
+        "dividend": TRADES[1:2] + TRADES[3:],  # the trade tagged with both lands in both groups
+        c.UNGROUPED_LABEL: TRADES[2:3],
+    }.items():
+        res = engine.generate_results(trades, price_table(), BENCHMARKS, "MKT")
+        curves = grouped[grouped["group"] == group][VALUE_COLS].to_numpy()
+        np.testing.assert_allclose(curves, res[VALUE_COLS].to_numpy())
+
+
+def test_empty_input_summary_has_every_column():
+    grouped = engine.generate_grouped([], price_table(), "tags", benchmarks=BENCHMARKS, market="MKT")
+    summary = engine.group_summary(grouped, BENCHMARKS, "MKT")
+
+    full = engine.group_summary(engine.generate_grouped(TRADES, price_table(), "tags", benchmarks=BENCHMARKS, market="MKT"), BENCHMARKS, "MKT")
+    assert summary.empty
+    assert list(summary.columns) == list(full.columns)
+    assert {"annualized_return", "market_annualized_return", "time_weighted_return"} <= set(summary.columns)
@@ -0,0 +1,40 @@
+import utils.helpers as h
+
+from utils.trade_index import TradeIndex
+
+
+def trade(ticker, day, amount=100.0, notes=""):
+    return {"ticker": ticker, "date": day, "amount": amount, "tags": [], "source": [], "notes": notes}
+
+
+TRADES = [trade("AAA", "2026-01-02"), trade("BBB", "2026-01-05"), trade("CCC", "2026-01-06")]
+
+
+def test_identical_trades_are_no_change():
+    assert h.diff_trades(TradeIndex(TRADES), [dict(t) for t in reversed(TRADES)]) == ([], [], [])
+
+
+def test_edit_on_the_same_ticker_and_date_is_a_change():
+    edited = trade("BBB", "2026-01-05", amount=150.0, notes="topped up")
+    added, removed, changed = h.diff_trades(TradeIndex(TRADES), [TRADES[0], edited, TRADES[2]])
+    assert (added, removed, changed) == ([], [], [(1, edited)])
+
+
+def test_additions_and_removals():
+    new = trade("DDD", "2026-01-07")
+    added, removed, changed = h.diff_trades(TradeIndex(TRADES), [TRADES[0], TRADES[2], new])
+    assert (added, removed, changed) == ([new], [1], [])
+
+
+def test_repeated_identical_trades_are_counted():
+    index = TradeIndex([TRADES[0], TRADES[0]])
+    added, removed, changed = h.diff_trades(index, [TRADES[0]])
+    # either copy may go, but only one
+    assert (added, len(removed), changed) == ([], 1, [])
+    assert h.diff_trades(index, [TRADES[0]] * 3) == ([TRADES[0]], [], [])
+
+
+def test_removed_positions_skip_already_removed_trades():
+    index = TradeIndex(TRADES)
+    index.remove(0)
+    assert h.diff_trades(index, TRADES[1:2]) == ([], [2], [])
@@ -0,0 +1,36 @@
+import io
+import pytest
+import utils.importer as importer
+
+
+@pytest.fixture(autouse=True)
+def store(aws):
+    pass
+
+
+def test_security_type_column_is_not_an_action():
+    csv = io.StringIO(
+        "Symbol,Trade Date,Amount,Type\n"
+        "AAPL,2024-01-02,100.00,Stock\n"
+        "VTI,2024-01-03,250.00,ETF\n"
+    )
+    mapping = importer.guess_mapping(importer.read_header(csv))
+    assert "action" not in mapping
+
+    report = importer.import_trades(csv, "export.csv", [], known_tickers={"AAPL", "VTI"}, mapping=mapping)
+    assert [trade["ticker"] for trade in report.trades] == ["AAPL", "VTI"]
+    assert report.skipped == 0
+
+
+def test_action_column_keeps_only_buys():
+    csv = io.StringIO(
+        "Symbol,Trade Date,Amount,Action,Type\n"
+        "AAPL,2024-01-02,-100.00,Bought,Stock\n"
+        "AAPL,2024-01-05,120.00,Sold,Stock\n"
+    )
+    mapping = importer.guess_mapping(importer.read_header(csv))
+    assert mapping["action"] == "Action"
+
+    report = importer.import_trades(csv, "export.csv", [], known_tickers={"AAPL"}, mapping=mapping)
+    assert [(trade["ticker"], trade["amount"]) for trade in report.trades] == [("AAPL", 100.0)]
+    assert report.skipped == 1
@@ -0,0 +1,42 @@
+import pandas as pd
+import pytest
+import config as c
+import utils.prices as p
+
+from datetime import date
+
+TODAY = date(2026, 10, 16)
+START = date(2026, 1, 2)
+
+
+@pytest.fixture(autouse=True)
+def store(aws):
+    pass
+
+
+def partition(raw):
+    stored = p.compact(pd.bdate_range(START, "2026-10-14"), 100.0)
+    stored.attrs["coverage_start"] = START.strftime(c.DATES_FORMAT)
+    if raw:
+        stored.attrs["closes"] = "raw"
+    return stored
+
+
+def test_page_loads_leave_legacy_partitions_alone():
+    plan = p.plan_refresh({"ABC": partition(raw=False)}, {"ABC": START}, TODAY, include_updates=False)
+    assert plan == {}
+
+
+def test_legacy_partitions_are_not_topped_up_without_migrating():
+    plan = p.plan_refresh({"ABC": partition(raw=False)}, {"ABC": START}, TODAY)
+    assert plan == {}
+
+
+def test_migration_refetches_legacy_partitions_in_full():
+    plan = p.plan_refresh({"ABC": partition(raw=False)}, {"ABC": START}, TODAY, migrate=True)
+    assert plan == {"ABC": START}
+
+
+def test_raw_partitions_are_topped_up():
+    plan = p.plan_refresh({"ABC": partition(raw=True)}, {"ABC": START}, TODAY, migrate=True)
+    assert plan == {"ABC": date(2026, 10, 15)}
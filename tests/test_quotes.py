@@ -0,0 +1,90 @@
+import time
+import threading
+import numpy as np
+import pandas as pd
+import pytest
+import utils.prices as p
+import utils.quotes as quotes
+import utils.downloader as downloader
+
+from datetime import date
+
+TODAY = date(2026, 10, 16)
+STORED = pd.to_datetime(["2026-10-13", "2026-10-14", "2026-10-15"])
+
+
+@pytest.fixture(autouse=True)
+def fresh_quotes(aws, monkeypatch, tmp_path):
+    monkeypatch.setattr(quotes.c, "DISK_CACHE_DIR", str(tmp_path))
+    quotes.quote_cache.clear()
+
+
+def test_split_on_quote_day_is_not_a_loss(monkeypatch):
+    # a 2:1 split today: the close halves as printed, but nobody lost anything
+    def fetch_history(ticker, start_date, end_date):
+        dates = pd.to_datetime(["2026-10-14", "2026-10-15", "2026-10-16"])
+        close = pd.Series([100.0, 100.0, 50.0], index=dates)
+        events = pd.DataFrame({"dividend": [0.0], "split": [2.0]}, index=dates[-1:])
+        return close, events
+
+    monkeypatch.setattr(downloader, "_fetch_history", fetch_history)
+    stored = {"ABC": p.compact(STORED, [100.0, 100.0, 100.0])}
+
+    live = quotes.recent(quotes.stale(stored, TODAY), TODAY)
+    events_table = quotes.overlay_events({}, stored, live)
+    prices = p.build_matrix(quotes.overlay(stored, live), ["ABC"], STORED[0].date(), TODAY, events_table)
+
+    np.testing.assert_allclose(prices["ABC"], [50.0, 50.0, 50.0, 50.0])
+
+
+def test_stored_events_win_over_quoted(monkeypatch):
+    def fetch_history(ticker, start_date, end_date):
+        dates = pd.to_datetime(["2026-10-15", "2026-10-16"])
+        close = pd.Series([100.0, 50.0], index=dates)
+        events = pd.DataFrame({"dividend": [0.0, 0.0], "split": [4.0, 2.0]}, index=dates)
+        return close, events
+
+    monkeypatch.setattr(downloader, "_fetch_history", fetch_history)
+    stored = {"ABC": p.compact(STORED, [400.0, 400.0, 100.0])}
+    stored_events = {"ABC": pd.DataFrame({"day": p.to_days(STORED[-1:]), "dividend": [0.0], "split": [4.0], "factor": [0.25]})}
+
+    live = quotes.recent(quotes.stale(stored, TODAY), TODAY)
+    events_table = quotes.overlay_events(stored_events, stored, live)
+
+    np.testing.assert_array_equal(events_table["ABC"]["split"], [4.0, 2.0])
+
+
+def slow_history(delays, calls):
+    def fetch_history(ticker, start_date, end_date):
+        calls.append(ticker)
+        time.sleep(delays.get(ticker, 0))
+        return pd.Series([100.0], index=pd.to_datetime(["2026-10-16"])), pd.DataFrame(columns=["dividend", "split"])
+    return fetch_history
+
+
+def test_unrelated_tickers_dont_wait_on_each_other(monkeypatch):
+    calls = []
+    monkeypatch.setattr(downloader, "_fetch_history", slow_history({"SLOW": 1.0}, calls))
+    slow = threading.Thread(target=quotes.recent, args=(["SLOW"], TODAY))
+    slow.start()
+    while "SLOW" not in calls:
+        time.sleep(0.01)
+
+    started = time.monotonic()
+    assert not quotes.recent(["FAST"], TODAY)["FAST"].empty
+    assert time.monotonic() - started < 0.5
+    slow.join()
+
+
+def test_concurrent_requests_share_one_download(monkeypatch):
+    calls = []
+    monkeypatch.setattr(downloader, "_fetch_history", slow_history({"ABC": 0.3}, calls))
+    results = []
+    sessions = [threading.Thread(target=lambda: results.append(quotes.recent(["ABC"], TODAY))) for _ in range(4)]
+    for session in sessions:
+        session.start()
+    for session in sessions:
+        session.join()
+
+    assert calls == ["ABC"]
+    assert all(not result["ABC"].empty for result in results)
@@ -0,0 +1,49 @@
+import pytest
+import pandas as pd
+import config as c
+import utils.prices as p
+import refresh_prices
+
+from zoneinfo import ZoneInfo
+from datetime import date
+from datetime import datetime as dt
+
+MARKET = ZoneInfo(c.MARKET_TIMEZONE)
+
+
+def at(month, day, hour, minute=0):
+    return dt(2026, month, day, hour, minute, tzinfo=MARKET)
+
+
+def test_next_run_is_after_todays_close_on_a_weekday():
+    assert refresh_prices.next_run(at(10, 14, 9)) == at(10, 14, 16, 30)
+
+
+def test_next_run_skips_the_weekend():
+    # Friday after the close, and all through the weekend, wait for Monday's close
+    assert refresh_prices.next_run(at(10, 16, 17)) == at(10, 19, 16, 30)
+    assert refresh_prices.next_run(at(10, 17, 12)) == at(10, 19, 16, 30)
+    assert refresh_prices.next_run(at(10, 18, 23)) == at(10, 19, 16, 30)
+
+
+def test_next_run_keeps_market_time_across_a_clock_change():
+    assert refresh_prices.next_run(at(10, 30, 17)) == at(11, 2, 16, 30)
+
+
+def test_last_final_date_is_a_trading_day():
+    assert refresh_prices.last_final_date(at(10, 16, 17)) == date(2026, 10, 16)
+    assert refresh_prices.last_final_date(at(10, 18, 12)) == date(2026, 10, 16)
+    assert refresh_prices.last_final_date(at(10, 19, 9)) == date(2026, 10, 16)
+
+
+def test_runs_without_a_new_trading_day_fetch_nothing(aws, monkeypatch):
+    stored = p.compact(pd.bdate_range("2026-09-01", "2026-10-16"), 100.0)
+    stored.attrs.update({"coverage_start": "2026-09-01", "closes": "raw"})
+    saturday = type("Clock", (), {"now": staticmethod(lambda tz: at(10, 17, 18))})
+
+    monkeypatch.setattr(refresh_prices, "dt", saturday)
+    monkeypatch.setattr(refresh_prices, "required_start_dates", lambda: {"ABC": date(2026, 9, 1)})
+    monkeypatch.setattr(p, "read_partitions", lambda start_dates: {"ABC": stored})
+    monkeypatch.setattr(p, "refresh_partitions", lambda *args, **kwargs: pytest.fail("fetched without a new trading day"))
+
+    refresh_prices.refresh()
@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+import config as c
+import utils.engine as engine
+
+
+def solve(*series):
+    """engine.xirr over [(years, flows), ...], one series each"""
+    problems = np.concatenate([np.full(len(years), i) for i, (years, _) in enumerate(series)])
+    years = np.concatenate([years for years, _ in series])
+    flows = np.concatenate([flows for _, flows in series])
+    return engine.xirr(problems, flows, years, len(series))
+
+
+def bisect(years, flows):
+    """the rate zeroing the series' value at its end, by plain bisection on the rate"""
+    years, flows = np.asarray(years, dtype=float), np.asarray(flows, dtype=float)
+    npv = lambda rate: np.sum(flows * (1 + rate) ** (years.max() - years))
+    lo, hi = -0.9999, 1e4
+    for _ in range(300):
+        mid = (lo + hi) / 2
+        lo, hi = (mid, hi) if np.sign(npv(mid)) == np.sign(npv(lo)) else (lo, mid)
+    return (lo + hi) / 2
+
+
+def test_single_flow_has_the_closed_form_rate():
+    rates = solve(([0.0, 2.0], [-100.0, 121.0]), ([0.0, 0.5], [-100.0, 90.0]))
+    np.testing.assert_allclose(rates, [0.1, 0.9 ** 2 - 1])
+
+
+@pytest.mark.parametrize("years, flows", [
+    # a quarter's 5x: Newton's first step from the 10% guess leaves the bracket, so it bisects
+    ([0.0, 0.25], [-100.0, 500.0]),
+    # nearly everything lost
+    ([0.0, 1.0], [-100.0, 0.5]),
+    # several buys, a loss on the early money and a gain on the late
+    ([0.0, 0.3, 0.9, 1.5, 1.5], [-1000.0, -250.0, -4000.0, -10.0, 5400.0]),
+])
+def test_matches_bisection(years, flows):
+    np.testing.assert_allclose(solve((np.array(years), np.array(flows))), [bisect(years, flows)], rtol=1e-8)
+
+
+def test_series_without_a_sign_change_are_nan():
+    rates = solve(
+        ([0.0, 1.0], [-100.0, -50.0]),      # money only goes in
+        ([0.0, 1.0], [100.0, 50.0]),        # money only comes out
+        ([0.0, 1.0], [-100.0, np.nan]),     # an unreadable flow
+        ([0.0, 10 / 365.25], [-100.0, 110.0]),  # shorter than c.ANNUALIZE_MIN_DAYS
+        ([0.0, 1.0], [-100.0, 120.0]),      # solved alongside the rest
+    )
+    assert np.isnan(rates[:4]).all()
+    np.testing.assert_allclose(rates[4], 0.2)
+
+
+def test_time_weighted_return_ignores_when_money_was_added():
+    years = np.array([0.0, 0.5, 1.0])
+    # 10% while 100 is in, 200 more added at the day's close, then 20% on everything
+    invested = np.array([[100.0], [300.0], [300.0]])
+    values = np.array([[100.0], [310.0], [372.0]])
+    np.testing.assert_allclose(engine.time_weighted_returns(years, invested, values), [1.1 * 1.2 - 1])
+
+
+def test_time_weighted_return_starts_when_money_does():
+    years = np.array([0.0, 1.0, 2.0])
+    invested = np.array([[0.0, 100.0], [100.0, 100.0], [100.0, 100.0]])
+    values = np.array([[0.0, 100.0], [100.0, 150.0], [150.0, 225.0]])
+    np.testing.assert_allclose(engine.time_weighted_returns(years, invested, values), [0.5, 0.5])
+
+
+def test_short_histories_are_not_annualized():
+    years = np.array([0.0, (c.ANNUALIZE_MIN_DAYS - 1) / engine.DAYS_PER_YEAR])
+    assert np.isnan(engine.time_weighted_returns(years, np.array([[100.0], [100.0]]), np.array([[100.0], [101.0]]))).all()
@@ -0,0 +1,67 @@
+import time
+import pytest
+import config as c
+import utils.symbols as symbols
+import utils.downloader as downloader
+
+from yfinance.exceptions import YFTzMissingError
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache(aws, monkeypatch):
+    """an empty negative cache, re-read from the (mocked) bucket on every call"""
+    monkeypatch.setattr(symbols, "_entries", {})
+    monkeypatch.setattr(symbols, "_loaded_at", None)
+    symbols.valid_symbols.clear()
+
+
+def missing_timezone(ticker, start_date, end_date):
+    raise YFTzMissingError(ticker)
+
+
+def test_missing_timezone_is_not_marked_invalid(monkeypatch):
+    marked = []
+    monkeypatch.setattr(downloader, "_fetch_history", missing_timezone)
+    monkeypatch.setattr(symbols, "mark_invalid", lambda failures: marked.append(dict(failures)))
+
+    assert symbols.unknown(["AAPL"]) == {}
+    assert all("AAPL" not in failures for failures in marked)
+
+
+def test_missing_timezone_across_runs_marks_invalid(monkeypatch):
+    monkeypatch.setattr(downloader, "_fetch_history", missing_timezone)
+    now = time.time()
+    for run in range(c.INVALID_SYMBOL_STRIKES):
+        monkeypatch.setattr(time, "time", lambda: now + run * c.INVALID_SYMBOL_STRIKE_INTERVAL_SECONDS)
+        found = symbols.unknown(["NOPE"])
+        assert ("NOPE" in found) == (run == c.INVALID_SYMBOL_STRIKES - 1)
+
+
+def test_strikes_count_once_per_interval(monkeypatch):
+    monkeypatch.setattr(downloader, "_fetch_history", missing_timezone)
+    for _ in range(c.INVALID_SYMBOL_STRIKES + 1):
+        assert symbols.unknown(["NOPE"]) == {}
+
+
+def test_invalid_symbols_expire_after_ttl(monkeypatch):
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now)
+    symbols.mark_invalid({"GONE": "delisted"})
+    assert symbols.invalid(["GONE"]) == {"GONE": "delisted"}
+
+    monkeypatch.setattr(time, "time", lambda: now + c.INVALID_SYMBOL_TTL_SECONDS)
+    assert symbols.invalid(["GONE"]) == {}
+
+
+def test_expired_strikes_no_longer_count(monkeypatch):
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now)
+    for _ in range(c.INVALID_SYMBOL_STRIKES - 1):
+        symbols.strike({"NOPE": "no timezone"})
+        now += c.INVALID_SYMBOL_STRIKE_INTERVAL_SECONDS
+
+    # the earlier strikes lapse, so the next one starts the count over
+    now += c.INVALID_SYMBOL_TTL_SECONDS
+    symbols.strike({"NOPE": "no timezone"})
+    assert symbols.invalid(["NOPE"]) == {}
+    assert symbols._load(force=True)["NOPE"]["strikes"] == 1
@@ -0,0 +1,50 @@
+from utils.trade_index import TradeIndex
+
+
+def trade(ticker, tags=(), source=(), day="2026-01-02", amount=100.0):
+    return {"ticker": ticker, "date": day, "amount": amount, "tags": list(tags), "source": list(source), "notes": ""}
+
+
+TRADES = [
+    trade("AAA", ["growth", "tech"], ["blog"]),
+    trade("BBB", ["growth"], ["friend"]),
+    trade("CCC", ["tech"]),
+    trade("AAA", [], ["blog"]),
+]
+
+
+def selected(index, bits):
+    return index.positions(bits).tolist()
+
+
+def test_tags_combine_with_or_and_and():
+    index = TradeIndex(TRADES)
+    assert selected(index, index.filter(tags=["growth", "tech"])) == [0, 1, 2]
+    assert selected(index, index.filter(tags=["growth", "tech"], match_all_tags=True)) == [0]
+
+
+def test_filters_intersect_across_fields():
+    index = TradeIndex(TRADES)
+    assert selected(index, index.filter(tags=["growth"], sources=["blog"])) == [0]
+    assert selected(index, index.filter(sources=["blog"], tickers=["AAA"])) == [0, 3]
+    assert index.tickers(index.filter(tags=["tech"])) == {"AAA", "CCC"}
+
+
+def test_empty_selection_matches_every_trade():
+    index = TradeIndex(TRADES)
+    assert selected(index, index.filter()) == [0, 1, 2, 3]
+    assert index.select(index.filter()) == TRADES
+    assert index.filter(tags=["unknown"]) == 0
+
+
+def test_edits_keep_positions_and_postings_in_step():
+    index = TradeIndex(TRADES)
+    index.remove(1)
+    index.update(2, trade("CCC", ["growth"]))
+    pos = index.add(trade("DDD", ["tech"]))
+
+    assert pos == 4 and len(index) == 4
+    assert index.values("tags") == {"growth", "tech"}
+    assert index.positions(index.match("tags", ["growth"])).tolist() == [0, 2]
+    assert index.positions(index.match("tags", ["tech"])).tolist() == [0, 4]
+    assert index.values("source") == {"blog"}
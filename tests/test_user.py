@@ -0,0 +1,46 @@
+import os
+import sys
+import subprocess
+
+from pathlib import Path
+
+# an exit-time flush can only be seen from inside the exiting process: the
+# check is registered before utils.user is imported, so atexit runs it after
+# the flush, while the moto mock still holds the table
+EXITING_PROCESS = """
+import atexit
+import config as c
+from moto import mock_aws
+
+mock = mock_aws()
+mock.start()
+c.ddb.create_table(
+    TableName=c.USERS_TABLE,
+    KeySchema=[{"AttributeName": "user_id", "KeyType": "HASH"}],
+    AttributeDefinitions=[{"AttributeName": "user_id", "AttributeType": "S"}],
+    BillingMode="PAY_PER_REQUEST",
+)
+
+def report():
+    item = c.ddb.Table(c.USERS_TABLE).get_item(Key={"user_id": "u1"}).get("Item", {})
+    print("num_exports", item.get("num_exports"))
+
+atexit.register(report)
+
+import utils.user as u
+
+user = u.User.__new__(u.User)
+user.user_id = "u1"
+user.increment_attribute("num_exports")
+user.increment_attribute("num_exports", 2)
+"""
+
+
+def test_buffered_increments_are_written_at_exit():
+    root = Path(__file__).resolve().parent.parent
+    result = subprocess.run(
+        [sys.executable, "-c", EXITING_PROCESS],
+        cwd=root, env=dict(os.environ, PYTHONPATH=str(root)), capture_output=True, text=True, timeout=60,
+    )
+    assert result.returncode == 0, result.stderr
+    assert "num_exports 3" in result.stdout
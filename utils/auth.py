@@ -2,7 +2,6 @@ import time
 import traceback
 import streamlit as st
 
-from utils.user import User
 from utils.logger import logger
 
 # the provider name here must match the [auth.<name>] section in secrets.toml
@@ -53,6 +52,9 @@ def ensure_user_loaded():
     if st.session_state.get("user") is not None:
         return
 
+    # imported here so the logged-out landing never loads the user/AWS stack
+    from utils.user import User
+
     try:
         # st.user behaves like a mapping of OIDC claims returned by Google
         payload = {
@@ -0,0 +1,108 @@
+import json
+import time
+import hashlib
+import threading
+import pandas as pd
+import utils.telemetry as telemetry
+
+from collections import OrderedDict
+
+_MISSING = object()
+
+
+class LRUCache:
+    """
+    A small thread-safe LRU cache bounded by entry count and, optionally, by
+    an approximate byte budget. With a ttl (seconds), entries also expire.
+
+    Values are shared by reference, so callers must treat anything they get
+    back as read-only. A named cache reports its hits and misses to telemetry.
+    """
+
+    def __init__(self, max_entries, max_bytes=None, sizeof=None, ttl=None, name=None):
+        self.name = name
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof or (lambda value: 0)
+        self.ttl = ttl
+
+        self._entries = OrderedDict()  # key -> (value, size, expires_at)
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return self._get(key, _MISSING) is not _MISSING
+
+    def get(self, key, default=None):
+        value = self._get(key, _MISSING)
+        if self.name is not None:
+            telemetry.count("pickwise_cache_requests_total", cache=self.name, result="miss" if value is _MISSING else "hit")
+        return default if value is _MISSING else value
+
+    def _get(self, key, default):
+        with self._lock:
+            if key not in self._entries:
+                return default
+            value, size, expires_at = self._entries[key]
+            if expires_at is not None and time.monotonic() >= expires_at:
+                del self._entries[key]
+                self._bytes -= size
+                return default
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        size = self.sizeof(value)
+        expires_at = time.monotonic() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (value, size, expires_at)
+            self._bytes += size
+
+            # always keep the newest entry, even if it alone exceeds the byte budget
+            while len(self._entries) > 1 and (
+                len(self._entries) > self.max_entries
+                or (self.max_bytes is not None and self._bytes > self.max_bytes)
+            ):
+                _, (_, evicted_size, _) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+
+    def pop(self, key, default=None):
+        with self._lock:
+            if key not in self._entries:
+                return default
+            value, size, _ = self._entries.pop(key)
+            self._bytes -= size
+            return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+
+def digest(*parts):
+    """stable hex digest of JSON-serializable parts; dates and other objects are stringified"""
+    payload = json.dumps(parts, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.blake2b(payload.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def frame_version(df):
+    """content hash of a DataFrame, used to version cached price data"""
+    if df.empty:
+        return digest(list(df.columns))
+    row_hashes = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    return digest(list(df.columns), hashlib.blake2b(row_hashes.tobytes(), digest_size=16).hexdigest())
+
+
+def frame_nbytes(value):
+    """approximate size of a cached value, counting only the DataFrames it holds"""
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=False).sum())
+    if isinstance(value, (tuple, list)):
+        return sum(frame_nbytes(item) for item in value)
+    return 0
@@ -0,0 +1,231 @@
+"""
+Chart pipeline for the analyze section.
+
+Long histories are downsampled with Largest-Triangle-Three-Buckets (LTTB) to at
+most c.CHART_MAX_POINTS points, which keeps the visual shape (peaks, dips) that
+plain striding would lose. Trade annotations are clustered so nearby trades
+share a label instead of stacking into noise. Rendered PNGs are cached
+process-wide by results key and view mode, so toggling between $ and % reuses
+earlier renders instead of redrawing. Grouped comparisons (plot_groups) draw
+every group's portfolio against its own market shadow on one chart.
+"""
+
+import io
+import numpy as np
+import config as c
+import utils.cache as cache
+import utils.engine as engine
+import utils.telemetry as telemetry
+import matplotlib.dates as mdates
+import matplotlib.ticker as mticker
+
+from matplotlib.figure import Figure
+
+rendered_charts = cache.LRUCache(max_entries=c.CHART_CACHE_ENTRIES, name="charts")
+
+
+def lttb(x, y, threshold):
+    """
+    Indices of the points Largest-Triangle-Three-Buckets keeps when reducing
+    (x, y) to `threshold` points. Always keeps the first and last point.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=float)
+    y = np.nan_to_num(np.asarray(y, dtype=float))
+
+    # interior points are split into threshold - 2 buckets
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int)
+    selected = np.empty(threshold, dtype=np.intp)
+    selected[0] = 0
+    selected[-1] = n - 1
+
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+
+        # the next bucket's average is the third vertex of each candidate triangle
+        next_start, next_end = end, edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+
+        areas = np.abs(
+            (x[a] - avg_x) * (y[start:end] - y[a])
+            - (x[a] - x[start:end]) * (avg_y - y[a])
+        )
+        a = start + int(np.argmax(areas))
+        selected[i + 1] = a
+
+    return selected
+
+
+def cluster_trades(res, max_labels):
+    """
+    Group trade days that fall close together into annotation clusters.
+
+    Trades within 1/max_labels of the plotted date span share one cluster.
+    Returns a list of (row_position, label) anchored at each cluster's first
+    trade day.
+    """
+    trade_rows = np.flatnonzero(res["trades"].map(len).to_numpy())
+    if len(trade_rows) == 0:
+        return []
+
+    dates = res["Date"].to_numpy()
+    window = (dates[-1] - dates[0]) / max_labels
+
+    clusters = []
+    for row in trade_rows:
+        if clusters and dates[row] - dates[clusters[-1][0]] <= window:
+            clusters[-1][1].append(row)
+        else:
+            clusters.append((row, [row]))
+
+    trades_by_row = res["trades"].to_numpy()
+    annotations = []
+    for anchor, rows in clusters:
+        tickers = list(dict.fromkeys(trade["ticker"] for row in rows for trade in trades_by_row[row]))
+        label = ", ".join(tickers[:c.CHART_MAX_TICKERS_PER_LABEL])
+        if len(tickers) > c.CHART_MAX_TICKERS_PER_LABEL:
+            label += f" +{len(tickers) - c.CHART_MAX_TICKERS_PER_LABEL}"
+        annotations.append((anchor, label))
+
+    return annotations
+
+
+def plot_results(res, show_as_pct=False):
+    # a bare Figure (not pyplot) keeps no global state, so concurrent sessions can render safely
+    fig = Figure(figsize=(12, 6))
+    ax = fig.subplots()
+
+    portfolio = res[c.STOCK_PORTFOLIO_COL_NAME].to_numpy(dtype=float)
+    spec = engine.benchmark_spec()
+    benchmarks = {name: res[col].to_numpy(dtype=float) for name, col in spec.cols.items()}
+    invested = res["total_invested"].to_numpy(dtype=float)
+
+    if show_as_pct:
+        invested_safe = np.where(invested == 0, 1, invested)  # avoid division by zero; numerator is already 0
+        portfolio = (np.where(invested > 0, portfolio, 0.0) - invested) / invested_safe * 100
+        benchmarks = {
+            name: (np.where(invested > 0, values, 0.0) - invested) / invested_safe * 100
+            for name, values in benchmarks.items()
+        }
+
+    annotations = cluster_trades(res, c.CHART_MAX_ANNOTATIONS)
+
+    # keep LTTB's picks for every curve plus every trade day, so the invested
+    # steps stay exact and labels sit on plotted points
+    x = mdates.date2num(res["Date"])
+    trade_rows = np.flatnonzero(res["trades"].map(len).to_numpy())
+    keep = trade_rows
+    for values in (portfolio, *benchmarks.values()):
+        keep = np.union1d(keep, lttb(x, values, c.CHART_MAX_POINTS))
+    keep = keep.astype(np.intp)
+    dates = res["Date"].to_numpy()
+
+    ax.plot(dates[keep], portfolio[keep], label=c.STOCK_PORTFOLIO_LABEL)
+    for name, values in benchmarks.items():
+        ax.plot(dates[keep], values[keep], label=spec.labels[name])
+    if not show_as_pct:
+        # invested is a step function; drawing it as steps keeps it exact after downsampling
+        ax.step(dates[keep], invested[keep], where="post", label="Total Invested", linestyle="--", color="gray")
+
+    # Add annotations for trades
+    for anchor, label in annotations:
+        ax.annotate(
+            label,
+            xy=(dates[anchor], portfolio[anchor]),
+            xytext=(0, 10),
+            textcoords="offset points",
+            fontsize=8,
+            arrowprops=dict(arrowstyle="->", color="gray", relpos=(1, 0)),
+            ha='right'
+        )
+
+    # axis formatting
+    ax.xaxis.set_major_formatter(mdates.DateFormatter('%b %d, %Y'))
+    if show_as_pct:
+        ax.yaxis.set_major_formatter(mticker.StrMethodFormatter('{x:,.1f}%'))
+        ax.set_ylabel('Return (%)')
+    else:
+        ax.yaxis.set_major_formatter(mticker.StrMethodFormatter('${x:,.0f}'))
+        ax.set_ylabel('Portfolio Value ($)')
+    ax.tick_params(axis="x", labelrotation=45)
+
+    # Formatting
+    ax.legend()
+    ax.grid(True)
+
+    return fig
+
+
+def plot_groups(grouped, show_as_pct=False):
+    """
+    Side-by-side curves from engine.calculate_grouped_shares: each group's
+    portfolio as a solid line and its market shadow dashed in the same color.
+    """
+    fig = Figure(figsize=(12, 6))
+    ax = fig.subplots()
+
+    # the long frame is group-major, so each group is one contiguous run of rows
+    codes = grouped["group"].cat.codes.to_numpy()
+    starts = np.flatnonzero(np.diff(codes, prepend=-1))
+    dates = grouped["Date"].to_numpy()
+    portfolio = grouped[c.STOCK_PORTFOLIO_COL_NAME].to_numpy(dtype=float)
+    market = grouped[c.MARKET_PORTFOLIO_COL_NAME].to_numpy(dtype=float)
+    invested = grouped["total_invested"].to_numpy(dtype=float)
+
+    for i, (lo, hi) in enumerate(zip(starts, np.r_[starts[1:], len(codes)])):
+        group = grouped["group"].cat.categories[codes[lo]]
+        curves = portfolio[lo:hi], market[lo:hi]
+        if show_as_pct:
+            group_invested = invested[lo:hi]
+            invested_safe = np.where(group_invested == 0, 1, group_invested)
+            curves = [(np.where(group_invested > 0, values, 0.0) - group_invested) / invested_safe * 100 for values in curves]
+
+        x = mdates.date2num(dates[lo:hi])
+        keep = np.union1d(lttb(x, curves[0], c.CHART_MAX_POINTS), lttb(x, curves[1], c.CHART_MAX_POINTS)).astype(np.intp)
+        color = f"C{i % 10}"
+        ax.plot(dates[lo:hi][keep], curves[0][keep], label=group, color=color)
+        ax.plot(dates[lo:hi][keep], curves[1][keep], label=f"{group} ({c.MARKET})", color=color, linestyle="--", alpha=0.6)
+
+    ax.xaxis.set_major_formatter(mdates.DateFormatter('%b %d, %Y'))
+    if show_as_pct:
+        ax.yaxis.set_major_formatter(mticker.StrMethodFormatter('{x:,.1f}%'))
+        ax.set_ylabel('Return (%)')
+    else:
+        ax.yaxis.set_major_formatter(mticker.StrMethodFormatter('${x:,.0f}'))
+        ax.set_ylabel('Portfolio Value ($)')
+    ax.tick_params(axis="x", labelrotation=45)
+
+    ax.legend(fontsize=8, ncol=2)
+    ax.grid(True)
+
+    return fig
+
+
+def _render(plot, frame, key, show_as_pct):
+    """PNG bytes of plot(frame), cached by key and view mode"""
+    key = (key, show_as_pct)
+    png = rendered_charts.get(key)
+    if png is None:
+        with telemetry.span("chart.render", rows=len(frame), pct=show_as_pct):
+            fig = plot(frame, show_as_pct=show_as_pct)
+            buffer = io.BytesIO()
+            fig.savefig(buffer, format="png", dpi=c.CHART_DPI, bbox_inches="tight")
+            png = buffer.getvalue()
+        rendered_charts.put(key, png)
+
+    return png
+
+
+def render_results_chart(res, results_key, show_as_pct=False):
+    """PNG bytes of plot_results, cached by results key and view mode"""
+    return _render(plot_results, res, results_key, show_as_pct)
+
+
+def render_groups_chart(grouped, grouped_key, show_as_pct=False):
+    """PNG bytes of plot_groups, cached by grouped key and view mode"""
+    return _render(plot_groups, grouped, grouped_key, show_as_pct)
@@ -1,6 +1,8 @@
 import config as c
 import streamlit as st
 
+from streamlit.components.v1 import html
+
 def highlight(text, background=c.PRIMARY_COLOR, color="black", font_weight="normal", font_size="inherit", tilt=0):
     """
     Returns an HTML <span> with inline styles for highlighting text in Streamlit markdown.
@@ -82,3 +84,23 @@ def empty_space():
 
     st.markdown("")
     st.markdown("")
+
+def render_animation(name: str, height: int = 470):
+    """
+    Render an HTML/CSS animation by file stem.
+
+    These are self-contained vector animations (no GIF, no video),
+    so they stay crisp at any DPI and weigh only a few KB each.
+
+    Uses st.components.v1.html which renders in an iframe (required for isolation).
+    Note: this is deprecated after 2026-06-01 in favor of st.iframe.
+    I choose to still use this because the Streamlit app is pinned to an older version in deployment.
+    But should be warned that this would break, alongside other uses of v1 html(), if Streamlit is updated.
+
+    Args:
+        name: file stem, e.g. "example-results"
+        height: iframe height in px (default suits centered layout ~704px wide)
+    """
+    with open(f"{c.ASSETS_PATH}/animations/{name}.html", encoding="utf-8") as f:
+        html_content = f.read()
+    html(html_content, height=height, scrolling=False)
@@ -0,0 +1,154 @@
+"""
+Local disk tier in front of S3 reads.
+
+Objects are kept under c.DISK_CACHE_DIR in files named after the key and the
+ETag they were fetched with, so a body and its ETag are replaced together by a
+single rename and can never disagree. A read revalidates with a conditional GET (IfNoneMatch), so an unchanged
+object costs one 304 round trip instead of a full download, and the local copy
+is served straight from disk. Writes go through to S3 and refresh the local
+copy. The directory is capped at c.DISK_CACHE_MAX_BYTES, evicting the least
+recently used files first.
+"""
+
+import os
+import hashlib
+import tempfile
+import threading
+import config as c
+import utils.telemetry as telemetry
+
+from pathlib import Path
+from botocore.exceptions import ClientError
+
+_evict_lock = threading.Lock()
+
+
+def _name(key):
+    return hashlib.blake2b(key.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def _versions(key):
+    """local copies of key; more than one only while a newer one is being stored"""
+    return list(Path(c.DISK_CACHE_DIR).glob(f"{_name(key)}.*.data"))
+
+
+def _cached(key):
+    """(path, etag) of the newest local copy of key, or (None, None)"""
+    copies = []
+    for path in _versions(key):
+        try:
+            copies.append((path.stat().st_mtime, path))
+        except FileNotFoundError:
+            continue
+    if not copies:
+        return None, None
+    _, path = max(copies)
+    # the ETag is hex-encoded into the name, between the key's hash and the suffix
+    return path, bytes.fromhex(path.suffixes[-2][1:]).decode("utf-8")
+
+
+def _store(key, body, etag):
+    path = Path(c.DISK_CACHE_DIR) / f"{_name(key)}.{etag.encode('utf-8').hex()}.data"
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    # write to a temp file then rename, so concurrent readers never see a partial object
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent)
+    with os.fdopen(fd, "wb") as f:
+        f.write(body)
+    os.replace(tmp_path, path)
+
+    for stale in _versions(key):
+        if stale != path:
+            stale.unlink(missing_ok=True)
+
+    _evict()
+    return path
+
+
+def _discard(key):
+    for path in _versions(key):
+        path.unlink(missing_ok=True)
+
+
+def _evict():
+    """drop least recently used objects until the cache fits its size cap"""
+    with _evict_lock:
+        try:
+            files = [(path, path.stat()) for path in Path(c.DISK_CACHE_DIR).glob("*.data")]
+        except FileNotFoundError:
+            return
+
+        total = sum(stat.st_size for _, stat in files)
+        for path, stat in sorted(files, key=lambda item: item[1].st_mtime):
+            if total <= c.DISK_CACHE_MAX_BYTES:
+                break
+            path.unlink(missing_ok=True)
+            total -= stat.st_size
+
+
+def get(key):
+    """
+    Returns (path, etag) of a local copy of the S3 object, revalidated against
+    S3, or (None, None) if the object does not exist.
+    """
+    data_path, etag = _cached(key)
+
+    request = {"Bucket": c.S3_BUCKET, "Key": key}
+    if data_path is not None:
+        request["IfNoneMatch"] = etag
+
+    try:
+        response = c.s3.get_object(**request)
+    except c.s3.exceptions.NoSuchKey:
+        _discard(key)
+        return None, None
+    except ClientError as e:
+        if e.response["ResponseMetadata"]["HTTPStatusCode"] != 304:
+            raise
+        # unchanged since we cached it: bump mtime so LRU eviction sees the hit
+        try:
+            os.utime(data_path)
+        except FileNotFoundError:
+            # evicted between the existence check and now; fetch it afresh
+            _discard(key)
+            return get(key)
+        telemetry.count("pickwise_cache_requests_total", cache="disk", result="hit")
+        return data_path, etag
+
+    body = response["Body"].read()
+    telemetry.count("pickwise_cache_requests_total", cache="disk", result="miss")
+    telemetry.count("pickwise_bytes_total", len(body), op="s3_get")
+    return _store(key, body, response["ETag"]), response["ETag"]
+
+
+def get_bytes(key):
+    """object contents via the disk tier, or None if the object does not exist"""
+    path, _ = get(key)
+    return path.read_bytes() if path is not None else None
+
+
+def put(key, body, content_type, if_match=None, if_absent=False):
+    """
+    write an object to S3 and keep the local copy in step. With if_match (an
+    ETag from get) or if_absent, the write only happens if the object is still
+    at that version (or still doesn't exist); returns whether it was written
+    """
+    if isinstance(body, str):
+        body = body.encode("utf-8")
+
+    request = {"Bucket": c.S3_BUCKET, "Key": key, "Body": body, "ContentType": content_type}
+    if if_match is not None:
+        request["IfMatch"] = if_match
+    elif if_absent:
+        request["IfNoneMatch"] = "*"
+
+    try:
+        response = c.s3.put_object(**request)
+    except ClientError as e:
+        # 412: someone else wrote first; 409: a concurrent conditional write is still in flight
+        if e.response["ResponseMetadata"]["HTTPStatusCode"] not in (409, 412):
+            raise
+        return False
+    telemetry.count("pickwise_bytes_total", len(body), op="s3_put")
+    _store(key, body, response["ETag"])
+    return True
@@ -0,0 +1,175 @@
+"""
+Chunked, concurrent and retrying downloads of daily closes from Yahoo.
+
+Closes are kept as they printed: Yahoo's split adjustment is undone and its
+dividend adjustment never requested, while the splits and dividends themselves
+come back alongside, for utils.events to turn into total returns.
+
+Tickers are split into chunks that a bounded pool of workers fetches in
+parallel. Yahoo's chart endpoint serves one symbol per request (yf.download
+loops over symbols internally, and keeps its results in module-level state that
+is unsafe to share between threads), so each worker pulls its chunk symbol by
+symbol through yf.Ticker.history. Transient failures such as 429s are retried
+with jittered exponential backoff, and only the symbols that failed are retried.
+Whatever succeeded is merged, and the rest are reported back by symbol rather
+than emptying the whole batch, marked permanent when Yahoo doesn't know the
+symbol (or has had no prices for it over a window long enough that it must be
+delisted) so callers can stop asking.
+"""
+
+import time
+import random
+import config as c
+import pandas as pd
+import yfinance as yf
+import utils.telemetry as telemetry
+
+from curl_cffi import requests
+from collections import namedtuple
+from utils.logger import logger
+from datetime import timedelta as td
+from concurrent.futures import ThreadPoolExecutor
+from yfinance.exceptions import YFTickerMissingError, YFTzMissingError
+
+# session is required to avoid 429s from yfinance
+# I believe yfinance rate limits based on User-Agent header
+# which, without this session, is set to python-requests
+session = requests.Session(impersonate="chrome")
+
+# why a symbol returned nothing; permanent failures won't succeed on a retry, and
+# suspect ones point at an unknown symbol without confirming it (see _is_permanent)
+DownloadFailure = namedtuple("DownloadFailure", ["reason", "permanent", "suspect"], defaults=(False,))
+
+
+def _is_permanent(error, start_date, end_date):
+    """
+    A listed symbol trades at least once in any c.DELISTED_WINDOW_DAYS, so a
+    longer window with no prices means it's delisted rather than just quiet
+    (e.g. over a weekend). A missing timezone never is on its own: unknown
+    symbols have none, but yfinance also reports one after any failed lookup
+    (a timeout, a network error), so it is only ever suspect.
+    """
+    if isinstance(error, YFTzMissingError):
+        return False
+    return (end_date - start_date).days >= c.DELISTED_WINDOW_DAYS
+
+
+def _backoff(attempt):
+    """full-jitter exponential backoff: uniform over [0, min(cap, base * 2^attempt)]"""
+    return random.uniform(0, min(c.DOWNLOAD_BACKOFF_MAX_SECONDS, c.DOWNLOAD_BACKOFF_BASE_SECONDS * 2 ** attempt))
+
+
+@telemetry.timed("yfinance.history")
+def _fetch_history(ticker, start_date, end_date):
+    """
+    (closes, events) over the window: the closes as they actually printed, and
+    the window's splits and dividends (Date-indexed "dividend" per share and
+    "split" ratio, 1.0 when there was none).
+    """
+    history = yf.Ticker(ticker, session=session).history(
+        start=start_date,
+        end=end_date + td(days=1),
+        interval="1d",
+        auto_adjust=False,
+        actions=True,
+        raise_errors=True,
+    )
+    if history.index.tz is not None:
+        history.index = history.index.tz_localize(None)
+    history.index = history.index.normalize()
+
+    # Yahoo scales closes and dividends by every later split in the window; undo
+    # that, so stored closes never change when a split comes along
+    splits = history["Stock Splits"].where(history["Stock Splits"] > 0, 1.0) if "Stock Splits" in history else pd.Series(1.0, index=history.index)
+    later_splits = splits[::-1].cumprod()[::-1].shift(-1, fill_value=1.0)
+    dividends = history["Dividends"] * later_splits if "Dividends" in history else pd.Series(0.0, index=history.index)
+
+    close = (history["Close"] * later_splits).dropna()
+    events = pd.DataFrame({"dividend": dividends, "split": splits})
+    events = events[(events["dividend"] > 0) | (events["split"] != 1.0)]
+    return close, events
+
+
+def _fetch_chunk(start_dates, end_date):
+    """
+    Fetch one chunk of {ticker: start_date}, retrying transient failures.
+    Returns (closes, events, failed) where closes maps ticker -> Series, events
+    ticker -> its splits and dividends, and failed ticker -> DownloadFailure.
+    """
+    closes, events, failed = {}, {}, {}
+    pending = list(start_dates)
+    for attempt in range(c.DOWNLOAD_MAX_ATTEMPTS):
+        retry = []
+        for ticker in pending:
+            try:
+                closes[ticker], events[ticker] = _fetch_history(ticker, start_dates[ticker], end_date)
+                failed.pop(ticker, None)
+            except YFTzMissingError as e:
+                # an unknown symbol, or a lookup that failed in transit; only a retry tells them apart
+                failed[ticker] = DownloadFailure(str(e), permanent=False, suspect=True)
+                retry.append(ticker)
+            except YFTickerMissingError as e:
+                # Yahoo answered, there's just nothing for this symbol/window; retrying won't help
+                failed[ticker] = DownloadFailure(str(e), _is_permanent(e, start_dates[ticker], end_date))
+            except Exception as e:
+                failed[ticker] = DownloadFailure(str(e), permanent=False)
+                retry.append(ticker)
+
+        pending = retry
+        if not pending or attempt == c.DOWNLOAD_MAX_ATTEMPTS - 1:
+            break
+        time.sleep(_backoff(attempt))
+
+    return closes, events, failed
+
+
+def download_history(start_dates, end_date):
+    """
+    Pull daily closes over [start_date, end_date], where every ticker in
+    start_dates ({ticker: start_date}) has its own start, along with the splits
+    and dividends in each window. Closes are as printed, never adjusted.
+
+    Returns (close, events, failed): a wide frame with a Date column plus one
+    column per ticker that returned data, a {ticker: events} dict for those
+    with any splits or dividends (see _fetch_history), and a
+    {ticker: DownloadFailure} dict for those that returned nothing.
+    """
+    tickers = sorted(ticker for ticker, start_date in start_dates.items() if start_date <= end_date)
+    if not tickers:
+        return pd.DataFrame(), {}, {}
+
+    chunks = [
+        {ticker: start_dates[ticker] for ticker in tickers[i:i + c.DOWNLOAD_CHUNK_SIZE]}
+        for i in range(0, len(tickers), c.DOWNLOAD_CHUNK_SIZE)
+    ]
+    with telemetry.span("yfinance.download", tickers=len(tickers), start=min(start_dates.values()), end=end_date):
+        with ThreadPoolExecutor(max_workers=min(c.DOWNLOAD_MAX_WORKERS, len(chunks))) as pool:
+            results = list(pool.map(lambda chunk: _fetch_chunk(chunk, end_date), chunks))
+
+    closes, events, failed = {}, {}, {}
+    for chunk_closes, chunk_events, chunk_failed in results:
+        failed.update(chunk_failed)
+        for ticker, close in chunk_closes.items():
+            if close.empty:
+                failed[ticker] = DownloadFailure("no price data found", _is_permanent(None, start_dates[ticker], end_date))
+            else:
+                closes[ticker] = close
+                if not chunk_events[ticker].empty:
+                    events[ticker] = chunk_events[ticker]
+
+    if failed:
+        telemetry.count("pickwise_download_failures_total", len(failed))
+        logger.info(f"no prices for {len(failed)} of {len(tickers)} tickers: {', '.join(sorted(failed))}")
+
+    if not closes:
+        return pd.DataFrame(), events, failed
+
+    close = pd.concat(closes, axis=1).sort_index()
+    close.index.name = "Date"
+    return close.reset_index(), events, failed
+
+
+def download_close(start_dates, end_date):
+    """download_history without the events: (close, failed)"""
+    close, _, failed = download_history(start_dates, end_date)
+    return close, failed
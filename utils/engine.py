@@ -0,0 +1,668 @@
+"""
+Headless analysis engine.
+
+Everything here is a pure function of its inputs: the trades, the price matrix
+they are valued against, the benchmarks (name -> {ticker: weight}, defaulting
+to c.BENCHMARKS with c.MARKET as the primary one) and the analysis window.
+Nothing reads or writes st.session_state, so the same code backs the app (via
+utils.helpers, which supplies session prices and caching) and batch jobs such
+as batch_report.py that run without a browser session.
+"""
+
+import numpy as np
+import pandas as pd
+import config as c
+import utils.prices as p
+import utils.telemetry as telemetry
+
+from collections import namedtuple
+from datetime import datetime as dt
+from datetime import timedelta as td
+
+# a benchmark set resolved for the array code: weights is benchmarks x tickers, rows in the
+# order of cols (name -> results column) and labels, columns in the order of tickers
+BenchmarkSpec = namedtuple("BenchmarkSpec", ["market", "tickers", "weights", "cols", "labels"])
+
+# bounds on the annual rate, convergence tolerance (on log(1 + rate)) and iteration cap of the XIRR solve
+XIRR_RATE_BOUNDS = (-0.9999, 1e4)
+XIRR_TOLERANCE = 1e-12
+XIRR_MAX_ITERATIONS = 100
+DAYS_PER_YEAR = 365.25
+
+# the trades of a results frame that count, as parallel arrays (see _value_trades)
+ValuedTrades = namedtuple(
+    "ValuedTrades", ["trades", "rows", "cols", "amounts", "shares", "benchmark_shares", "prices", "benchmark_prices"]
+)
+
+
+def _resolve_benchmarks(benchmarks, market):
+    tickers = sorted({ticker for weights in benchmarks.values() for ticker in weights})
+    weights = np.array([[weights.get(ticker, 0.0) for ticker in tickers] for weights in benchmarks.values()])
+    cols = {name: c.MARKET_PORTFOLIO_COL_NAME if name == market else f"{name}_value" for name in benchmarks}
+    labels = {
+        name: f"100% {name} Portfolio" if len(weights) == 1 else f"{name} Portfolio"
+        for name, weights in benchmarks.items()
+    }
+    return BenchmarkSpec(market, tickers, weights, cols, labels)
+
+
+DEFAULT_BENCHMARKS = _resolve_benchmarks(c.BENCHMARKS, c.MARKET)
+
+
+def benchmark_spec(benchmarks=None, market=None):
+    """the resolved benchmark set; the configured one unless benchmarks are given"""
+    if benchmarks is None:
+        return DEFAULT_BENCHMARKS
+    return _resolve_benchmarks(benchmarks, market or next(iter(benchmarks)))
+
+
+def analysis_window(trades, today=None):
+    """(first, last) date analysed: NUM_DAYS_PRECEDING_ANALYSIS days before the earliest trade through today"""
+    latest_date = today or dt.today().date()
+    if not trades:
+        return latest_date, latest_date
+    earliest_date = min(dt.strptime(trade["date"], c.DATES_FORMAT).date() for trade in trades)
+    return earliest_date - td(days=c.NUM_DAYS_PRECEDING_ANALYSIS), latest_date
+
+
+def price_matrix(partitions, trades, window, benchmarks=None, market=None, events_table=None):
+    """
+    The Date x ticker closes for the traded tickers and the benchmarks' over
+    window, forward-filled across days a ticker didn't trade. With
+    events_table (utils.events.read()), they are total-return closes.
+    """
+    tickers = {trade["ticker"] for trade in trades} | set(benchmark_spec(benchmarks, market).tickers)
+    prices = p.build_matrix(partitions, tickers, *window, events_table)
+
+    price_cols = [col for col in prices.columns if col != "Date"]
+    if price_cols and prices[price_cols].isna().values.any():
+        # rebuilt rather than assigned column by column, which would fragment the frame
+        prices = pd.concat([prices[["Date"]], prices[price_cols].ffill()], axis=1)
+    return prices
+
+
+def generate_results(trades, prices, benchmarks=None, market=None):
+    """
+    The results frame: prices plus a trades column (the trades made on each
+    date) and the portfolio, benchmark and invested values on every date.
+    Takes ownership of prices.
+    """
+    # group trades by date
+    # then add a trades column containing list of trades on a given date
+    trades_map = generate_trades_map(trades)
+    prices["trades"] = prices["Date"].dt.date.map(lambda d: trades_map.get(d, []))
+
+    # Compute cumulative portfolio and benchmark values in a single pass.
+    return calculate_cumulative_shares(prices, benchmarks, market)
+
+
+def generate_grouped(trades, prices, field, groups=None, benchmarks=None, market=None):
+    """
+    The long frame of calculate_grouped_shares: every group's portfolio,
+    benchmark and invested values over the shared price matrix.
+    Takes ownership of prices.
+    """
+    trades_map = generate_trades_map(trades)
+    prices["trades"] = prices["Date"].dt.date.map(lambda d: trades_map.get(d, []))
+    return calculate_grouped_shares(prices, field, groups, benchmarks, market)
+
+
+def analyze(trades, partitions, today=None, benchmarks=None, market=None, events_table=None):
+    """
+    Full analysis of trades against stored price partitions (total-return
+    adjusted by events_table, when given).
+    Returns (res, metrics, trades_summary); metrics and trades_summary are None
+    when there are no trades.
+    """
+    window = analysis_window(trades, today)
+    prices = price_matrix(partitions, trades, window, benchmarks, market, events_table)
+    res = generate_results(trades, prices, benchmarks, market)
+    metrics, trades_summary = get_metrics(res, benchmarks, market) if trades else (None, None)
+    return res, metrics, trades_summary
+
+
+def _value_trades(df, spec):
+    """
+    The trades in df["trades"] that count, flattened into parallel arrays by
+    row position: the ticker column each bought into (of prices, the matrix of
+    the held tickers' closes), its amount and the shares it bought, plus the
+    shares of each benchmark ticker it buys per benchmark (trades x benchmarks
+    x tickers, against benchmark_prices).
+
+    A trade only counts when both its ticker and the market have a positive
+    price on the trade date. A benchmark leaves out trades made before all of
+    its tickers were trading.
+    """
+    trades_by_row = df["trades"].to_numpy(copy=False)
+
+    # flatten trades into parallel arrays keyed by their row position
+    flat, trade_rows = [], []
+    for i in np.flatnonzero(df["trades"].map(len).to_numpy()):
+        for trade in trades_by_row[i]:
+            flat.append(trade)
+            trade_rows.append(i)
+    trade_tickers = [trade["ticker"] for trade in flat]
+
+    held_tickers = sorted(set(trade_tickers) & set(df.columns))
+    ticker_cols = {ticker: j for j, ticker in enumerate(held_tickers)}
+    prices = df[held_tickers].to_numpy(dtype=float)
+    market_prices = df[spec.market].to_numpy(dtype=float)
+    benchmark_prices = df[spec.tickers].to_numpy(dtype=float)
+
+    rows = np.asarray(trade_rows, dtype=np.intp)
+    cols = np.asarray([ticker_cols.get(ticker, -1) for ticker in trade_tickers], dtype=np.intp)
+    amounts = np.asarray([trade["amount"] for trade in flat], dtype=float)
+
+    # tickers without a price column get a NaN price so the skip rule drops them
+    purchase_prices = np.full(len(rows), np.nan)
+    priced = cols >= 0
+    purchase_prices[priced] = prices[rows[priced], cols[priced]]
+    market_purchase_prices = market_prices[rows]
+
+    # NaN compares False, so this also filters missing prices
+    with np.errstate(invalid="ignore"):
+        valid = (purchase_prices > 0) & (market_purchase_prices > 0)
+    rows, cols, amounts = rows[valid], cols[valid], amounts[valid]
+
+    # units of each benchmark ticker the full amount buys; NaN or inf where it wasn't trading
+    with np.errstate(divide="ignore", invalid="ignore"):
+        units = amounts[:, None] / benchmark_prices[rows]
+    held = spec.weights > 0
+    covered = (np.isfinite(units)[:, None, :] | ~held).all(axis=2)
+    benchmark_shares = np.where(covered[:, :, None] & held, spec.weights * units[:, None, :], 0.0)
+
+    return ValuedTrades(
+        [trade for trade, ok in zip(flat, valid) if ok],
+        rows, cols, amounts, amounts / purchase_prices[valid], benchmark_shares, prices, benchmark_prices,
+    )
+
+
+@telemetry.timed("calculate_cumulative_shares")
+def calculate_cumulative_shares(df, benchmarks=None, market=None):
+    """
+    Values the stock picking portfolio and its shadow in every benchmark on every date.
+
+    Shares bought are scattered into a dates x tickers matrix, accumulated down
+    the dates, and valued against the matching price matrix in one product;
+    missing prices are valued as zero. Every benchmark shadow comes from the
+    same pass: each trade buys weight x amount worth of each benchmark ticker
+    into a dates x benchmarks x tickers array, valued against the benchmark
+    price matrix in one product. See _value_trades for which trades count.
+    """
+    spec = benchmark_spec(benchmarks, market)
+    valued = _value_trades(df, spec)
+
+    shares_bought = np.zeros_like(valued.prices)
+    np.add.at(shares_bought, (valued.rows, valued.cols), valued.shares)
+    amounts_invested = np.bincount(valued.rows, weights=valued.amounts, minlength=len(df))
+
+    benchmark_bought = np.zeros((len(df), *spec.weights.shape))
+    np.add.at(benchmark_bought, valued.rows, valued.benchmark_shares)
+    benchmark_values = np.einsum("tbk,tk->tb", np.cumsum(benchmark_bought, axis=0), np.nan_to_num(valued.benchmark_prices))
+
+    holdings = np.cumsum(shares_bought, axis=0)
+    df[c.STOCK_PORTFOLIO_COL_NAME] = np.einsum("ij,ij->i", holdings, np.nan_to_num(valued.prices))
+    for b, col in enumerate(spec.cols.values()):
+        df[col] = benchmark_values[:, b]
+    df["total_invested"] = np.cumsum(amounts_invested)
+
+    return df
+
+
+def group_labels(trade, field):
+    """the groups a trade falls in when compared by field: its tags or sources (or its ticker)"""
+    values = trade.get(field)
+    if isinstance(values, str):
+        return [values]
+    return list(dict.fromkeys(values)) if values else [c.UNGROUPED_LABEL]
+
+
+def _value_pairs(out, rows, pairs, shares, prices, pair_cols, pair_outputs):
+    """
+    Add to out (dates x outputs) the daily value of shares bought on rows into
+    pairs. Pair j is priced by column pair_cols[j] of prices and summed into
+    output pair_outputs[j], which must not decrease with j. Pairs are valued
+    c.GROUP_CHUNK_COLUMNS at a time, so memory stays at dates x chunk.
+    """
+    order = np.argsort(pairs, kind="stable")
+    rows, pairs, shares = rows[order], pairs[order], shares[order]
+
+    for lo in range(0, len(pair_cols), c.GROUP_CHUNK_COLUMNS):
+        hi = min(lo + c.GROUP_CHUNK_COLUMNS, len(pair_cols))
+        first, last = np.searchsorted(pairs, [lo, hi])
+
+        bought = np.zeros((len(out), hi - lo))
+        np.add.at(bought, (rows[first:last], pairs[first:last] - lo), shares[first:last])
+        # holdings, then their values, in place
+        np.cumsum(bought, axis=0, out=bought)
+        bought *= prices[:, pair_cols[lo:hi]]
+
+        outputs = pair_outputs[lo:hi]
+        starts = np.flatnonzero(np.r_[True, outputs[1:] != outputs[:-1]])
+        out[:, outputs[starts]] += np.add.reduceat(bought, starts, axis=1)
+
+
+@telemetry.timed("calculate_grouped_shares")
+def calculate_grouped_shares(df, field, groups=None, benchmarks=None, market=None):
+    """
+    calculate_cumulative_shares for every group of trades at once, returned as
+    a long frame: Date, group, and the portfolio, benchmark and invested values.
+
+    Trades are grouped by field ("tags", "source" or "ticker"); a trade with
+    two tags counts towards both, and trades with none fall in
+    c.UNGROUPED_LABEL. The trades are flattened and priced once, and shares
+    accumulate per (group, ticker) pair actually bought rather than per group
+    x ticker, so N groups cost about as much as one run over the same trades.
+    groups limits (and orders) the groups returned; by default every group
+    the trades fall in, sorted.
+    """
+    spec = benchmark_spec(benchmarks, market)
+    valued = _value_trades(df, spec)
+
+    labels = [group_labels(trade, field) for trade in valued.trades]
+    if groups is None:
+        groups = sorted({label for trade_labels in labels for label in trade_labels}, key=str.lower)
+    groups = list(dict.fromkeys(groups))
+    group_ids = {group: g for g, group in enumerate(groups)}
+
+    # one membership per (trade, group) it counts towards
+    memberships = [(i, group_ids[label]) for i, trade_labels in enumerate(labels) for label in trade_labels if label in group_ids]
+    members = np.array([i for i, _ in memberships], dtype=np.intp)
+    member_groups = np.array([g for _, g in memberships], dtype=np.intp)
+    rows = valued.rows[members]
+    num_dates, num_groups = len(df), len(groups)
+
+    invested = np.zeros((num_dates, num_groups))
+    np.add.at(invested, (rows, member_groups), valued.amounts[members])
+
+    # stock picks: one pair per (group, ticker) bought, ordered by group
+    num_cols = max(valued.prices.shape[1], 1)
+    pair_keys, pairs = np.unique(member_groups * num_cols + valued.cols[members], return_inverse=True)
+    portfolio = np.zeros((num_dates, num_groups))
+    _value_pairs(
+        portfolio, rows, pairs, valued.shares[members],
+        np.nan_to_num(valued.prices), pair_keys % num_cols, pair_keys // num_cols,
+    )
+
+    # benchmarks: one pair per (group, benchmark ticker held), summed into (group, benchmark)
+    held_benchmarks, held_tickers = np.nonzero(spec.weights > 0)
+    num_held, num_benchmarks = len(held_tickers), len(spec.cols)
+    benchmark_shares = valued.benchmark_shares[members][:, held_benchmarks, held_tickers]
+    pair_keys, pairs = np.unique(member_groups[:, None] * num_held + np.arange(num_held), return_inverse=True)
+    benchmark_values = np.zeros((num_dates, num_groups * num_benchmarks))
+    _value_pairs(
+        benchmark_values, np.repeat(rows, num_held), pairs.ravel(), benchmark_shares.ravel(),
+        np.nan_to_num(valued.benchmark_prices), held_tickers[pair_keys % num_held],
+        pair_keys // num_held * num_benchmarks + held_benchmarks[pair_keys % num_held],
+    )
+    benchmark_values = benchmark_values.reshape(num_dates, num_groups, num_benchmarks)
+
+    # group-major, so each group's curve is a contiguous run of dates
+    return pd.DataFrame({
+        "Date": np.tile(df["Date"].to_numpy(), num_groups),
+        "group": pd.Categorical.from_codes(np.repeat(np.arange(num_groups), num_dates), categories=groups),
+        c.STOCK_PORTFOLIO_COL_NAME: portfolio.T.ravel(),
+        **{col: benchmark_values[:, :, b].T.ravel() for b, col in enumerate(spec.cols.values())},
+        "total_invested": np.cumsum(invested, axis=0).T.ravel(),
+    })
+
+
+def group_summary(grouped, benchmarks=None, market=None):
+    """
+    One row per group of calculate_grouped_shares: its latest invested and
+    portfolio values, the return on what was invested, the excess return over
+    each benchmark, and the annualized money-weighted (against the market's)
+    and time-weighted returns. Returns are NaN for groups with nothing invested.
+    """
+    spec = benchmark_spec(benchmarks, market)
+    latest = grouped.groupby("group", observed=True, sort=False).tail(1)
+    invested = latest["total_invested"].to_numpy()
+
+    def total_return(col):
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(invested > 0, latest[col].to_numpy() / invested - 1, np.nan)
+
+    summary = pd.DataFrame({
+        "group": latest["group"].astype(str).to_numpy(),
+        "total_invested": invested,
+        c.STOCK_PORTFOLIO_COL_NAME: latest[c.STOCK_PORTFOLIO_COL_NAME].to_numpy(),
+        "return": total_return(c.STOCK_PORTFOLIO_COL_NAME),
+        "market_return": total_return(spec.cols[spec.market]),
+    })
+    summary["excess_return"] = summary["return"] - summary["market_return"]
+    for name, col in spec.cols.items():
+        if name != spec.market:
+            summary[f"excess_return:{name}"] = summary["return"] - total_return(col)
+
+    # annualized: every group's picks and market shadow in one XIRR solve; the shadow is
+    # taken to hold the same money as the picks, as it does for a single-ticker market
+    if not len(summary):
+        # same columns with no groups, so callers can select them either way
+        return summary.assign(annualized_return=np.nan, market_annualized_return=np.nan, time_weighted_return=np.nan)
+
+    num_groups = grouped["group"].cat.categories.size
+    years = p.to_days(grouped["Date"].to_numpy()[:len(grouped) // num_groups]) / DAYS_PER_YEAR
+    curves = [grouped[col].to_numpy(dtype=float).reshape(num_groups, -1).T for col in (c.STOCK_PORTFOLIO_COL_NAME, spec.cols[spec.market])]
+    invested = grouped["total_invested"].to_numpy(dtype=float).reshape(num_groups, -1).T
+    rates = xirr(*_curve_flows(years, np.hstack([invested, invested]), np.hstack(curves)), 2 * num_groups)
+    codes = latest["group"].cat.codes.to_numpy()
+    summary["annualized_return"] = rates[codes]
+    summary["market_annualized_return"] = rates[num_groups + codes]
+    summary["time_weighted_return"] = time_weighted_returns(years, invested, curves[0])[codes]
+
+    return summary
+
+
+def generate_trades_map(trades):
+    trades_map = {}
+    for trade in trades:
+        date = dt.strptime(trade["date"], c.DATES_FORMAT).date()
+        if date not in trades_map:
+            trades_map[date] = []
+        trades_map[date].append(trade)
+
+    return trades_map
+
+
+def trades_breakdown(trades):
+    """
+        Builds the per-trade breakdown shown in the winning/losing metric popovers.
+
+        trades is a DataFrame with "date", "ticker" and "excess_return" columns.
+        Returns a DataFrame sorted newest first, or None when there are no
+        trades so the caller can skip the popover entirely.
+    """
+    if trades.empty:
+        return None
+
+    breakdown = trades.copy()
+    breakdown["date"] = pd.to_datetime(breakdown["date"], format=c.DATES_FORMAT)
+
+    return breakdown.sort_values(by="date", ascending=False, ignore_index=True)
+
+
+def summarize_trades(res, benchmarks=None, market=None):
+    """
+    Per-trade purchase/latest prices and returns as whole columns.
+
+    Trades are flattened out of res["trades"] once, then joined to the price
+    matrix by (row, ticker) position for the purchase date and by ticker for the
+    latest date, so every return is computed array-wide. Tickers without price
+    data get NaN prices and returns.
+    """
+    spec = benchmark_spec(benchmarks, market)
+    trades_by_row = res["trades"].to_numpy(copy=False)
+    rows = np.flatnonzero(res["trades"].map(len).to_numpy())
+    flat = [(i, trade) for i in rows for trade in trades_by_row[i]]
+
+    summary = pd.DataFrame({
+        "ticker": [trade["ticker"] for _, trade in flat],
+        "date": [trade["date"] for _, trade in flat],
+        "amount": np.array([trade["amount"] for _, trade in flat], dtype=float),
+    })
+    trade_rows = np.array([i for i, _ in flat], dtype=np.intp)
+
+    priced_tickers = sorted(set(summary["ticker"]) & set(res.columns))
+    prices = res[priced_tickers].to_numpy(dtype=float)
+    ticker_cols = summary["ticker"].map({ticker: j for j, ticker in enumerate(priced_tickers)})
+    priced = ticker_cols.notna().to_numpy()
+    cols = ticker_cols.fillna(-1).to_numpy(dtype=np.intp)
+
+    purchase_prices = np.full(len(summary), np.nan)
+    latest_prices = np.full(len(summary), np.nan)
+    purchase_prices[priced] = prices[trade_rows[priced], cols[priced]]
+    latest_prices[priced] = prices[-1, cols[priced]]
+
+    # every benchmark's return over each trade's holding period in one product:
+    # the weighted growth of its tickers, NaN where any of them wasn't trading yet
+    benchmark_prices = res[spec.tickers].to_numpy(dtype=float)
+    growth = benchmark_prices[-1] / benchmark_prices[trade_rows]
+    held = spec.weights > 0
+    benchmark_returns = np.where(held, spec.weights * growth[:, None, :], 0.0).sum(axis=2) - 1
+
+    summary["purchase_price"] = purchase_prices
+    summary["latest_price"] = latest_prices
+    summary["return"] = (latest_prices - purchase_prices) / purchase_prices
+
+    # A trade only wins if it beat what the same money would have earned
+    # in the market over the identical holding period.
+    summary["market_return"] = benchmark_returns[:, list(spec.cols).index(spec.market)]
+    summary["excess_return"] = summary["return"] - summary["market_return"]
+    for b, name in enumerate(spec.cols):
+        if name != spec.market:
+            summary[f"excess_return:{name}"] = summary["return"] - benchmark_returns[:, b]
+
+    return summary
+
+
+def xirr(problems, flows, years, num_problems):
+    """
+    Annualized internal rates of return (XIRR) of many cash-flow series at once.
+
+    The series are ragged and flattened: flow k belongs to series problems[k]
+    and is dated years[k] (in years, from any origin), negative for money in.
+    Each rate r solves sum(flows * (1 + r) ** (end - years)) = 0, end being the
+    series' last date. Every series is solved together: Newton steps on
+    log(1 + r), falling back to bisection when a step leaves the series'
+    shrinking sign-change bracket, with each iteration one vectorized pass.
+    Series with no sign change within XIRR_RATE_BOUNDS, with non-finite
+    flows, or spanning fewer than c.ANNUALIZE_MIN_DAYS are NaN.
+    """
+    problems = np.asarray(problems, dtype=np.intp)
+    flows = np.asarray(flows, dtype=float)
+    years = np.asarray(years, dtype=float)
+
+    end = np.full(num_problems, -np.inf)
+    start = np.full(num_problems, np.inf)
+    np.maximum.at(end, problems, years)
+    np.minimum.at(start, problems, years)
+    horizons = end[problems] - years
+
+    finite = np.bincount(problems, weights=~np.isfinite(flows), minlength=num_problems) == 0
+    flows = np.where(np.isfinite(flows), flows, 0.0)
+
+    def npv(x):
+        """each series' value at its end date for rates exp(x) - 1, and its derivative in x"""
+        growth = np.exp(np.minimum(x[problems] * horizons, 700))
+        return (
+            np.bincount(problems, weights=flows * growth, minlength=num_problems),
+            np.bincount(problems, weights=flows * horizons * growth, minlength=num_problems),
+        )
+
+    lo = np.full(num_problems, np.log1p(XIRR_RATE_BOUNDS[0]))
+    hi = np.full(num_problems, np.log1p(XIRR_RATE_BOUNDS[1]))
+    g_lo, _ = npv(lo)
+    g_hi, _ = npv(hi)
+    solvable = finite & (np.sign(g_lo) * np.sign(g_hi) < 0) & (end - start >= c.ANNUALIZE_MIN_DAYS / DAYS_PER_YEAR)
+
+    x = np.full(num_problems, np.log1p(0.1))
+    for _ in range(XIRR_MAX_ITERATIONS):
+        g, dg = npv(x)
+        below = np.sign(g) == np.sign(g_lo)
+        lo, g_lo = np.where(below, x, lo), np.where(below, g, g_lo)
+        hi = np.where(below, hi, x)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            newton = x - g / dg
+        step = np.where((newton > lo) & (newton < hi), newton, (lo + hi) / 2)
+        step = np.where(g == 0, x, step)
+
+        converged = np.abs(step - x) < XIRR_TOLERANCE
+        x = step
+        if converged[solvable].all():
+            break
+
+    return np.where(solvable, np.expm1(x), np.nan)
+
+
+def time_weighted_returns(years, invested, values):
+    """
+    Annualized time-weighted returns of curves (dates x curves, with the
+    cumulative amount invested in each): every day's growth net of the money
+    added that day (bought at that day's close), chained and annualized from
+    the first day with money in. NaN for curves spanning fewer than
+    c.ANNUALIZE_MIN_DAYS.
+    """
+    added = np.diff(invested, axis=0, prepend=0.0)
+    previous = np.vstack([np.zeros((1, values.shape[1])), values[:-1]])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        growth = np.where(previous > 0, (values - added) / previous, 1.0)
+
+    funded = invested > 0
+    span = years[-1] - years[np.argmax(funded, axis=0)]
+    annualize = funded.any(axis=0) & (span >= c.ANNUALIZE_MIN_DAYS / DAYS_PER_YEAR)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(annualize, np.prod(growth, axis=0) ** (1 / span) - 1, np.nan)
+
+
+def _curve_flows(years, invested, values):
+    """XIRR cash flows of curves (dates x curves): each day's new money in, then the final value out; series j is curve j"""
+    added = np.diff(invested, axis=0, prepend=0.0)
+    curves, days = np.nonzero(added.T > 0)
+    num_curves = invested.shape[1]
+    return (
+        np.r_[curves, np.arange(num_curves)],
+        np.r_[-added[days, curves], values[-1]],
+        np.r_[years[days], np.full(num_curves, years[-1])],
+    )
+
+
+def annualized_returns(res, summary, benchmarks=None, market=None):
+    """
+    Annualized returns of a results frame, unlike its totals weighted by how
+    long the money was invested.
+
+    One batched XIRR solve covers every trade in summary (its amount in on the
+    purchase date, its value out on the latest date), the stock picks and each
+    benchmark shadow (every trade it counts in on its date, the final value
+    out). Time-weighted returns of the same portfolios come from their daily
+    values. Returns (per-trade XIRR array, {col: XIRR}, {col: TWR},
+    {col: amount invested}), keyed by the portfolios' results columns; a
+    benchmark's amount leaves out the trades it doesn't cover.
+    """
+    spec = benchmark_spec(benchmarks, market)
+    valued = _value_trades(res, spec)
+    years = p.to_days(res["Date"]) / DAYS_PER_YEAR
+
+    # the amount each counted trade puts into each portfolio; a benchmark skips trades it doesn't cover
+    cols = [c.STOCK_PORTFOLIO_COL_NAME, *spec.cols.values()]
+    amounts = np.column_stack([valued.amounts, valued.amounts[:, None] * valued.benchmark_shares.any(axis=2)])
+    invested = np.zeros((len(res), len(cols)))
+    np.add.at(invested, valued.rows, amounts)
+    invested = np.cumsum(invested, axis=0)
+    values = res[cols].to_numpy(dtype=float)
+
+    curve_problems, curve_flows, curve_years = _curve_flows(years, invested, values)
+    trade_years = p.to_days(summary["date"].to_numpy(dtype=str)) / DAYS_PER_YEAR
+    trade_amounts = summary["amount"].to_numpy()
+    num_trades = len(summary)
+
+    rates = xirr(
+        np.r_[curve_problems, np.tile(np.arange(num_trades) + len(cols), 2)],
+        np.r_[curve_flows, -trade_amounts, trade_amounts * (1 + summary["return"].to_numpy())],
+        np.r_[curve_years, trade_years, np.full(num_trades, years[-1])],
+        len(cols) + num_trades,
+    )
+    twrs = time_weighted_returns(years, invested, values)
+
+    return rates[len(cols):], dict(zip(cols, rates[:len(cols)])), dict(zip(cols, twrs)), dict(zip(cols, invested[-1]))
+
+
+def _pct(rate):
+    return "n/a" if np.isnan(rate) else f"{rate * 100:.2f}%"
+
+
+@telemetry.timed("get_metrics")
+def get_metrics(res, benchmarks=None, market=None):
+    spec = benchmark_spec(benchmarks, market)
+    metrics = []
+
+    # calculate trades metadata
+    summary = summarize_trades(res, benchmarks, market)
+    summary["annualized_return"], xirrs, twrs, invested = annualized_returns(res, summary, benchmarks, market)
+    total_invested = summary["amount"].sum()
+    is_winner = (summary["excess_return"] > 0).to_numpy()
+    winners = summary.loc[is_winner, ["date", "ticker", "excess_return"]]
+    losers = summary.loc[~is_winner, ["date", "ticker", "excess_return"]]
+    trades_summary = summary.drop(columns="excess_return")
+
+    # metrics: number of winning/losing trades
+    beat_market_help = f"A trade wins when its return beats {spec.market} over the same holding period."
+    metrics.append({
+        "label": "Winning Trades", 
+        "value": len(winners),
+        "help": beat_market_help if len(winners) else f"No winners! 😞\n\n{beat_market_help}",
+        "trades": trades_breakdown(winners),
+    })
+
+    metrics.append({
+        "label": "Losing Trades", 
+        "value": len(losers),
+        "help": beat_market_help if len(losers) else f"No losers! 🎉\n\n{beat_market_help}",
+        "trades": trades_breakdown(losers),
+    })
+
+    # metric: success rate
+    total_trades = len(summary)
+    winning_percentage = len(winners) / total_trades * 100 if total_trades else 0
+    metrics.append({
+        "label": "Success Rate",
+        "value": f"{winning_percentage:.0f}%",
+        "help": f"Share of trades that outperformed {spec.market} over the same holding period."
+    })
+
+    # metric: number of trades
+    metrics.append({
+        "label": "Total Trades", 
+        "value": total_trades,
+        "help": "All trades are included except when filters are applied."
+    })
+
+    # metric: total invested
+    metrics.append({"label": "Total Invested", "value": f"${total_invested:,.0f}"})
+
+    # metrics: annualized returns of the stock picks, against the market shadow portfolio
+    market_col = spec.cols[spec.market]
+    annualized_help = {
+        "Money-Weighted Return": (
+            "Annualized internal rate of return (XIRR): every dollar counts for as long as it was invested. "
+            f"The delta compares {spec.market} bought with the same money on the same dates."
+        ),
+        "Time-Weighted Return": (
+            "Annualized daily growth chained over the whole history, so the timing and size of purchases "
+            f"don't sway it. The delta compares {spec.market} held the same way."
+        ),
+    }
+    for (label, help_text), rates in zip(annualized_help.items(), (xirrs, twrs)):
+        difference = rates[c.STOCK_PORTFOLIO_COL_NAME] - rates[market_col]
+        metrics.append({
+            "label": label,
+            "value": _pct(rates[c.STOCK_PORTFOLIO_COL_NAME]),
+            "delta": None if np.isnan(difference) else f"{'-' if difference < 0 else ''}{abs(difference) * 100:.2f}% vs {spec.market}",
+            "help": f"{help_text}\n\nNeeds at least {c.ANNUALIZE_MIN_DAYS} days of history.",
+        })
+
+    # metrics: final portfolio values, the stock picks' then each benchmark's, each against what
+    # it invested: the counted trades (see _value_trades), less those a benchmark wasn't trading for
+    picks_invested = invested[c.STOCK_PORTFOLIO_COL_NAME]
+    final_values = {c.STOCK_PORTFOLIO_LABEL: (res[c.STOCK_PORTFOLIO_COL_NAME].iloc[-1], picks_invested)}
+    for name, col in spec.cols.items():
+        final_values[spec.labels[name]] = (res[col].iloc[-1], invested[col])
+
+    for label, (final_value, amount_invested) in final_values.items():
+        sign = "" if final_value - amount_invested >= 0 else "-"
+        delta = final_value - amount_invested
+        delta_pct = (delta / amount_invested * 100) if amount_invested != 0 else 0
+        metric = {
+            "label": f"{label} Value",
+            "value": f"${final_value:,.0f}",
+            "delta": f"{sign}${abs(delta):,.0f} | {sign}{abs(delta_pct):.2f}%"
+        }
+        if not np.isclose(amount_invested, picks_invested):
+            metric["help"] = (
+                f"Compared against the ${amount_invested:,.0f} it invested: "
+                "trades made before all of its tickers were trading are left out."
+            )
+        metrics.append(metric)
+
+    return metrics, trades_summary
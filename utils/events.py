@@ -0,0 +1,136 @@
+"""
+Corporate actions (splits and dividends) behind total-return prices.
+
+Partitions in utils.prices hold closes as they actually printed. The splits and
+dividends that happened to them are kept apart, in one small table shared by
+every ticker (c.EVENTS_KEY): a row per ticker and ex-date with the dividend per
+share, the split ratio, and the factor the event scales earlier closes by.
+A new event only adds a row here; stored closes are never rewritten or
+re-downloaded for it. Total-return closes are derived whenever the analysis
+reads prices, by scaling each close by the factors of every event after it.
+"""
+
+import io
+import numpy as np
+import pandas as pd
+import config as c
+import utils.cache as cache
+import utils.telemetry as telemetry
+import utils.disk_cache as disk_cache
+
+from utils.logger import logger
+
+# the decoded table by ETag, as {ticker: events}; a changed table gets a new key
+decoded_tables = cache.LRUCache(max_entries=2, name="events")
+
+
+def empty_events():
+    return pd.DataFrame({
+        "day": pd.Series(dtype=np.int32),
+        "dividend": pd.Series(dtype=float),
+        "split": pd.Series(dtype=float),
+        "factor": pd.Series(dtype=float),
+    })
+
+
+def with_factors(events, partition):
+    """
+    events (Date-indexed dividend and split, as downloaded) as a compact
+    [day, dividend, split, factor] frame. The factor is 1 / ratio for a split
+    and 1 - dividend / previous close for a dividend, the previous close being
+    partition's last one before the ex-date.
+    """
+    days = np.asarray(events.index, dtype="datetime64[D]").astype(np.int32)
+    dividends = events["dividend"].to_numpy(dtype=float)
+
+    stored_days = partition["day"].to_numpy()
+    closes = partition["close"].to_numpy(dtype=float)
+    previous = np.full(len(days), np.nan)
+    if len(closes):
+        before = np.searchsorted(stored_days, days, side="left") - 1
+        on = np.minimum(before + 1, len(closes) - 1)
+        # an ex-date on the first stored day has no previous close; its own close plus the dividend stands in
+        previous = np.where(before >= 0, closes[np.maximum(before, 0)], closes[on] + dividends)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        dividend_factors = np.where(previous > dividends, 1 - dividends / previous, 1.0)
+
+    splits = events["split"].to_numpy(dtype=float)
+    return pd.DataFrame({"day": days, "dividend": dividends, "split": splits, "factor": dividend_factors / splits})
+
+
+def read():
+    """{ticker: events sorted by day} from the shared table; decoded once per version of it"""
+    table, _ = _read_version()
+    return table
+
+
+def _read_version():
+    """the shared table and the ETag it was read at (None when there is no table yet)"""
+    path, etag = disk_cache.get(c.EVENTS_KEY)
+    if path is None:
+        return {}, None
+
+    table = decoded_tables.get(etag)
+    if table is None:
+        with telemetry.span("parquet.decode", ticker="_events"):
+            frame = pd.read_parquet(path)
+        table = {
+            ticker: rows.drop(columns="ticker").reset_index(drop=True)
+            for ticker, rows in frame.groupby("ticker", sort=False)
+        }
+        decoded_tables.put(etag, table)
+    return table, etag
+
+
+def record(new_events):
+    """
+    Add {ticker: events} (compact, see with_factors) to the shared table,
+    replacing rows on the same ex-date, and only when something changed.
+    Events are fetched once, with the closes they belong to, so a lost row
+    would never come back: the table is written with a conditional put on the
+    version it was merged into, and merged again from the latest version when
+    another writer (the nightly refresh, a page-load backfill) got in first.
+    """
+    for attempt in range(c.EVENTS_WRITE_ATTEMPTS):
+        stored_table, etag = _read_version()
+        table = dict(stored_table)
+        changed = []
+        for ticker, events in new_events.items():
+            stored = table.get(ticker, empty_events())
+            merged = pd.concat([stored, events], ignore_index=True).astype(stored.dtypes.to_dict())
+            merged = merged.drop_duplicates(subset=["day"], keep="last").sort_values("day", ignore_index=True)
+            if not merged.equals(stored):
+                table[ticker] = merged
+                changed.append(ticker)
+
+        if not changed:
+            return
+
+        frame = pd.concat([events.assign(ticker=ticker) for ticker, events in table.items()], ignore_index=True)
+        buffer = io.BytesIO()
+        with telemetry.span("parquet.encode", ticker="_events", rows=len(frame)):
+            frame.to_parquet(buffer, index=False)
+        if disk_cache.put(c.EVENTS_KEY, buffer.getvalue(), "application/octet-stream", if_match=etag, if_absent=etag is None):
+            logger.info(f"recorded splits/dividends for {len(changed)} tickers: {', '.join(sorted(changed))}")
+            return
+        logger.info(f"events table changed while recording (attempt {attempt + 1}); merging again")
+
+    raise RuntimeError(f"could not record splits/dividends for {', '.join(sorted(new_events))}: the events table kept changing")
+
+
+def adjustment(days, events):
+    """
+    Multipliers turning the closes on (sorted) days into total-return closes:
+    the product of the factors of every event after each day. None when there
+    are no events, i.e. nothing to adjust.
+    """
+    if events is None or events.empty:
+        return None
+    later = np.r_[np.cumprod(events["factor"].to_numpy()[::-1])[::-1], 1.0]
+    return later[np.searchsorted(events["day"].to_numpy(), days, side="right")]
+
+
+def versions(table, tickers):
+    """content hash of each ticker's events, so cached results go stale when an event is added"""
+    return {ticker: cache.frame_version(table[ticker]) for ticker in tickers if ticker in table}
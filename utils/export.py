@@ -0,0 +1,69 @@
+"""
+On-demand exports of the analysis results.
+
+Nothing is serialized while the page renders: exporter() hands the download
+button a callable that Streamlit runs only when the button is clicked. The
+export is then written c.EXPORT_CHUNK_ROWS rows at a time, as CSV or as one
+Parquet row group per chunk, so a long history is never converted to text or
+Arrow all at once. Streamlit takes the finished export as bytes, so it is
+buffered in memory and handed over whole. The trades column holds
+Python objects, so it is written as one JSON array per row, and only when
+selected.
+"""
+
+import io
+import json
+import functools
+import pyarrow as pa
+import config as c
+import pyarrow.parquet as pq
+import utils.telemetry as telemetry
+
+
+def columns(res):
+    """columns a results frame can export, in frame order"""
+    return list(res.columns)
+
+
+def _chunks(res, selected):
+    for start in range(0, max(len(res), 1), c.EXPORT_CHUNK_ROWS):
+        chunk = res.iloc[start:start + c.EXPORT_CHUNK_ROWS][selected]
+        if "trades" in chunk.columns:
+            chunk = chunk.assign(trades=chunk["trades"].map(json.dumps))
+        yield start == 0, chunk
+
+
+def _write_csv(res, selected, out):
+    for first, chunk in _chunks(res, selected):
+        out.write(chunk.to_csv(index=False, header=first).encode("utf-8"))
+
+
+def _write_parquet(res, selected, out):
+    writer = None
+    try:
+        for _, chunk in _chunks(res, selected):
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(out, table.schema)
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+WRITERS = {"CSV": _write_csv, "Parquet": _write_parquet}
+
+
+def export(res, selected, fmt):
+    """the selected columns of res in fmt, as bytes"""
+    out = io.BytesIO()
+    with telemetry.span("export", format=fmt, rows=len(res), columns=len(selected)) as fields:
+        WRITERS[fmt](res, selected, out)
+        fields["bytes"] = out.tell()
+    telemetry.count("pickwise_bytes_total", fields["bytes"], op=f"export_{fmt.lower()}")
+    return out.getvalue()
+
+
+def exporter(res, selected, fmt):
+    """a no-argument callable for st.download_button, so the export is built only on click"""
+    return functools.partial(export, res, list(selected), fmt)
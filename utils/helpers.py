@@ -2,55 +2,40 @@ import io
 import json
 import copy
 import config as c 
-import pandas as pd
-import yfinance as yf
 import streamlit as st
-import matplotlib.pyplot as plt
-import matplotlib.dates as mdates
-import matplotlib.ticker as mticker
-
-from curl_cffi import requests
+import utils.prices as p
+import utils.cache as cache
+import utils.engine as engine
+import utils.events as events
+import utils.quotes as quotes
+import utils.symbols as symbols
+import utils.telemetry as telemetry
+import utils.disk_cache as disk_cache
+
+from utils.engine import get_metrics
+from utils.trade_index import TradeIndex
 from datetime import datetime as dt
-from datetime import timedelta as td
-from streamlit.components.v1 import html
-
-# session is required to avoid 429s from yfinance
-# I believe yfinance rate limits based on User-Agent header
-# which, without this session, is set to python-requests
-session = requests.Session(impersonate="chrome")
 
+# process-wide tier of the analysis results cache, shared by every session.
+# keys include the price-data version, so sessions only share results computed
+# from identical trades and identical prices.
+results_cache = cache.LRUCache(
+    max_entries=c.PROCESS_RESULTS_CACHE_ENTRIES,
+    max_bytes=c.PROCESS_RESULTS_CACHE_MAX_BYTES,
+    sizeof=cache.frame_nbytes,
+    name="results",
+)
+
+@telemetry.timed("load_app_state")
 def load_app_state():
     """ load trades & stock data into session state. """
 
-    def _download_close(tickers, start_date):
-        """ Pull daily close prices only for required date windows. """
-        if not tickers or start_date > today:
-            return pd.DataFrame()
-        close = yf.download(
-            sorted(tickers),
-            start=start_date,
-            end=today + td(days=1),
-            interval="1d",
-            session=session,
-            progress=False,
-        )["Close"]
-        if close.empty:
-            return pd.DataFrame()
-        if isinstance(close, pd.Series):
-            close = close.to_frame(name=sorted(tickers)[0])
-        close = close.reset_index()
-        if "Date" not in close.columns:
-            close = close.rename(columns={close.columns[0]: "Date"})
-        close["Date"] = pd.to_datetime(close["Date"]).dt.normalize()
-        return close
-
     if "trades" not in st.session_state:
         user = st.session_state.user
-        try:
-            response = c.s3.get_object(Bucket=c.S3_BUCKET, Key=user.TRADES_JSON_PATH)
-            trades_str = response['Body'].read().decode('utf-8')
-            st.session_state["trades"] = json.loads(trades_str)
-        except c.s3.exceptions.NoSuchKey:
+        trades_bytes = disk_cache.get_bytes(user.TRADES_JSON_PATH)
+        if trades_bytes is not None:
+            st.session_state["trades"] = json.loads(trades_bytes.decode('utf-8'))
+        else:
             # New user with no saved trades yet; seed with defaults.
             # copy.deepcopy avoids mutating the module-level DEFAULT_TRADES constant.
             st.session_state["trades"] = copy.deepcopy(c.DEFAULT_TRADES)
@@ -62,155 +47,44 @@ def load_app_state():
             trade.setdefault("source", [])
 
         st.session_state["tickers"] = set(trade["ticker"] for trade in st.session_state["trades"])
-        st.session_state["tickers_by_tags"] = {tag: set([trade["ticker"] for trade in st.session_state["trades"] if tag in trade.get("tags", [])]) for tag in set(tag for trade in st.session_state["trades"] for tag in trade.get("tags", []))}
-        st.session_state["tickers_by_source"] = {
-            source: set(
-                trade["ticker"]
-                for trade in st.session_state["trades"]
-                if source in trade.get("source", [])
-            )
-            for source in set(
-                source
-                for trade in st.session_state["trades"]
-                for source in trade.get("source", [])
-            )
-        }
+        # inverted index backing the analyze filters
+        st.session_state["trade_index"] = TradeIndex(st.session_state["trades"])
 
         st.toast(f"""Trading history loaded!  
             Monitoring {len(st.session_state['trades'])} trades across {len(st.session_state['tickers'])} tickers.
         """)
 
-    if "ticker_data" not in st.session_state:
-        try:
-            ticker_data_obj = c.s3.get_object(Bucket=c.S3_BUCKET, Key=st.session_state.user.TICKER_DATA_PATH)
-            st.session_state["ticker_data"] = pd.read_parquet(io.BytesIO(ticker_data_obj['Body'].read()))
-        except c.s3.exceptions.NoSuchKey:
-            st.session_state["ticker_data"] = pd.DataFrame()
-
-        # Work on a copy so state can be updated atomically after refresh logic.
-        ticker_data = st.session_state["ticker_data"].copy()
-        required_tickers = st.session_state.get("tickers", set())
-        required_tickers.add(c.MARKET)  # Always ensure market data is included for comparisons.
-        today = dt.now().date()
-
-        # Normalize legacy parquet shapes where Date was saved as index.
-        if not ticker_data.empty and "Date" not in ticker_data.columns:
-            ticker_data = ticker_data.reset_index()
-            if "Date" not in ticker_data.columns and "index" in ticker_data.columns:
-                ticker_data = ticker_data.rename(columns={"index": "Date"})
-
-        # Derive current coverage window and known ticker columns.
-        if "Date" in ticker_data.columns and not ticker_data.empty:
-            ticker_data["Date"] = pd.to_datetime(ticker_data["Date"]).dt.normalize()
-            latest_date = ticker_data["Date"].max().date()
-            earliest_date = ticker_data["Date"].min().date()
-            existing_tickers = {col for col in ticker_data.columns if col != "Date"}
-        else:
-            latest_date = None
-            earliest_date = None
-            existing_tickers = set()
-            if ticker_data.empty:
-                ticker_data = pd.DataFrame(columns=["Date"])
-
-        # Figure out what needs to be fetched:
-        # 1) tickers that are present in trades but missing from stored parquet columns
-        # 2) newer dates after the latest cached row
-        missing_tickers = required_tickers - existing_tickers
-        needs_date_refresh = latest_date is None or latest_date < today
-
-        if missing_tickers or needs_date_refresh:
-            toast_lines = ["Refreshing stock data for..."]
-            if missing_tickers:
-                toast_lines.append(f"{len(missing_tickers)} new tickers")
-            if needs_date_refresh:
-                toast_lines.append(
-                    f"new data since {latest_date or earliest_date or 'latest trade date.'}"
-                )
-            toast_msg = "  \n".join(toast_lines)
-            st.toast(toast_msg)
-        else:
-            st.toast("Cached stock data loaded. No refresh needed.")
-
-        updated = False
-        # Backfill missing ticker columns across the full available date range so
-        # all symbols share the same historical timeline in one DataFrame.
-        if missing_tickers:
-            if earliest_date is not None:
-                missing_start = earliest_date
-            else:
-                # If no cached data exists yet, infer start from earliest trade date.
-                trades = st.session_state.get("trades", [])
-                if trades:
-                    missing_start = min(
-                        dt.strptime(trade["date"], c.DATES_FORMAT).date() for trade in trades
-                    )
-                else:
-                    # No trades means no historical backfill is needed.
-                    missing_start = today
-
-            missing_data = _download_close(missing_tickers, missing_start)
-            if not missing_data.empty:
-                # Outer merge preserves existing rows and adds new ticker columns.
-                ticker_data = ticker_data.merge(missing_data, on="Date", how="outer")
-                updated = True
-
-        # Append only dates newer than the last cached date for all required tickers.
-        if needs_date_refresh and required_tickers:
-            if latest_date is None:
-                # Cold start: build initial history from earliest trade date.
-                trades = st.session_state.get("trades", [])
-                if trades:
-                    refresh_start = min(
-                        dt.strptime(trade["date"], c.DATES_FORMAT).date() for trade in trades
-                    )
-                else:
-                    refresh_start = today
-            else:
-                # Incremental refresh starts the day after the most recent cached date.
-                refresh_start = latest_date + td(days=1)
-
-            refresh_data = _download_close(required_tickers, refresh_start)
-            if not refresh_data.empty:
-                # Ensure schema compatibility before concat when new columns appear.
-                for col in refresh_data.columns:
-                    if col != "Date" and col not in ticker_data.columns:
-                        ticker_data[col] = pd.NA
-                ticker_data = pd.concat([ticker_data, refresh_data], ignore_index=True, sort=False)
-                updated = True
-
-        # Clean up stale tickers that are no longer in trades.
-        if "Date" in ticker_data.columns and not ticker_data.empty:
-            ticker_data["Date"] = pd.to_datetime(ticker_data["Date"]).dt.normalize()
-            ticker_data = ticker_data.sort_values("Date")
-
-            stale_tickers = [
-                col for col in ticker_data.columns if col != "Date" and col not in required_tickers
-            ]
-            if stale_tickers:
-                ticker_data = ticker_data.drop(columns=stale_tickers)
-                updated = True
-
-        # Persist only when there are changes: normalize dates, keep latest row per day,
-        # then write both session state and parquet in S3.
-        if updated:
-            ticker_data["Date"] = pd.to_datetime(ticker_data["Date"]).dt.normalize()
-            ticker_data = ticker_data.sort_values("Date").drop_duplicates(subset=["Date"], keep="last")
-            ticker_data = ticker_data.reset_index(drop=True)
-            st.session_state["ticker_data"] = ticker_data
-
-            st.toast("Cached stock data updated.")
-
-            buffer = io.BytesIO()
-
-            # only cache data up to previous day 
-            # this avoids writing non-final ticker data for the current day; for when app is used intraday before close
-            ticker_data[ticker_data["Date"].dt.date < today].to_parquet(buffer, index=False) 
-            c.s3.put_object(
-                Bucket=c.S3_BUCKET,
-                Key=st.session_state.user.TICKER_DATA_PATH,
-                Body=buffer.getvalue(),
-                ContentType='application/octet-stream'
-            )
+    if "partitions" not in st.session_state:
+        # prices are shared across users and kept current out-of-band by
+        # refresh_prices.py, so a page load only reads the partitions it needs.
+        # The one exception is history that was never fetched (a brand-new
+        # ticker, or trades older than anything stored), backfilled once here.
+        # Each ticker (and the benchmarks, for comparisons) is needed from shortly
+        # before its own earliest trade; the analysis matrix is built per query.
+        start_dates = p.start_dates_for(st.session_state.get("trades", []))
+        partitions = _load_partitions(start_dates, dt.now().date())
+        st.session_state["partitions"] = partitions
+        st.session_state["events"] = events.read()
+        st.session_state["price_versions"] = _price_versions(partitions, st.session_state["events"])
+
+def _load_partitions(start_dates, today):
+    """read price partitions for {ticker: start_date}, backfilling any history never fetched"""
+    partitions = p.read_partitions(start_dates)
+    plan = p.plan_refresh(partitions, start_dates, today, include_updates=False)
+
+    if plan:
+        st.toast(f"Refreshing stock data for {len(plan)} new tickers...")
+        partitions = p.refresh_partitions(partitions, plan, today)
+        st.toast("Cached stock data updated.")
+    else:
+        st.toast("Cached stock data loaded. No refresh needed.")
+
+    return partitions
+
+def _price_versions(partitions, events_table):
+    """content hash per partition and its splits/dividends, so cached results only depend on the tickers they use"""
+    event_versions = events.versions(events_table, partitions)
+    return {ticker: (cache.frame_version(partition), event_versions.get(ticker)) for ticker, partition in partitions.items()}
 
 def save_trades(edited_trades):
     """Save edited trades DataFrame to S3 as JSON."""
@@ -237,284 +111,219 @@ def save_trades(edited_trades):
     json_buffer = io.StringIO()
     edited_trades.to_json(json_buffer, orient="records", indent=4)
 
-    # Upload to S3
-    c.s3.put_object(
-        Bucket=c.S3_BUCKET,
-        Key=st.session_state.user.TRADES_JSON_PATH,
-        Body=json_buffer.getvalue(),
-        ContentType='application/json'
-    )
+    # Upload to S3, keeping the local disk copy in step
+    disk_cache.put(st.session_state.user.TRADES_JSON_PATH, json_buffer.getvalue(), 'application/json')
 
     # notify about user trade activity
     c.po.send_notification(f"{st.session_state.user} synced {len(edited_trades)} trades.")
 
-    # Update session state after successful save
-    del st.session_state["trades"]
-    del st.session_state["ticker_data"]
+    # Update session state in place after successful save, rather than
+    # dropping it and reloading everything from S3.
+    # Round-trip through the saved JSON so in-memory trades match what a reload would read.
+    apply_trade_changes(json.loads(json_buffer.getvalue()))
     st.rerun()
 
-def generate_results(tagged_trades):
-    res = st.session_state["ticker_data"].copy()
-    
-    # trim res to only include dates from 30 days before the earliest trade to today
-    if tagged_trades:
-        earliest_date = min(dt.strptime(trade["date"], c.DATES_FORMAT).date() for trade in tagged_trades) - td(days=c.NUM_DAYS_PRECEDING_ANALYSIS)
-        latest_date = dt.today().date()
-        res = res[(res["Date"].dt.date >= earliest_date) & (res["Date"].dt.date <= latest_date)]
+def add_trades(new_trades):
+    """Append trades (e.g. from a bulk import) to the saved trades in a single write."""
+    body = json.dumps(st.session_state.get("trades", []) + new_trades, indent=4)
+    disk_cache.put(st.session_state.user.TRADES_JSON_PATH, body, 'application/json')
 
-    # Keep persisted cache raw; apply fill only on analysis output for chart continuity.
-    price_cols = [col for col in res.columns if col != "Date"]
-    if price_cols and res[price_cols].isna().values.any():
-        res[price_cols] = res[price_cols].ffill()
+    c.po.send_notification(f"{st.session_state.user} imported {len(new_trades)} trades.")
 
-    # group trades by date 
-    # then add a trades column containing list of trades on a given date
-    trades_map = generate_trades_map(tagged_trades)
+    apply_trade_changes(json.loads(body))
+    st.rerun()
 
-    # track trades col in res df for trades executed on given date
-    res["trades"] = res["Date"].dt.date.map(lambda d: trades_map.get(d, []))
+def _trade_key(trade):
+    return json.dumps(trade, sort_keys=True)
 
-    # Compute cumulative portfolio and market values in a single pass.
-    res = calculate_cumulative_shares(res)
+def diff_trades(index, new_trades):
+    """
+    Diff edited trades against the indexed ones.
 
-    return res
+    Returns (added, removed, changed): new trades to index, positions to drop,
+    and (position, trade) pairs where a trade on the same ticker and date was
+    edited (e.g. a note, tag or amount). Identical trades are left out.
+    """
+    unmatched = {}
+    for pos, trade in enumerate(index.trades):
+        if trade is not None:
+            unmatched.setdefault(_trade_key(trade), []).append(pos)
+
+    leftover = []
+    for trade in new_trades:
+        positions = unmatched.get(_trade_key(trade))
+        if positions:
+            positions.pop()
+        else:
+            leftover.append(trade)
+
+    # pair leftovers with removed trades on the same ticker and date, so an edit
+    # re-indexes one position instead of a remove plus an add
+    removed_by_identity = {}
+    for positions in unmatched.values():
+        for pos in positions:
+            trade = index.trades[pos]
+            removed_by_identity.setdefault((trade["ticker"], trade["date"]), []).append(pos)
+
+    added, changed = [], []
+    for trade in leftover:
+        positions = removed_by_identity.get((trade["ticker"], trade["date"]))
+        if positions:
+            changed.append((positions.pop(), trade))
+        else:
+            added.append(trade)
 
-def color_vals(val):
-    """pd styler to color cell text based on value"""
-    color = "green" if val > 0 else "red"
-    return f"color: {color}"
+    removed = sorted(pos for positions in removed_by_identity.values() for pos in positions)
+    return added, removed, changed
 
-def calculate_cumulative_shares(df):
-    portfolio = {}  # Running portfolio holdings by ticker.
-    ticker_prices = {}  # Cached numpy views for fast per-row price reads.
-    market_prices = df[c.MARKET].to_numpy(copy=False)
-    trades_by_row = df["trades"].to_numpy(copy=False)
-
-    market_shares_bought = 0.0
-    total_invested = 0.0
-    portfolio_values = []
-    market_values = []
-    invested_values = []
-
-    for i, trades in enumerate(trades_by_row):
-        market_price = market_prices[i]
-
-        for trade in trades:
-            ticker = trade["ticker"]
-            amount = trade["amount"]
-
-            if ticker not in ticker_prices and ticker in df.columns:
-                ticker_prices[ticker] = df[ticker].to_numpy(copy=False)
-            ticker_series = ticker_prices.get(ticker)
-            ticker_price = ticker_series[i] if ticker_series is not None else None
-
-            if (
-                pd.notna(ticker_price)
-                and ticker_price > 0
-                and pd.notna(market_price)
-                and market_price > 0
-            ):
-                portfolio[ticker] = portfolio.get(ticker, 0.0) + (amount / ticker_price)
-                market_shares_bought += amount / market_price
-                total_invested += amount
-
-        portfolio_value = 0.0
-        for ticker, qty in portfolio.items():
-            price = ticker_prices[ticker][i]
-            if pd.notna(price):
-                portfolio_value += qty * price
-
-        portfolio_values.append(portfolio_value)
-        market_values.append(market_shares_bought * market_price)
-        invested_values.append(total_invested)
-
-    df[c.STOCK_PORTFOLIO_COL_NAME] = portfolio_values
-    df[c.MARKET_PORTFOLIO_COL_NAME] = market_values
-    df["total_invested"] = invested_values
-
-    return df
-
-def generate_trades_map(trades):
-    trades_map = {}
-    for trade in trades:
-        date = dt.strptime(trade["date"], c.DATES_FORMAT).date()
-        if date not in trades_map:
-            trades_map[date] = []
-        trades_map[date].append(trade)
-
-    return trades_map
-
-def plot_results(res, show_as_pct=False):
-    fig, ax = plt.subplots(figsize=(12, 6))
-
-    portfolio = res["portfolio_value"]
-    market = res["market_value"]
-    invested = res["total_invested"]
-
-    if show_as_pct:
-        portfolio = portfolio.where(invested > 0, 0.0)
-        market = market.where(invested > 0, 0.0)
-        invested_safe = invested.replace(0, 1)  # avoid division by zero; numerator is already 0
-        portfolio = (portfolio - invested) / invested_safe * 100
-        market = (market - invested) / invested_safe * 100
-
-    ax.plot(res['Date'], portfolio, label=c.STOCK_PORTFOLIO_LABEL)
-    ax.plot(res['Date'], market, label=c.MARKET_PORTFOLIO_LABEL)
-    if not show_as_pct:
-        ax.plot(res['Date'], invested, label="Total Invested", linestyle="--", color="gray")
-
-    # Add annotations for trades
-    for i, row in res.iterrows():
-        if row.get("trades"):
-            notes = ", ".join([f"{t['ticker']}" for t in row["trades"]])
-            y_pos = portfolio.loc[i]
-            ax.annotate(
-                notes,
-                xy=(row["Date"], y_pos),
-                xytext=(0, 10),
-                textcoords="offset points",
-                fontsize=8,
-                arrowprops=dict(arrowstyle="->", color="gray", relpos=(1, 0)),
-                ha='right'
-            )
-
-
-    # axis formatting
-    ax.xaxis.set_major_formatter(mdates.DateFormatter('%b %d, %Y'))
-    if show_as_pct:
-        ax.yaxis.set_major_formatter(mticker.StrMethodFormatter('{x:,.1f}%'))
-        ax.set_ylabel('Return (%)')
-    else:
-        ax.yaxis.set_major_formatter(mticker.StrMethodFormatter('${x:,.0f}'))
-        ax.set_ylabel('Portfolio Value ($)')
-    plt.setp(ax.get_xticklabels(), rotation=45)
+def apply_trade_changes(new_trades):
+    """
+    Bring session state in line with saved trades without a full reload.
+
+    The trade index is patched with only what changed, price history is fetched
+    only for tickers that are new (or whose earliest trade moved back), and
+    partitions are dropped for tickers no longer traded.
+    """
+    index = st.session_state["trade_index"]
+    added, removed, changed = diff_trades(index, new_trades)
+
+    for pos in removed:
+        index.remove(pos)
+    for pos, trade in changed:
+        index.update(pos, trade)
+    for trade in added:
+        index.add(trade)
+
+    # removed trades leave empty slots behind; rebuild once they outnumber live trades
+    if len(index.trades) > 2 * len(index) + c.TRADE_INDEX_SLACK:
+        index = TradeIndex(new_trades)
+        st.session_state["trade_index"] = index
+
+    previously_needed = p.start_dates_for(st.session_state["trades"])
+    st.session_state["trades"] = new_trades
+    st.session_state["tickers"] = set(trade["ticker"] for trade in new_trades)
+
+    if "partitions" not in st.session_state:
+        return
+
+    needed = p.start_dates_for(new_trades)
+    partitions = dict(st.session_state["partitions"])
+    versions = dict(st.session_state["price_versions"])
+
+    # only tickers that no longer appear anywhere are dropped
+    for ticker in set(partitions) - set(needed):
+        del partitions[ticker]
+        versions.pop(ticker, None)
+
+    # history is loaded only for tickers that are new, or now needed from an earlier date
+    missing = {
+        ticker: start_date for ticker, start_date in needed.items()
+        if ticker not in previously_needed or start_date < previously_needed[ticker]
+    }
+    if missing:
+        loaded = _load_partitions(missing, dt.now().date())
+        partitions.update(loaded)
+        # a backfill may have recorded splits or dividends for the new tickers
+        st.session_state["events"] = events.read()
+        versions.update(_price_versions(loaded, st.session_state["events"]))
+
+    st.session_state["partitions"] = partitions
+    st.session_state["price_versions"] = versions
+
+def _session_prices(tagged_trades):
+    """total-return price matrix for tagged_trades from the session's prices: the store's finalized closes, topped up with the shared intraday quotes"""
+    tickers = {trade["ticker"] for trade in tagged_trades} | set(c.BENCHMARK_TICKERS)
+    stored, live = st.session_state.get("partitions", {}), _live_quotes(tickers)
+    events_table = quotes.overlay_events(st.session_state.get("events") or {}, stored, live)
+    window = engine.analysis_window(tagged_trades)
+    return engine.price_matrix(quotes.overlay(stored, live), tagged_trades, window, events_table=events_table)
+
+@telemetry.timed("generate_results")
+def generate_results(tagged_trades):
+    """engine.generate_results over the session's prices"""
+    return engine.generate_results(tagged_trades, _session_prices(tagged_trades))
 
-    # Formatting
-    ax.legend()
-    ax.grid(True)
+@telemetry.timed("generate_grouped")
+def generate_grouped(tagged_trades, field, groups=None):
+    """engine.generate_grouped over the session's prices"""
+    return engine.generate_grouped(tagged_trades, _session_prices(tagged_trades), field, groups)
 
-    return fig
+def _live_quotes(tickers):
+    """shared recent bars for those of tickers whose stored closes are behind"""
+    partitions = st.session_state.get("partitions", {})
+    today = dt.now().date()
+    return quotes.recent(quotes.stale({t: partitions[t] for t in tickers if t in partitions}, today), today)
 
-def trades_breakdown(trades):
+def results_key(tagged_trades):
+    """
+    cache key for analysis of tagged_trades: the trades, the versions of the prices (and quotes) they use and the date window.
+    Digesting every trade is the bulk of a warm rerun, so build it once per rerun and pass it to the consumers.
     """
-        Builds the per-trade breakdown shown in the winning/losing metric popovers.
+    versions = st.session_state.get("price_versions", {})
+    tickers = sorted({trade["ticker"] for trade in tagged_trades} | set(c.BENCHMARK_TICKERS))
+    live = quotes.versions(_live_quotes(tickers))
+    return cache.digest(
+        tagged_trades,
+        [(versions.get(ticker), live.get(ticker)) for ticker in tickers],
+        engine.analysis_window(tagged_trades),
+    )
+
+def _memoized(key, compute):
+    """
+    compute() cached under key, looked up first in a small per-session LRU and
+    then in the process-wide one.
+    """
+    if "results_cache" not in st.session_state:
+        st.session_state["results_cache"] = cache.LRUCache(max_entries=c.SESSION_RESULTS_CACHE_ENTRIES, name="session_results")
+    session_cache = st.session_state["results_cache"]
 
-        Each trade is a dict with "date", "ticker" and "excess_return" keys.
-        Returns a DataFrame sorted newest first, or None when there are no
-        trades so the caller can skip the popover entirely.
+    results = session_cache.get(key)
+    if results is None:
+        results = results_cache.get(key)
+    if results is None:
+        results = compute()
+        results_cache.put(key, results)
+    session_cache.put(key, results)
+
+    return results
+
+def analyze_trades(tagged_trades, key):
+    """
+    Memoized generate_results + get_metrics.
+
+    Results are cached under key, results_key(tagged_trades): the filtered
+    trades, the price-data version and the analysis window, so reruns with
+    identical inputs (toggles, popovers) skip the rebuild. Returns (res, metrics, trades_summary); metrics and
+    trades_summary are None when there are no trades. Treat results as read-only.
+    """
+    def compute():
+        res = generate_results(tagged_trades)
+        metrics, trades_summary = get_metrics(res) if tagged_trades else (None, None)
+        return res, metrics, trades_summary
+
+    return _memoized(key, compute)
+
+def grouped_key(key, field, groups):
+    """cache key for compare_groups: the trades' results_key plus the grouping"""
+    return cache.digest(key, field, groups)
+
+def compare_groups(tagged_trades, key, field, groups):
+    """
+    Memoized generate_grouped + engine.group_summary: every group's curves in
+    one long frame and one summary row per group, for side-by-side charts and
+    tables, cached by grouped_key on the trades' results_key. Returns
+    (grouped, summary). Treat results as read-only.
     """
-    if not trades:
-        return None
-
-    breakdown = pd.DataFrame(trades)
-    breakdown["date"] = pd.to_datetime(breakdown["date"], format=c.DATES_FORMAT)
-
-    return breakdown.sort_values(by="date", ascending=False, ignore_index=True)
-
-def get_metrics(res):
-    metrics = []
-
-    # calculate trades metadata
-    trading_days = res[res["trades"].notna() & res["trades"].astype(bool)]
-    latest_date = res.iloc[-1]
-
-    winners = []
-    losers = []
-    total_invested = 0
-    trades_summary = []
-    for _, row in trading_days.iterrows():
-        market_purchase_price = row[c.MARKET]
-        for trade in row["trades"]:
-            total_invested += trade["amount"]
-
-            purchase_price = row[trade["ticker"]]
-            latest_price = latest_date[trade["ticker"]]
-            latest_market_price = latest_date[c.MARKET]
-
-            trade_return = (latest_price - purchase_price)/purchase_price
-            market_return = (latest_market_price - market_purchase_price)/market_purchase_price
-
-            trades_summary.append({
-                "ticker": trade["ticker"],
-                "date": trade["date"],
-                "amount": trade["amount"],
-                "purchase_price": purchase_price,
-                "latest_price": latest_price,
-                "return": trade_return,
-                "market_return": market_return
-            })
-
-            # A trade only wins if it beat what the same money would have earned
-            # in the market over the identical holding period.
-            excess_return = trade_return - market_return
-            classified = {
-                "date": trade["date"],
-                "ticker": trade["ticker"],
-                "excess_return": excess_return,
-            }
-            if excess_return > 0:
-                winners.append(classified)
-            else:
-                losers.append(classified)
-
-    # metrics: number of winning/losing trades
-    beat_market_help = f"A trade wins when its return beats {c.MARKET} over the same holding period."
-    metrics.append({
-        "label": "Winning Trades", 
-        "value": len(winners),
-        "help": beat_market_help if winners else f"No winners! 😞\n\n{beat_market_help}",
-        "trades": trades_breakdown(winners),
-    })
-
-    metrics.append({
-        "label": "Losing Trades", 
-        "value": len(losers),
-        "help": beat_market_help if losers else f"No losers! 🎉\n\n{beat_market_help}",
-        "trades": trades_breakdown(losers),
-    })
-
-    # metric: success rate
-    total_trades = res["trades"].apply(len).sum()
-    winning_percentage = len(winners) / total_trades * 100 if total_trades else 0
-    metrics.append({
-        "label": "Success Rate",
-        "value": f"{winning_percentage:.0f}%",
-        "help": f"Share of trades that outperformed {c.MARKET} over the same holding period."
-    })
-
-    # metric: number of trades
-    metrics.append({
-        "label": "Total Trades", 
-        "value": total_trades,
-        "help": "All trades are included except when filters are applied."
-    })
-
-    # metric: total invested
-    metrics.append({"label": "Total Invested", "value": f"${total_invested:,.0f}"})
-
-    # metrics: final portfolio values
-    final_stock_value = res[c.STOCK_PORTFOLIO_COL_NAME].iloc[-1]
-    final_market_value = res[c.MARKET_PORTFOLIO_COL_NAME].iloc[-1]
-
-    sign = "" if final_stock_value - total_invested >= 0 else "-"
-    delta = final_stock_value - total_invested
-    delta_pct = (delta / total_invested * 100) if total_invested != 0 else 0
-    metrics.append({
-        "label": f"{c.STOCK_PORTFOLIO_LABEL} Value",
-        "value": f"${final_stock_value:,.0f}",
-        "delta": f"{sign}${abs(delta):,.0f} | {sign}{abs(delta_pct):.2f}%"
-    })
-
-    sign = "" if final_market_value - total_invested >= 0 else "-"
-    delta = final_market_value - total_invested
-    delta_pct = (delta / total_invested * 100) if total_invested != 0 else 0
-    metrics.append({
-        "label": f"{c.MARKET_PORTFOLIO_LABEL} Value", 
-        "value": f"${final_market_value:,.0f}",
-        "delta": f"{sign}${abs(delta):,.0f} | {sign}{abs(delta_pct):.2f}%"
-    })
-    
-    return metrics, trades_summary
+    def compute():
+        grouped = generate_grouped(tagged_trades, field, groups)
+        return grouped, engine.group_summary(grouped)
+
+    return _memoized(grouped_key(key, field, groups), compute)
+
+def color_vals(val):
+    """pd styler to color cell text based on value"""
+    color = "green" if val > 0 else "red"
+    return f"color: {color}"
 
 def validate_changes(edited_trades):
     """
@@ -532,6 +341,13 @@ def validate_changes(edited_trades):
     if (edited_trades["amount"].apply(lambda a: not isinstance(a, (int, float)) or a <= 0)).any():
         return True, "Amounts must be valid positive numbers."
 
+    # a symbol Yahoo doesn't know would never load prices; tickers already loaded with data are known good
+    partitions = st.session_state.get("partitions", {})
+    tickers = set(edited_trades["ticker"].astype(str).str.upper())
+    unknown = symbols.unknown(t for t in tickers if t not in partitions or partitions[t].empty)
+    if unknown:
+        return True, f"Unknown or delisted ticker symbols: {', '.join(sorted(unknown))}."
+
     return False, None
 
 def get_tags(edited_trades):
@@ -562,23 +378,3 @@ def humanize_date(date_str):
     """
     return dt.strptime(date_str, c.DATES_FORMAT).strftime(c.PREFERRED_UI_DATE_FORMAT_DATETIME)
 
-
-def render_animation(name: str, height: int = 470):
-    """
-    Render an HTML/CSS animation by file stem.
-
-    These are self-contained vector animations (no GIF, no video),
-    so they stay crisp at any DPI and weigh only a few KB each.
-
-    Uses st.components.v1.html which renders in an iframe (required for isolation).
-    Note: this is deprecated after 2026-06-01 in favor of st.iframe.
-    I choose to still use this because the Streamlit app is pinned to an older version in deployment.
-    But should be warned that this would break, alongside other uses of v1 html(), if Streamlit is updated.
-
-    Args:
-        name: file stem, e.g. "example-results"
-        height: iframe height in px (default suits centered layout ~704px wide)
-    """
-    with open(f"{c.ASSETS_PATH}/animations/{name}.html", encoding="utf-8") as f:
-        html_content = f.read()
-    html(html_content, height=height, scrolling=False)
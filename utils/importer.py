@@ -0,0 +1,240 @@
+"""
+Bulk trade import from broker exports.
+
+CSV exports are read c.IMPORT_CHUNK_ROWS rows at a time against a column
+mapping (guessed from the header by guess_mapping, adjustable by the user).
+OFX/QFX statements are tokenized incrementally and their buy transactions
+(BUYSTOCK, BUYMF, BUYOTHER) turned into the same rows, with tickers looked up
+from the statement's security list. Either way each batch is cleaned and
+validated column-wise, rows failing validation (including symbols Yahoo
+doesn't know) are reported by row number, and trades already saved (same
+ticker, date and amount) or repeated within the file are dropped. Nothing is
+written here; the caller saves the result in one go.
+"""
+
+import re
+import numpy as np
+import pandas as pd
+import config as c
+import utils.symbols as symbols
+
+from collections import namedtuple
+from datetime import datetime as dt
+
+# trades ready to save, plus what was left out: errors is a frame of [row, error],
+# duplicates and skipped (non-buy rows) are counts
+ImportReport = namedtuple("ImportReport", ["trades", "errors", "duplicates", "skipped"])
+
+TICKER_PATTERN = r"^[A-Z0-9][A-Z0-9.\-^=]{0,14}$"
+OFX_TAG = re.compile(r"<(/?)([A-Z0-9.]+)>([^<]*)")
+OFX_BUYS = {"BUYSTOCK", "BUYMF", "BUYOTHER"}
+OFX_READ_CHARS = 1024 * 1024
+
+
+def guess_mapping(header):
+    """{field: column} for the fields whose aliases appear in the header"""
+    normalized = {str(col).strip().lower(): col for col in header}
+    mapping = {}
+    for field, aliases in c.IMPORT_COLUMN_ALIASES.items():
+        for alias in aliases:
+            if alias in normalized:
+                mapping[field] = normalized[alias]
+                break
+    return mapping
+
+
+def mapping_problems(mapping):
+    """why a CSV column mapping can't be imported, or None if it can"""
+    if not mapping.get("ticker") or not mapping.get("date"):
+        return "Map both the ticker and the date columns."
+    if not mapping.get("amount") and not (mapping.get("quantity") and mapping.get("price")):
+        return "Map the amount column, or both the quantity and price columns."
+    return None
+
+
+def _numbers(values):
+    """broker-formatted numbers ("$1,234.50", "(12.00)") as floats, NaN where unreadable"""
+    text = values.astype("string").str.strip()
+    negative = text.str.startswith("(") & text.str.endswith(")")
+    numbers = pd.to_numeric(text.str.replace(r"[$,()\s]", "", regex=True), errors="coerce")
+    return numbers.where(~negative.fillna(False), -numbers)
+
+
+def _clean(batch, first_row, source_name):
+    """
+    One batch of raw field columns -> (trades frame, errors frame, skipped count).
+    Amounts are taken as absolute values (brokers report buys as cash out),
+    falling back to quantity x price when there is no amount.
+    """
+    rows = pd.Series(np.arange(first_row, first_row + len(batch)), index=batch.index)
+
+    skipped = 0
+    if "action" in batch.columns:
+        action = batch["action"].astype("string").str.lower().fillna("")
+        is_buy = action.str.contains("|".join(c.IMPORT_BUY_ACTIONS), regex=True).to_numpy(dtype=bool)
+        skipped = int((~is_buy).sum())
+        batch, rows = batch[is_buy], rows[is_buy]
+
+    ticker = batch["ticker"].astype("string").str.strip().str.upper()
+    date = pd.to_datetime(batch["date"], errors="coerce", format="mixed")
+    amount = _numbers(batch["amount"]).abs() if "amount" in batch.columns else pd.Series(np.nan, index=batch.index)
+    if {"quantity", "price"} <= set(batch.columns):
+        amount = amount.fillna((_numbers(batch["quantity"]) * _numbers(batch["price"])).abs())
+    notes = batch["notes"].astype("string").str.strip() if "notes" in batch.columns else pd.Series(pd.NA, index=batch.index, dtype="string")
+
+    today = pd.Timestamp(dt.now().date())
+    checks = [
+        (ticker.isna() | (ticker == ""), "missing ticker"),
+        (~ticker.fillna("").str.match(TICKER_PATTERN), "invalid ticker"),
+        (date.isna(), "missing or unreadable date"),
+        (date > today, "date in the future"),
+        (amount.isna(), "missing or unreadable amount"),
+        (amount <= 0, "amount must be positive"),
+    ]
+    # each row reports the first check it fails
+    reasons = pd.Series("", index=batch.index, dtype=object)
+    for failed, reason in checks:
+        failed = failed.fillna(False).to_numpy(dtype=bool)
+        reasons = reasons.where(~failed | (reasons != ""), reason)
+    bad = (reasons != "").to_numpy()
+
+    errors = pd.DataFrame({"row": rows[bad].to_numpy(), "error": reasons[bad].to_numpy()})
+    default_notes = f"imported from {source_name}"
+    trades = pd.DataFrame({
+        "row": rows[~bad].to_numpy(),
+        "ticker": ticker[~bad].to_numpy(dtype=object),
+        "date": date[~bad].dt.strftime(c.DATES_FORMAT).to_numpy(dtype=object),
+        "amount": amount[~bad].round(2).to_numpy(dtype=float),
+        "notes": notes[~bad].fillna(default_notes).replace("", default_notes).to_numpy(dtype=object),
+    })
+    return trades, errors, skipped
+
+
+def _csv_batches(stream, mapping):
+    """raw field columns in batches, renamed from the file's headers per mapping"""
+    columns = {column: field for field, column in mapping.items() if column is not None}
+    reader = pd.read_csv(
+        stream,
+        dtype=str,
+        usecols=list(columns),
+        chunksize=c.IMPORT_CHUNK_ROWS,
+        skipinitialspace=True,
+        on_bad_lines="skip",
+    )
+    for batch in reader:
+        yield batch.rename(columns=columns)
+
+
+def _ofx_tags(stream):
+    """(closing, tag, text) tokens of an OFX/QFX document, read incrementally"""
+    pending = ""
+    while True:
+        chunk = stream.read(OFX_READ_CHARS)
+        if isinstance(chunk, bytes):
+            chunk = chunk.decode("utf-8", errors="replace")
+        text = pending + chunk
+        # a tag's text only ends at the next "<", so the last tag waits for the next read
+        cut = max(text.rfind("<"), 0) if chunk else len(text)
+        for match in OFX_TAG.finditer(text, 0, cut):
+            yield match.group(1) == "/", match.group(2), match.group(3).strip()
+        pending = text[cut:]
+        if not chunk:
+            return
+
+
+def _ofx_batches(stream):
+    """buy transactions as raw field columns in batches, tickers resolved from the security list"""
+    buys, securities = [], {}
+    transaction, security_id, stack = None, None, []
+    for closing, tag, text in _ofx_tags(stream):
+        if closing:
+            if tag in stack:
+                del stack[stack.index(tag):]
+            if tag in OFX_BUYS and transaction is not None:
+                buys.append(transaction)
+                transaction = None
+            continue
+
+        if tag in OFX_BUYS:
+            transaction = {}
+        elif tag == "SECINFO":
+            security_id = None
+        elif transaction is not None and text:
+            # aggregates (INVBUY, SECID) nest the leaf elements; only leaves carry text
+            transaction.setdefault(tag, text)
+        elif "SECINFO" in stack and text:
+            if tag == "UNIQUEID":
+                security_id = text
+            elif tag == "TICKER" and security_id is not None:
+                securities[security_id] = text
+        if not text:
+            stack.append(tag)
+
+    for start in range(0, max(len(buys), 1), c.IMPORT_CHUNK_ROWS):
+        batch = pd.DataFrame(buys[start:start + c.IMPORT_CHUNK_ROWS], columns=["UNIQUEID", "DTTRADE", "TOTAL", "UNITS", "UNITPRICE", "MEMO"])
+        yield pd.DataFrame({
+            # statements without a security list identify securities by ticker directly
+            "ticker": batch["UNIQUEID"].map(lambda uid: securities.get(uid, uid)),
+            "date": batch["DTTRADE"].str[:8],
+            "amount": batch["TOTAL"],
+            "quantity": batch["UNITS"],
+            "price": batch["UNITPRICE"],
+            "notes": batch["MEMO"],
+        })
+
+
+def read_header(stream):
+    """column names of a CSV export; leaves the stream rewound"""
+    header = list(pd.read_csv(stream, nrows=0, dtype=str, skipinitialspace=True).columns)
+    stream.seek(0)
+    return header
+
+
+def import_trades(stream, file_name, existing_trades, known_tickers=(), mapping=None):
+    """
+    Parse a broker export into new trades. CSV files need a mapping (see
+    mapping_problems); OFX/QFX files are recognized by their extension.
+    Tickers outside known_tickers are resolved against Yahoo in one batch.
+    Returns an ImportReport.
+    """
+    if file_name.lower().endswith((".ofx", ".qfx")):
+        batches = _ofx_batches(stream)
+    else:
+        batches = _csv_batches(stream, mapping)
+
+    seen = {(t["ticker"], t["date"], round(float(t["amount"]), 2)) for t in existing_trades}
+    trades, errors = [], []
+    duplicates = skipped = 0
+    next_row = 1
+    for batch in batches:
+        cleaned, batch_errors, batch_skipped = _clean(batch, next_row, file_name)
+        next_row += len(batch)
+        skipped += batch_skipped
+        errors.append(batch_errors)
+
+        keys = list(zip(cleaned["ticker"], cleaned["date"], cleaned["amount"]))
+        keep = np.ones(len(keys), dtype=bool)
+        for i, key in enumerate(keys):
+            if key in seen:
+                keep[i] = False
+            else:
+                seen.add(key)
+        duplicates += int((~keep).sum())
+        trades.append(cleaned[keep])
+
+    if not trades:
+        return ImportReport([], pd.DataFrame(columns=["row", "error"]), 0, 0)
+
+    trades = pd.concat(trades, ignore_index=True)
+    unknown = symbols.unknown(set(trades["ticker"]) - set(known_tickers))
+    if unknown:
+        flagged = trades["ticker"].isin(unknown).to_numpy()
+        errors.append(pd.DataFrame({"row": trades.loc[flagged, "row"], "error": "unknown or delisted ticker"}))
+        trades = trades[~flagged]
+    errors = pd.concat(errors, ignore_index=True).sort_values("row", ignore_index=True)
+
+    records = [
+        {"ticker": ticker, "date": date, "amount": float(amount), "notes": notes, "source": [], "tags": []}
+        for ticker, date, amount, notes in zip(trades["ticker"], trades["date"], trades["amount"], trades["notes"])
+    ]
+    return ImportReport(records, errors, duplicates, skipped)
@@ -0,0 +1,48 @@
+import threading
+import importlib
+
+from utils.logger import logger
+
+# modules behind the logged-in pages; the landing page renders without any of them
+HEAVY_MODULES = (
+    "utils.user",
+    "utils.helpers",
+    "sections.header",
+    "sections.trades",
+    "sections.analyze",
+)
+
+_started = False
+_started_lock = threading.Lock()
+
+
+def _warm():
+    import config as c
+
+    try:
+        for module in HEAVY_MODULES:
+            importlib.import_module(module)
+
+        # building boto3 clients is slow (endpoint/model loading); do it off the script thread
+        c.s3
+        c.ddb
+        c.po
+        logger.info("prewarmed data stack and clients")
+    except Exception as e:
+        # prewarming is best-effort; the script thread imports on demand regardless
+        logger.warning(f"prewarm failed: {e}")
+
+
+def start():
+    """
+    Import the heavy stack (pandas, yfinance, matplotlib, boto3...) in a
+    background thread, once per process, so the first logged-in page doesn't
+    pay for it while anonymous visitors never wait on it.
+    """
+    global _started
+    with _started_lock:
+        if _started:
+            return
+        _started = True
+
+    threading.Thread(target=_warm, name="prewarm", daemon=True).start()
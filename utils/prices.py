@@ -0,0 +1,276 @@
+"""
+Shared price store.
+
+Daily closes live once per ticker under prices/<TICKER>.parquet rather than once
+per user, so popular symbols are downloaded and written to S3 a single time for
+everyone. Each partition is a compact long frame of [day, close]: day is an
+int32 offset in days from 1970-01-01 and close a float32. Its attrs carry the
+earliest date that has been requested for it ("coverage_start"), which may
+precede the first row when a ticker started trading after the requested date.
+
+Every ticker keeps its own coverage window, starting NUM_DAYS_PRECEDING_ANALYSIS
+days before its earliest trade, so a recently added ticker never inherits years
+of history because some other ticker was traded long ago. The float64 analysis
+matrix is built from the partitions per query, for just the tickers and dates
+it covers. Symbols Yahoo doesn't know are negative-cached (utils.symbols) and
+left out of refreshes until their entry expires.
+
+Closes are stored as they printed (attrs["closes"] == "raw"), and the splits
+and dividends found while fetching go to utils.events; build_matrix applies
+them, so the analysis sees total-return prices while stored history never
+changes. Partitions written before then hold closes Yahoo had adjusted as of
+their fetch, which drift apart from rows appended later; they are re-fetched
+once in full.
+"""
+
+import io
+import numpy as np
+import config as c
+import pandas as pd
+import utils.cache as cache
+import utils.events as events
+import utils.symbols as symbols
+import utils.telemetry as telemetry
+import utils.disk_cache as disk_cache
+
+from datetime import datetime as dt
+from datetime import timedelta as td
+from concurrent.futures import ThreadPoolExecutor
+from utils.downloader import download_history
+
+# boto3 clients are thread-safe, so partition reads/writes fan out over a small pool
+S3_WORKERS = 8
+
+# decoded partitions keyed by (ticker, etag); a changed object gets a new key
+decoded_partitions = cache.LRUCache(
+    max_entries=c.DECODED_PARTITIONS_CACHE_ENTRIES,
+    max_bytes=c.DECODED_PARTITIONS_CACHE_MAX_BYTES,
+    sizeof=cache.frame_nbytes,
+    name="decoded_partitions",
+)
+
+
+def is_raw(partition):
+    """whether a partition holds closes as printed, rather than the adjusted ones stored before events were kept"""
+    return partition.attrs.get("closes") == "raw"
+
+
+def partition_key(ticker):
+    return f"{c.PRICES_FOLDER}/{ticker}.parquet"
+
+
+def to_days(dates):
+    """dates (datetime-like array or scalar) -> int32 day offsets from 1970-01-01"""
+    return np.asarray(dates, dtype="datetime64[D]").astype(np.int32)
+
+
+def from_days(days):
+    """int32 day offsets -> datetime64[ns] dates"""
+    return np.asarray(days, dtype=np.int64).astype("datetime64[D]").astype("datetime64[ns]")
+
+
+def to_date(day):
+    return dt(1970, 1, 1).date() + td(days=int(day))
+
+
+def empty_partition():
+    return pd.DataFrame({"day": pd.Series(dtype=np.int32), "close": pd.Series(dtype=np.float32)})
+
+
+def compact(dates, closes):
+    """a sorted, de-duplicated partition from parallel date and close arrays"""
+    partition = pd.DataFrame({"day": to_days(dates), "close": np.asarray(closes, dtype=np.float32)})
+    return partition.sort_values("day").drop_duplicates(subset=["day"], keep="last").reset_index(drop=True)
+
+
+def coverage_start(partition):
+    """earliest date the partition has been backfilled from, or None if never stored"""
+    start = partition.attrs.get("coverage_start")
+    if start is None:
+        return to_date(partition["day"].iloc[0]) if not partition.empty else None
+    return dt.strptime(start, c.DATES_FORMAT).date()
+
+
+def start_dates_for(trades):
+    """
+    Earliest date each ticker is needed from: NUM_DAYS_PRECEDING_ANALYSIS days
+    before its own earliest trade, and for the benchmarks' tickers, before the
+    earliest trade overall.
+    """
+    earliest = {}
+    for trade in trades:
+        trade_date = dt.strptime(trade["date"], c.DATES_FORMAT).date()
+        if trade_date < earliest.get(trade["ticker"], trade_date + td(days=1)):
+            earliest[trade["ticker"]] = trade_date
+
+    lead = td(days=c.NUM_DAYS_PRECEDING_ANALYSIS)
+    start_dates = {ticker: trade_date - lead for ticker, trade_date in earliest.items()}
+    if earliest:
+        for ticker in c.BENCHMARK_TICKERS:
+            start_dates[ticker] = min(earliest.values()) - lead
+    return start_dates
+
+
+def read_partition(ticker):
+    """ load a ticker's stored closes; returns an empty partition if it was never stored """
+    path, etag = disk_cache.get(partition_key(ticker))
+    if path is None:
+        return empty_partition()
+
+    # decoded partitions are shared by every session in the process until the object changes
+    decoded = decoded_partitions.get((ticker, etag))
+    if decoded is None:
+        with telemetry.span("parquet.decode", ticker=ticker):
+            decoded = pd.read_parquet(path, memory_map=True)
+            if "Date" in decoded.columns:
+                # written before the compact layout; converted here, rewritten on its next refresh
+                attrs = decoded.attrs
+                decoded = compact(pd.to_datetime(decoded["Date"]).dt.normalize(), decoded["Close"])
+                decoded.attrs = attrs
+        decoded_partitions.put((ticker, etag), decoded)
+
+    partition = decoded.copy(deep=False)
+    partition.attrs = dict(decoded.attrs)
+    return partition
+
+
+def write_partition(ticker, partition):
+    buffer = io.BytesIO()
+    with telemetry.span("parquet.encode", ticker=ticker, rows=len(partition)):
+        partition.to_parquet(buffer, index=False)
+    disk_cache.put(partition_key(ticker), buffer.getvalue(), "application/octet-stream")
+
+
+def read_partitions(tickers):
+    tickers = sorted(tickers)
+    with ThreadPoolExecutor(max_workers=S3_WORKERS) as pool:
+        return dict(zip(tickers, pool.map(read_partition, tickers)))
+
+
+def plan_refresh(partitions, start_dates, today, include_updates=True, migrate=False):
+    """
+    Decide which partitions need fetching, and from when.
+
+    A partition is backfilled when it does not reach back to its ticker's date
+    in start_dates, and (with include_updates) brought up to date when its
+    latest row is older than today. With migrate, partitions of adjusted
+    closes (see is_raw) are re-fetched in full; without, they are left as they
+    are, since new closes as printed can't be appended to them. Symbols known
+    to be invalid are skipped. Returns {ticker: fetch_start}.
+    """
+    plan = {}
+    skip = symbols.invalid(partitions)
+    for ticker, partition in partitions.items():
+        if ticker in skip:
+            continue
+        start_date = start_dates[ticker]
+        covered_from = coverage_start(partition)
+        legacy = covered_from is not None and not is_raw(partition)
+        if legacy and migrate:
+            # adjusted closes from before events were kept; replaced once with closes as printed
+            plan[ticker] = min(covered_from, start_date)
+        elif covered_from is None or covered_from > start_date:
+            # refetching the full window is simpler than splicing two ranges
+            # and Yahoo serves a whole daily history in one response anyway
+            plan[ticker] = start_date
+        elif include_updates and not legacy:
+            # a covered but empty partition (nothing traded in its window yet) resumes from its coverage start
+            latest_date = to_date(partition["day"].iloc[-1]) if not partition.empty else covered_from - td(days=1)
+            if latest_date < today:
+                plan[ticker] = latest_date + td(days=1)
+
+    return plan
+
+
+def refresh_partitions(partitions, plan, today, final_date=None):
+    """
+    Fetch the planned windows in a single batched download (each ticker from
+    its own start), then merge into the partitions and persist the ones that
+    gained rows up to final_date (by default, the day before today).
+    Returns the refreshed partitions, including any rows after final_date,
+    which are never written to S3. Splits and dividends in the fetched
+    windows are added to utils.events. Symbols Yahoo reports as unknown or
+    delisted are added to the negative cache.
+    """
+    if final_date is None:
+        final_date = today - td(days=1)
+    final_day = to_days(final_date)
+
+    refreshed = dict(partitions)
+    to_write = {}
+    new_events = {}
+    downloaded, found_events, failed = download_history(plan, today)
+    symbols.record_failures(failed)
+    for ticker, fetch_start in plan.items():
+        if downloaded.empty or ticker not in downloaded.columns:
+            continue
+
+        new_rows = downloaded[["Date", ticker]].dropna(subset=[ticker])
+        stored = partitions[ticker]
+        covered_from = coverage_start(stored)
+        if not is_raw(stored):
+            # adjusted rows never mix with closes as printed; the fetch covers all of them
+            stored = empty_partition()
+        partition = compact(
+            np.concatenate([from_days(stored["day"]), new_rows["Date"].to_numpy()]),
+            np.concatenate([stored["close"].to_numpy(), new_rows[ticker].to_numpy()]),
+        )
+
+        partition.attrs["coverage_start"] = min(filter(None, [covered_from, fetch_start])).strftime(c.DATES_FORMAT)
+        partition.attrs["closes"] = "raw"
+        refreshed[ticker] = partition
+
+        # only cache finalized closes
+        # this avoids writing non-final ticker data for the current day; for when app is used intraday before close
+        finalized = partition[partition["day"] <= final_day]
+        if ticker in found_events:
+            ticker_events = events.with_factors(found_events[ticker], partition)
+            new_events[ticker] = ticker_events[ticker_events["day"] <= final_day]
+        if len(finalized) != len(stored) or covered_from != coverage_start(partition) or not is_raw(partitions[ticker]):
+            finalized.attrs = dict(partition.attrs)
+            to_write[ticker] = finalized
+
+    # events first: if they can't be recorded, the partitions stay behind and the next refresh fetches them again
+    events.record({ticker: found for ticker, found in new_events.items() if not found.empty})
+    if to_write:
+        with ThreadPoolExecutor(max_workers=S3_WORKERS) as pool:
+            list(pool.map(lambda item: write_partition(*item), to_write.items()))
+
+    return refreshed
+
+
+def build_matrix(partitions, tickers, start_date, end_date, events_table=None):
+    """
+    The Date x ticker float64 frame the analysis runs on, for just the given
+    tickers and the dates in [start_date, end_date] on which any of them has a
+    close. Tickers without a close on a date (or with no partition) get NaN.
+    With events_table ({ticker: events}, see utils.events), closes are
+    total-return adjusted for every split and dividend after them.
+    """
+    events_table = events_table or {}
+    tickers = sorted(tickers)
+    start_day, end_day = to_days(start_date), to_days(end_date)
+
+    windows = {}
+    for ticker in tickers:
+        partition = partitions.get(ticker)
+        if partition is None or partition.empty:
+            continue
+        days = partition["day"].to_numpy()
+        lo = np.searchsorted(days, start_day, side="left")
+        hi = np.searchsorted(days, end_day, side="right")
+        closes = partition["close"].to_numpy()[lo:hi]
+        adjustment = events.adjustment(days[lo:hi], events_table.get(ticker))
+        windows[ticker] = (days[lo:hi], closes if adjustment is None else closes * adjustment)
+
+    all_days = np.unique(np.concatenate([days for days, _ in windows.values()])) if windows else np.empty(0, dtype=np.int32)
+
+    matrix = np.full((len(all_days), len(tickers)), np.nan)
+    for j, ticker in enumerate(tickers):
+        if ticker in windows:
+            days, closes = windows[ticker]
+            matrix[np.searchsorted(all_days, days), j] = closes
+
+    wide = pd.DataFrame(matrix, columns=tickers)
+    wide.insert(0, "Date", from_days(all_days))
+    return wide
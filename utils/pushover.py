@@ -1,18 +1,48 @@
+import time
+import queue
+import atexit
 import requests
+import threading
+
+from utils.logger import logger
 
 class Pushover:
-    
+    """
+    Pushover client whose send_notification only enqueues.
+
+    A daemon worker drains a bounded queue in the background: it waits briefly
+    after the first message so bursts (e.g. several logins at once) can be
+    coalesced into one message per destination, then posts with a timeout and
+    a few retries. When the queue is full, new notifications are dropped and
+    counted rather than blocking the caller. Whatever is still queued when the
+    process exits gets up to TIMEOUT_SECONDS to go out.
+    """
+
     HEADERS = {'Content-Type': 'application/json'}
     PUSHOVER_URL = 'https://api.pushover.net/1/messages.json'
 
+    QUEUE_SIZE = 100
+    COALESCE_SECONDS = 2.0
+    TIMEOUT_SECONDS = 5
+    MAX_ATTEMPTS = 3
+    MAX_MESSAGE_LENGTH = 1024  # Pushover rejects longer messages
+
     def __init__(self, user_token, app_token, log_token):
         self.user_token = user_token
         self.app_token = app_token
         self.log_token = log_token
 
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=self.QUEUE_SIZE)
+        self._worker = None
+        self._worker_lock = threading.Lock()
+
+        # the worker is a daemon thread and would die with the process mid-queue
+        atexit.register(self.flush, timeout=self.TIMEOUT_SECONDS)
+
     def send_notification(self, msg, title=None, priority=0, is_log=False, monospace=0):
         """
-        Make an API call to Pushover.
+        Queue a notification for delivery via the Pushover API.
 
         Args:
             msg (str): The message text to be sent via Pushover.
@@ -20,7 +50,7 @@ class Pushover:
             priority (int): Notification priority, as defined by the Pushover API specification.
             is_log (bool): If True, the notification is sent to the Logs project using PUSHOVER_LOG_TOKEN.
                 Otherwise, it is logged to the app project using PUSHOVER_APP_TOKEN.
-            monospace (enum [0, 1]): Enum options based on Pushover API docs. 
+            monospace (enum [0, 1]): Enum options based on Pushover API docs.
                 If 1, the text is monospaced. Defaults to 0.
         """
 
@@ -33,4 +63,76 @@ class Pushover:
             'monospace': monospace
         }
 
-        requests.post(self.PUSHOVER_URL, json=params, headers=self.HEADERS)
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait(params)
+        except queue.Full:
+            self.dropped += 1
+            logger.warning(f"Pushover queue full; dropped notification ({self.dropped} dropped so far): {msg}")
+
+    def flush(self, timeout=None):
+        """block until every queued notification has been attempted, e.g. before a script exits"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if deadline is not None and time.monotonic() > deadline:
+                return False
+            time.sleep(0.05)
+        return True
+
+    def _ensure_worker(self):
+        with self._worker_lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="pushover", daemon=True)
+                self._worker.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+
+            # give a burst a moment to arrive, then take everything that's queued
+            time.sleep(self.COALESCE_SECONDS)
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            try:
+                for params in self._coalesce(batch):
+                    self._post(params)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _coalesce(self, batch):
+        """merge messages bound for the same destination and presentation into one"""
+        merged = {}
+        for params in batch:
+            key = (params['token'], params['title'], params['priority'], params['monospace'])
+            if key in merged:
+                merged[key]['message'] += "\n" + params['message']
+            else:
+                merged[key] = dict(params)
+
+        for params in merged.values():
+            if len(params['message']) > self.MAX_MESSAGE_LENGTH:
+                params['message'] = params['message'][:self.MAX_MESSAGE_LENGTH - 1] + "…"
+        return list(merged.values())
+
+    def _post(self, params):
+        for attempt in range(self.MAX_ATTEMPTS):
+            try:
+                response = requests.post(self.PUSHOVER_URL, json=params, headers=self.HEADERS, timeout=self.TIMEOUT_SECONDS)
+                # 4xx other than rate limiting means the request itself is bad; retrying won't help
+                if response.ok or (400 <= response.status_code < 500 and response.status_code != 429):
+                    if not response.ok:
+                        logger.error(f"Pushover rejected notification: {response.status_code} {response.text}")
+                    return
+                error = f"HTTP {response.status_code}"
+            except requests.RequestException as e:
+                error = str(e)
+
+            if attempt < self.MAX_ATTEMPTS - 1:
+                time.sleep(2 ** attempt)
+
+        logger.error(f"Pushover notification failed after {self.MAX_ATTEMPTS} attempts: {error}")
@@ -0,0 +1,204 @@
+"""
+Shared intraday quote cache.
+
+The price store only ever holds finalized closes (through yesterday), so the
+bars after it, including today's still-moving one, come from here instead. Each
+ticker's last c.QUOTE_LOOKBACK_DAYS days of bars are fetched at most once per
+c.QUOTE_TTL_SECONDS and shared by every session in the process and, with
+c.QUOTES_NODE_SHARED, by every process on the node through small files next to
+the disk cache. Nothing here is ever written to S3.
+
+Quotes are compact [day, close] frames like the partitions in utils.prices,
+with the wall-clock time they were fetched in attrs["fetched_at"] and the
+splits and dividends in their window (compact, see utils.events.with_factors)
+in attrs["events"], so a split or ex-dividend day that isn't stored yet
+doesn't show up as a loss.
+"""
+
+import os
+import time
+import tempfile
+import threading
+import numpy as np
+import pandas as pd
+import config as c
+import utils.cache as cache
+import utils.prices as p
+import utils.events as events
+import utils.symbols as symbols
+
+from pathlib import Path
+from datetime import timedelta as td
+from utils.downloader import download_history
+
+quote_cache = cache.LRUCache(max_entries=c.QUOTE_CACHE_ENTRIES, ttl=c.QUOTE_TTL_SECONDS, name="quotes")
+
+# tickers being fetched right now -> set once their quote is cached, so sessions asking
+# for the same ticker at once share one download while unrelated tickers never wait
+_in_flight = {}
+_in_flight_lock = threading.Lock()
+
+
+def _node_path(ticker):
+    return Path(c.DISK_CACHE_DIR) / "quotes" / f"{ticker}.parquet"
+
+
+def _fresh(quote):
+    return time.time() - quote.attrs["fetched_at"] < c.QUOTE_TTL_SECONDS
+
+
+def _read_node(ticker):
+    """a fresh quote another process on the node fetched, or None"""
+    path = _node_path(ticker)
+    try:
+        if time.time() - path.stat().st_mtime >= c.QUOTE_TTL_SECONDS:
+            return None
+        quote = pd.read_parquet(path)
+    except (OSError, ValueError):
+        # missing, or replaced mid-read; fetching again is always safe
+        return None
+    return quote if "fetched_at" in quote.attrs and "events" in quote.attrs and _fresh(quote) else None
+
+
+def _write_node(ticker, quote):
+    path = _node_path(ticker)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent)
+    with os.fdopen(fd, "wb") as f:
+        quote.to_parquet(f, index=False)
+    os.replace(tmp_path, path)
+
+
+def _lookup(ticker):
+    quote = quote_cache.get(ticker)
+    if quote is not None and _fresh(quote):
+        return quote
+    if c.QUOTES_NODE_SHARED:
+        quote = _read_node(ticker)
+        if quote is not None:
+            quote_cache.put(ticker, quote)
+            return quote
+    return None
+
+
+def _fetch(tickers, today):
+    """one batched download of the recent bars for tickers; failures are cached as empty quotes"""
+    start = today - td(days=c.QUOTE_LOOKBACK_DAYS)
+    downloaded, downloaded_events, _ = download_history(dict.fromkeys(tickers, start), today)
+    fetched_at = time.time()
+
+    quotes = {}
+    for ticker in tickers:
+        if downloaded.empty or ticker not in downloaded.columns:
+            quote = p.empty_partition()
+        else:
+            rows = downloaded[["Date", ticker]].dropna(subset=[ticker])
+            quote = p.compact(rows["Date"].to_numpy(), rows[ticker].to_numpy())
+        quote_events = events.with_factors(downloaded_events[ticker], quote) if ticker in downloaded_events else events.empty_events()
+        quote.attrs["fetched_at"] = fetched_at
+        # plain lists, so they survive the round trip through the node files' parquet metadata
+        quote.attrs["events"] = quote_events.to_dict("list")
+
+        quote_cache.put(ticker, quote)
+        if c.QUOTES_NODE_SHARED:
+            _write_node(ticker, quote)
+        quotes[ticker] = quote
+    return quotes
+
+
+def _claim(tickers):
+    """(tickers this caller now fetches, {ticker: event} of those another caller is already fetching)"""
+    claimed, waiting = [], {}
+    with _in_flight_lock:
+        for ticker in tickers:
+            if ticker in _in_flight:
+                waiting[ticker] = _in_flight[ticker]
+            else:
+                _in_flight[ticker] = threading.Event()
+                claimed.append(ticker)
+    return claimed, waiting
+
+
+def _release(tickers):
+    with _in_flight_lock:
+        for ticker in tickers:
+            _in_flight.pop(ticker).set()
+
+
+def recent(tickers, today):
+    """{ticker: quote} with the latest bars for each of tickers, fetching only those not cached"""
+    quotes = {ticker: _lookup(ticker) for ticker in tickers}
+    missing = [ticker for ticker, quote in quotes.items() if quote is None]
+    while missing:
+        claimed, waiting = _claim(missing)
+        try:
+            # another session may have fetched them just before they were claimed
+            quotes.update({ticker: _lookup(ticker) for ticker in claimed})
+            to_fetch = [ticker for ticker in claimed if quotes[ticker] is None]
+            known_invalid = symbols.invalid(to_fetch)
+            for ticker in known_invalid:
+                del quotes[ticker]
+            to_fetch = [ticker for ticker in to_fetch if ticker not in known_invalid]
+            if to_fetch:
+                quotes.update(_fetch(to_fetch, today))
+        finally:
+            _release(claimed)
+
+        for ticker, fetched in waiting.items():
+            fetched.wait()
+            quotes[ticker] = _lookup(ticker)
+        # whatever another caller didn't get (it failed, or skipped an invalid symbol) is claimed next round
+        missing = [ticker for ticker in waiting if quotes[ticker] is None]
+    return quotes
+
+
+def stale(partitions, today):
+    """tickers whose stored closes stop before the latest weekday, i.e. those with newer bars to show"""
+    latest_day = p.to_days(np.busday_offset(np.datetime64(today, "D"), 0, roll="backward"))
+    return [ticker for ticker, partition in partitions.items() if partition.empty or partition["day"].iloc[-1] < latest_day]
+
+
+def overlay(partitions, quotes):
+    """
+    partitions with each ticker's quoted bars after its last stored day appended;
+    stored closes always win, so history only ever comes from the store
+    """
+    merged = dict(partitions)
+    for ticker, quote in quotes.items():
+        stored = partitions.get(ticker)
+        if stored is None or quote.empty:
+            continue
+        last_day = stored["day"].iloc[-1] if not stored.empty else np.iinfo(np.int32).min
+        newer = quote[quote["day"] > last_day]
+        if newer.empty:
+            continue
+        partition = pd.concat([stored, newer], ignore_index=True)
+        partition.attrs = dict(stored.attrs)
+        merged[ticker] = partition
+    return merged
+
+
+def overlay_events(events_table, partitions, quotes):
+    """
+    events_table ({ticker: events}, see utils.events) with each ticker's quoted
+    splits and dividends after its last stored day added, to go with overlay;
+    stored events always win, like stored closes
+    """
+    merged = dict(events_table)
+    for ticker, quote in quotes.items():
+        stored = partitions.get(ticker)
+        quoted = pd.DataFrame(quote.attrs["events"]).astype(events.empty_events().dtypes.to_dict())
+        if stored is None or quoted.empty:
+            continue
+        last_day = stored["day"].iloc[-1] if not stored.empty else np.iinfo(np.int32).min
+        newer = quoted[quoted["day"] > last_day]
+        if newer.empty:
+            continue
+        ticker_events = pd.concat([events_table.get(ticker, events.empty_events()), newer], ignore_index=True)
+        merged[ticker] = ticker_events.drop_duplicates(subset=["day"], keep="first").sort_values("day", ignore_index=True)
+    return merged
+
+
+def versions(quotes):
+    """when each quote was fetched, so cached results go stale with the quotes they used"""
+    return {ticker: quote.attrs["fetched_at"] for ticker, quote in quotes.items()}
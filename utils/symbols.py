@@ -0,0 +1,162 @@
+"""
+Symbol resolution with a shared negative cache.
+
+A symbol Yahoo doesn't know (a typo, or a delisted ticker) never yields prices,
+so without a record of it every load would request it again. Such symbols are
+kept in one JSON object in S3 (c.INVALID_SYMBOLS_KEY) mapping symbol ->
+{reason, expires}, shared by every process and re-read through the disk tier at
+most every c.INVALID_SYMBOLS_REFRESH_SECONDS. Entries expire after
+c.INVALID_SYMBOL_TTL_SECONDS, so a symbol that gets (re)listed is picked up again.
+
+Only confirmed failures mark a symbol invalid right away. A missing timezone is
+also what yfinance reports after a timeout, so it is recorded as a strike
+instead, and only c.INVALID_SYMBOL_STRIKES strikes from separate runs (at least
+c.INVALID_SYMBOL_STRIKE_INTERVAL_SECONDS apart) mark the symbol invalid.
+"""
+
+import json
+import time
+import threading
+import config as c
+import utils.cache as cache
+import utils.telemetry as telemetry
+import utils.disk_cache as disk_cache
+
+from datetime import datetime as dt
+from datetime import timedelta as td
+from utils.logger import logger
+from utils.downloader import download_close
+
+# symbols recently seen trading, so validating a save doesn't probe them again
+valid_symbols = cache.LRUCache(
+    max_entries=c.VALID_SYMBOLS_CACHE_ENTRIES,
+    ttl=c.INVALID_SYMBOL_TTL_SECONDS,
+    name="valid_symbols",
+)
+
+_lock = threading.Lock()
+_entries = {}
+_loaded_at = None
+
+
+def _load(force=False):
+    """the shared negative cache, re-read from S3 when the process copy is stale"""
+    global _entries, _loaded_at
+    with _lock:
+        if not force and _loaded_at is not None and time.monotonic() - _loaded_at < c.INVALID_SYMBOLS_REFRESH_SECONDS:
+            return _entries
+
+    body = disk_cache.get_bytes(c.INVALID_SYMBOLS_KEY)
+    entries = json.loads(body.decode("utf-8")) if body is not None else {}
+    with _lock:
+        _entries, _loaded_at = entries, time.monotonic()
+    return entries
+
+
+def _is_invalid(entry, now):
+    return entry.get("expires", 0) > now
+
+
+def _is_live(entry, now):
+    """an invalid entry that hasn't expired, or strikes recent enough to still count"""
+    return _is_invalid(entry, now) or entry.get("struck_at", 0) + c.INVALID_SYMBOL_TTL_SECONDS > now
+
+
+def invalid(tickers):
+    """{ticker: reason} for the given tickers that are currently known to be invalid"""
+    tickers = list(tickers)
+    entries = _load()
+    now = time.time()
+    found = {t: entries[t]["reason"] for t in tickers if t in entries and _is_invalid(entries[t], now)}
+
+    telemetry.count("pickwise_cache_requests_total", len(found), cache="invalid_symbols", result="hit")
+    telemetry.count("pickwise_cache_requests_total", len(tickers) - len(found), cache="invalid_symbols", result="miss")
+    return found
+
+
+def _write(entries):
+    global _entries, _loaded_at
+    disk_cache.put(c.INVALID_SYMBOLS_KEY, json.dumps(entries), "application/json")
+    with _lock:
+        _entries, _loaded_at = entries, time.monotonic()
+
+
+def mark_invalid(failures):
+    """
+    Record {ticker: reason} in the shared negative cache. Read-merge-write, so a
+    concurrent writer can at worst cost an entry, which is simply probed again.
+    """
+    if not failures:
+        return
+
+    now = time.time()
+    entries = {t: entry for t, entry in _load(force=True).items() if _is_live(entry, now)}
+    for ticker, reason in failures.items():
+        entries[ticker] = {"reason": reason, "expires": now + c.INVALID_SYMBOL_TTL_SECONDS}
+        valid_symbols.pop(ticker)
+
+    _write(entries)
+    logger.info(f"marked {len(failures)} symbols invalid: {', '.join(sorted(failures))}")
+
+
+def strike(failures):
+    """
+    Count {ticker: reason} of unconfirmed failures against their symbols, at
+    most once per c.INVALID_SYMBOL_STRIKE_INTERVAL_SECONDS each. Symbols that
+    reach c.INVALID_SYMBOL_STRIKES are marked invalid; the rest stay usable.
+    """
+    if not failures:
+        return
+
+    now = time.time()
+    entries = {t: entry for t, entry in _load(force=True).items() if _is_live(entry, now)}
+    confirmed, changed = {}, False
+    for ticker, reason in failures.items():
+        entry = entries.get(ticker, {})
+        if _is_invalid(entry, now) or entry.get("struck_at", 0) + c.INVALID_SYMBOL_STRIKE_INTERVAL_SECONDS > now:
+            continue
+        strikes = entry.get("strikes", 0) + 1
+        if strikes >= c.INVALID_SYMBOL_STRIKES:
+            confirmed[ticker] = reason
+        else:
+            entries[ticker] = {"reason": reason, "strikes": strikes, "struck_at": now}
+            changed = True
+
+    if changed:
+        _write(entries)
+    mark_invalid(confirmed)
+
+
+def record_failures(failed):
+    """fold a download's {ticker: DownloadFailure} into the negative cache: permanent ones now, suspect ones as strikes"""
+    mark_invalid({t: failure.reason for t, failure in failed.items() if failure.permanent})
+    strike({t: failure.reason for t, failure in failed.items() if failure.suspect})
+
+
+def unknown(tickers):
+    """
+    Resolve tickers against Yahoo, returning {ticker: reason} for those it
+    doesn't know or has delisted. Negative-cached and recently seen symbols are
+    answered without a request; the rest are probed with a short history
+    download. A probe that fails for transient or unconfirmed reasons (rate
+    limits, timeouts, a missing timezone short of enough strikes) gives the
+    symbol the benefit of the doubt.
+    """
+    tickers = set(tickers)
+    found = invalid(tickers)
+    to_probe = sorted(t for t in tickers if t not in found and valid_symbols.get(t) is None)
+    if not to_probe:
+        return found
+
+    today = dt.now().date()
+    probe_start = today - td(days=c.SYMBOL_PROBE_DAYS)
+    _, failed = download_close(dict.fromkeys(to_probe, probe_start), today)
+
+    record_failures(failed)
+    found.update(invalid(failed))
+
+    for ticker in to_probe:
+        if ticker not in failed:
+            valid_symbols.put(ticker, True)
+
+    return found
@@ -0,0 +1,216 @@
+"""
+Process-wide timing spans and counters.
+
+span() and timed() time a block or a function. Every finished span is logged as
+one JSON line on the "pickwise.telemetry" logger (at INFO when it took at least
+c.SLOW_SPAN_SECONDS, DEBUG otherwise) and folded into a latency histogram.
+count() bumps a labelled counter, e.g. cache hits and misses or bytes moved.
+
+The aggregates are rendered in the Prometheus text format, rewritten to
+c.METRICS_FILE every c.METRICS_EXPORT_SECONDS (suitable for node_exporter's
+textfile collector) and, when c.METRICS_PORT is set, served at /metrics.
+"""
+
+import os
+import sys
+import json
+import time
+import logging
+import tempfile
+import functools
+import threading
+import config as c
+
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# upper bounds (seconds) of the span histogram buckets
+SPAN_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+COUNTER_HELP = {
+    "pickwise_cache_requests_total": "Cache lookups by cache and result (hit or miss).",
+    "pickwise_bytes_total": "Bytes moved, by operation.",
+    "pickwise_span_errors_total": "Spans that ended with an exception.",
+    "pickwise_download_failures_total": "Symbols a price download returned nothing for.",
+}
+
+log = logging.getLogger("pickwise.telemetry")
+log.setLevel(c.TELEMETRY_LOG_LEVEL)
+log.propagate = False
+if not log.handlers:
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    log.addHandler(handler)
+
+_lock = threading.Lock()
+_spans = {}  # span name -> (cumulative bucket counts ending with +Inf, sum of seconds)
+_counters = {}  # (name, sorted label items) -> value
+
+_exporter_started = False
+
+
+def observe(name, seconds, ok=True, **fields):
+    """record a finished span: histogram it and emit a structured log line"""
+    with _lock:
+        buckets, total = _spans.get(name, ([0] * (len(SPAN_BUCKETS) + 1), 0.0))
+        for i, bound in enumerate(SPAN_BUCKETS):
+            if seconds <= bound:
+                buckets[i] += 1
+        buckets[-1] += 1
+        _spans[name] = (buckets, total + seconds)
+
+    if not ok:
+        count("pickwise_span_errors_total", span=name)
+
+    level = logging.INFO if seconds >= c.SLOW_SPAN_SECONDS else logging.DEBUG
+    if log.isEnabledFor(level):
+        record = {"ts": round(time.time(), 3), "span": name, "seconds": round(seconds, 6), "ok": ok, **fields}
+        log.log(level, json.dumps(record, default=str))
+
+
+@contextmanager
+def span(name, **fields):
+    """
+    Time the enclosed block. Yields the fields dict, so the block can attach
+    details it only learns while running (rows, bytes, failures...).
+    """
+    started = time.perf_counter()
+    ok = True
+    try:
+        yield fields
+    except BaseException:
+        ok = False
+        raise
+    finally:
+        observe(name, time.perf_counter() - started, ok=ok, **fields)
+
+
+def timed(name):
+    """decorator form of span()"""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def count(name, value=1, **labels):
+    key = (name, tuple(sorted(labels.items())))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def instrument_boto(client):
+    """
+    Time every API call a boto3 client makes, as spans named after the service
+    and operation (e.g. s3.GetObject, dynamodb.UpdateItem).
+    """
+    service = client.meta.service_model.service_name
+
+    def before_call(context, model, **kwargs):
+        context["telemetry_span"] = (f"{service}.{model.name}", time.perf_counter())
+
+    # after-call-error (transport failures) carries no model, hence the name travels in context
+    def after_call(context, http_response=None, exception=None, **kwargs):
+        name, started = context.pop("telemetry_span", (None, None))
+        if name is None:
+            return
+        status = getattr(http_response, "status_code", None)
+        # 304 Not Modified is a successful revalidation, not an error
+        ok = exception is None and status is not None and status < 400
+        observe(name, time.perf_counter() - started, ok=ok, status=status)
+
+    client.meta.events.register("before-call", before_call)
+    client.meta.events.register("after-call", after_call)
+    client.meta.events.register("after-call-error", after_call)
+    return client
+
+
+def _labels(items):
+    escaped = (
+        (key, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for key, value in items
+    )
+    return "{" + ",".join(f'{key}="{value}"' for key, value in escaped) + "}"
+
+
+def render():
+    """current metrics in the Prometheus text exposition format"""
+    with _lock:
+        spans = {name: (list(buckets), total) for name, (buckets, total) in _spans.items()}
+        counters = dict(_counters)
+
+    lines = [
+        "# HELP pickwise_span_seconds Time spent in instrumented stages.",
+        "# TYPE pickwise_span_seconds histogram",
+    ]
+    for name, (buckets, total) in sorted(spans.items()):
+        for bound, n in zip([*SPAN_BUCKETS, "+Inf"], buckets):
+            lines.append(f"pickwise_span_seconds_bucket{_labels([('span', name), ('le', bound)])} {n}")
+        lines.append(f"pickwise_span_seconds_sum{_labels([('span', name)])} {total}")
+        lines.append(f"pickwise_span_seconds_count{_labels([('span', name)])} {buckets[-1]}")
+
+    by_name = {}
+    for (name, labels), value in counters.items():
+        by_name.setdefault(name, []).append((labels, value))
+    for name, series in sorted(by_name.items()):
+        if name in COUNTER_HELP:
+            lines.append(f"# HELP {name} {COUNTER_HELP[name]}")
+        lines.append(f"# TYPE {name} counter")
+        for labels, value in sorted(series):
+            lines.append(f"{name}{_labels(labels) if labels else ''} {value}")
+
+    return "\n".join(lines) + "\n"
+
+
+def export(path=None):
+    """write the metrics file atomically, so a scraper never reads a partial one"""
+    path = path or c.METRICS_FILE
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(render())
+    os.replace(tmp_path, path)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # scrapes every few seconds would drown out the app's own logs
+
+
+def _export_loop():
+    while True:
+        time.sleep(c.METRICS_EXPORT_SECONDS)
+        try:
+            export()
+        except OSError as e:
+            log.warning(json.dumps({"ts": round(time.time(), 3), "event": "metrics_export_failed", "error": str(e)}))
+
+
+def start_exporter():
+    """once per process: rewrite the metrics file periodically and, if configured, serve /metrics"""
+    global _exporter_started
+    with _lock:
+        if _exporter_started:
+            return
+        _exporter_started = True
+
+    threading.Thread(target=_export_loop, name="metrics-export", daemon=True).start()
+
+    if c.METRICS_PORT:
+        server = ThreadingHTTPServer(("0.0.0.0", c.METRICS_PORT), _MetricsHandler)
+        threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
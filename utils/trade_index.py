@@ -0,0 +1,131 @@
+import numpy as np
+
+
+class TradeIndex:
+    """
+    Inverted index over a user's trades for tag/source/ticker filtering.
+
+    Every tag, source and ticker maps to a bitset of trade positions, stored as
+    a Python int (bit i set => trade i carries that value). Filters are then
+    plain bitwise intersections (&) and unions (|), which stay well under a
+    millisecond even for tens of thousands of trades.
+
+    Positions are stable: removing a trade leaves an empty slot rather than
+    shifting later trades, so edits can be applied incrementally.
+    """
+
+    FIELDS = ("tags", "source", "ticker")
+
+    def __init__(self, trades=()):
+        self.trades = list(trades)  # position -> trade, or None once removed
+
+        # bulk build: collect positions per value, then pack each list into a
+        # bitset once, rather than growing big ints one trade at a time
+        positions = {field: {} for field in self.FIELDS}
+        for pos, trade in enumerate(self.trades):
+            for field in self.FIELDS:
+                for value in set(self._values(trade, field)):
+                    positions[field].setdefault(value, []).append(pos)
+
+        self._postings = {
+            field: {value: self._bitset(value_positions) for value, value_positions in by_value.items()}
+            for field, by_value in positions.items()
+        }
+        self._live = (1 << len(self.trades)) - 1  # bitset of positions holding a trade
+
+    def __len__(self):
+        return self._live.bit_count()
+
+    @staticmethod
+    def _bitset(positions):
+        flags = np.zeros(positions[-1] + 1, dtype=bool)
+        flags[positions] = True
+        return int.from_bytes(np.packbits(flags, bitorder="little").tobytes(), "little")
+
+    @staticmethod
+    def _values(trade, field):
+        if field == "ticker":
+            return [trade["ticker"]]
+        # list columns may be persisted as None by older saves
+        return trade.get(field) or []
+
+    def _set(self, pos, trade, on):
+        bit = 1 << pos
+        for field in self.FIELDS:
+            postings = self._postings[field]
+            for value in set(self._values(trade, field)):
+                if on:
+                    postings[value] = postings.get(value, 0) | bit
+                else:
+                    postings[value] &= ~bit
+                    if not postings[value]:
+                        del postings[value]
+
+    def add(self, trade):
+        """index a new trade; returns its position"""
+        pos = len(self.trades)
+        self.trades.append(trade)
+        self._set(pos, trade, on=True)
+        self._live |= 1 << pos
+        return pos
+
+    def remove(self, pos):
+        trade = self.trades[pos]
+        if trade is None:
+            return
+        self._set(pos, trade, on=False)
+        self.trades[pos] = None
+        self._live &= ~(1 << pos)
+
+    def update(self, pos, trade):
+        """replace the trade at pos, re-indexing only that position"""
+        self.remove(pos)
+        self.trades[pos] = trade
+        self._set(pos, trade, on=True)
+        self._live |= 1 << pos
+
+    def values(self, field):
+        """distinct values currently present for a field, e.g. every tag in use"""
+        return set(self._postings[field])
+
+    def match(self, field, values, match_all=False):
+        """
+        Bitset of trades carrying any (or, with match_all, every) of the given
+        values. An empty selection places no constraint and matches all trades.
+        """
+        if not values:
+            return self._live
+
+        postings = self._postings[field]
+        bitsets = [postings.get(value, 0) for value in values]
+        result = bitsets[0]
+        for bits in bitsets[1:]:
+            result = result & bits if match_all else result | bits
+        return result
+
+    def filter(self, tags=(), sources=(), tickers=(), match_all_tags=False, match_all_sources=False):
+        """
+        Bitset of trades passing every active filter. Within tags and sources,
+        selections combine with AND or OR per the match_all flags; tickers
+        always combine with OR since a trade has exactly one ticker.
+        """
+        return (
+            self.match("tags", tags, match_all_tags)
+            & self.match("source", sources, match_all_sources)
+            & self.match("ticker", tickers)
+        )
+
+    def positions(self, bits):
+        """sorted array of the positions set in a bitset"""
+        if not bits:
+            return np.empty(0, dtype=np.intp)
+        raw = np.frombuffer(bits.to_bytes((bits.bit_length() + 7) // 8, "little"), dtype=np.uint8)
+        return np.flatnonzero(np.unpackbits(raw, bitorder="little"))
+
+    def select(self, bits):
+        """trades in a bitset, in their original order"""
+        return [self.trades[pos] for pos in self.positions(bits)]
+
+    def tickers(self, bits):
+        """tickers traded at least once within a bitset"""
+        return {ticker for ticker, postings in self._postings["ticker"].items() if postings & bits}
@@ -1,15 +1,50 @@
 import time
+import atexit
+import threading
 import config as c
+import utils.cache as cache
 
 from utils.logger import logger
 
+# process-level cache of user records (user_id -> DynamoDB item), so a login,
+# its page refreshes and attribute reads share one GetItem per TTL window
+user_records = cache.LRUCache(max_entries=c.USER_RECORD_CACHE_ENTRIES, ttl=c.USER_RECORD_TTL_SECONDS, name="user_records")
+
+# counter increments waiting to be written, user_id -> {attr_name: increment};
+# flushed together as one UpdateItem per user
+_pending_increments = {}
+_pending_lock = threading.Lock()
+_flush_timer = None
+
+_table = None
+
+
+def trades_keys():
+    """S3 keys of every user's trades.json, as {email: key}"""
+    keys = {}
+    paginator = c.s3.get_paginator("list_objects_v2")
+    for page in paginator.paginate(Bucket=c.S3_BUCKET, Prefix=f"{c.USERS_FOLDER}/"):
+        for obj in page.get("Contents", []):
+            folder, _, name = obj["Key"][len(c.USERS_FOLDER) + 1:].rpartition("/")
+            if name == c.TRADES_JSON_FILENAME:
+                keys[folder] = obj["Key"]
+    return keys
+
+
+def users_table():
+    """the users DynamoDB table; built on first use so importing this module stays cheap"""
+    global _table
+    if _table is None:
+        _table = c.ddb.Table(c.USERS_TABLE)
+    return _table
+
 
 class User:
     """
     this User object is used to contain all user-related methods
     instantiated during auth using the auth response payload
 
-    the User class variable contains the src table for storing user data
+    the table property points at the src table for storing user data
 
     for Streamlit apps, this object is loaded to st.session_state
     and used as the entry point for:
@@ -17,7 +52,9 @@ class User:
         - accessing user-specific variables
     """
 
-    table = c.ddb.Table(c.USERS_TABLE)
+    @property
+    def table(self):
+        return users_table()
 
     def __init__(self, payload):
         self.user_id = payload.get("sub")
@@ -61,11 +98,25 @@ class User:
     def __repr__(self):
         return f"User(name={self.name!r}, email={self.email!r})"  # !r ensures proper quoting/escaping.
 
-    def is_new_user(self):
-        response = self.table.get_item(Key={"user_id": self.user_id})
+    def fetch_record(self):
+        """
+        The user's DynamoDB item, or None for a new user. A single GetItem
+        answers both "is this a new user?" and "what do we know about them?",
+        and the result is cached per process for c.USER_RECORD_TTL_SECONDS.
+        """
+        record = user_records.get(self.user_id)
+        if record is None:
+            response = self.table.get_item(Key={"user_id": self.user_id})
+
+            # Item key exists if user_id in table
+            record = response.get("Item")
+            if record is not None:
+                user_records.put(self.user_id, record)
 
-        # Item key exists if user_id in table
-        return "Item" not in response
+        return record
+
+    def is_new_user(self):
+        return self.fetch_record() is None
 
     def init_user_data(self, payload):
         """Extracts standard fields from ID token payload into instance variables."""
@@ -90,23 +141,26 @@ class User:
         # __dict__ contains all instance variables
         item = {k: v for k, v in self.__dict__.items()}
         self.table.put_item(Item=item)
+        user_records.put(self.user_id, item)
 
     def get_user_data(self):
-        """get user data from DynamoDB"""
-        response = self.table.get_item(Key={"user_id": self.user_id})
-        item = response.get("Item", {})
+        """get user data from DynamoDB (via the process-level record cache)"""
+        item = self.fetch_record() or {}
 
         for k, v in item.items():
             setattr(self, k, v)
 
     def get_user_attribute(self, attr_name):
-        """Fetch a single attribute from DynamoDB."""
-        response = self.table.get_item(
-            Key={"user_id": self.user_id},
-            ProjectionExpression=attr_name
-        )
-
-        attr = response.get("Item", {}).get(attr_name)
+        """Fetch a single attribute, from the cached record when there is one."""
+        record = user_records.get(self.user_id)
+        if record is not None:
+            attr = record.get(attr_name)
+        else:
+            response = self.table.get_item(
+                Key={"user_id": self.user_id},
+                ProjectionExpression=attr_name
+            )
+            attr = response.get("Item", {}).get(attr_name)
 
         # attach to self
         # useful for repeat access of attr without using more DynamoDB read-capacity units
@@ -134,16 +188,27 @@ class User:
             update_expr = "SET last_login = :ts, login_token_iat = :iat ADD num_logins :inc"
             expr_values[":iat"] = login_token_iat
 
-        self.table.update_item(
+        # ALL_NEW returns the updated item in the same call, keeping the cached record fresh
+        response = self.table.update_item(
             Key={"user_id": self.user_id},
             UpdateExpression=update_expr,
-            ExpressionAttributeValues=expr_values
+            ExpressionAttributeValues=expr_values,
+            ReturnValues="ALL_NEW"
         )
+        record = response.get("Attributes")
+        if record is not None:
+            self.num_logins = int(record.get("num_logins", self.num_logins))
+            user_records.put(self.user_id, record)
 
     def increment_attribute(self, attr_name, increment=1):
         """
         Increment or create the stated attribute for user by the specified amount.
         Note: this does not support attributes with nested paths (e.g. 'a.b.c')
+
+        Increments are coalesced: they are buffered per user and written within
+        c.COUNTER_FLUSH_SECONDS as a single UpdateItem covering every pending
+        counter, and at the latest when the process exits. Call
+        flush_counters() to write them immediately.
         """
 
         if not isinstance(increment, int) or increment < 1:
@@ -152,25 +217,56 @@ class User:
         if not isinstance(attr_name, str) or not attr_name or "." in attr_name:
             raise ValueError("attr_name must be a non-empty top-level string")
 
-        self.table.update_item(
-            Key={"user_id": self.user_id},
-            UpdateExpression="ADD #attr :inc",
-            ExpressionAttributeNames={
-                "#attr": attr_name,
-            },
-            ExpressionAttributeValues={
-                ":inc": increment
-            }
-        )
+        global _flush_timer
+        with _pending_lock:
+            counters = _pending_increments.setdefault(self.user_id, {})
+            counters[attr_name] = counters.get(attr_name, 0) + increment
+
+            if _flush_timer is None:
+                _flush_timer = threading.Timer(c.COUNTER_FLUSH_SECONDS, flush_counters)
+                _flush_timer.daemon = True
+                _flush_timer.start()
+
+        # reflect the increment locally so reads in this process see it right away
+        setattr(self, attr_name, int(getattr(self, attr_name, 0) or 0) + increment)
+        record = user_records.get(self.user_id)
+        if record is not None:
+            record[attr_name] = int(record.get(attr_name, 0) or 0) + increment
 
     # ---- project specific logic ----
 
     def load_user_variables(self):
         """
         Defines per-user S3 paths. User data is nested under users/<email>/
-        so each user gets their own isolated trades and ticker cache.
+        so each user gets their own isolated trades. Price data is shared
+        across users and lives under c.PRICES_FOLDER instead.
         """
 
-        self.ROOT_FOLDER = f"users/{self.email}"
+        self.ROOT_FOLDER = f"{c.USERS_FOLDER}/{self.email}"
         self.TRADES_JSON_PATH = f"{self.ROOT_FOLDER}/{c.TRADES_JSON_FILENAME}"
-        self.TICKER_DATA_PATH = f"{self.ROOT_FOLDER}/{c.TICKER_DATA_FILENAME}"
+
+
+def flush_counters():
+    """write all buffered counter increments, one UpdateItem per user"""
+    global _flush_timer
+    with _pending_lock:
+        pending = dict(_pending_increments)
+        _pending_increments.clear()
+        _flush_timer = None
+
+    for user_id, counters in pending.items():
+        names = {f"#a{i}": attr_name for i, attr_name in enumerate(counters)}
+        values = {f":v{i}": increment for i, increment in enumerate(counters.values())}
+        try:
+            users_table().update_item(
+                Key={"user_id": user_id},
+                UpdateExpression="ADD " + ", ".join(f"#a{i} :v{i}" for i in range(len(counters))),
+                ExpressionAttributeNames=names,
+                ExpressionAttributeValues=values
+            )
+        except Exception as e:
+            logger.error(f"failed to write counters {counters} for user {user_id}: {e}")
+
+
+# the flush timer is a daemon thread, so increments still buffered at exit are written here
+atexit.register(flush_counters)